@@ -0,0 +1,373 @@
+"""
+RunningHub 并发准入调度器
+同一台机器上的所有客户端（Flask 服务、多个 ComfyUI 进程）通过同一个文件锁共享账户的并发额度，
+按优先级 + 先来先到的顺序获取执行槽位；远程 accountStatus 只做周期性校准，不再每个等待者各自轮询
+
+使用方法:
+    from admission import get_admission_scheduler
+
+    scheduler = get_admission_scheduler(api_key)
+    with scheduler.acquire(limit=3, priority=0, timeout=600, fetch_remote_count=fetch_count):
+        ...  # 创建任务并等待完成
+
+说明:
+    - 状态保存在临时目录下按 API Key 区分的 JSON 文件中，读写都在文件锁内进行
+      （Windows 使用 msvcrt，其他平台使用 fcntl）
+    - 等待者只读本地状态文件，开销很小；远程计数每 reconcile_interval 秒由其中一个进程刷新
+    - 进程崩溃时：等待者心跳超时、持有者进程退出或租约到期后，其槽位会被自动回收
+    - 远程计数函数随每次 acquire 传入，调度器本身只按账户（API Key）区分，不保存调用方的状态
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Callable, Optional, Dict, Any
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+try:
+    import psutil
+    psutil_available = True
+except ImportError:
+    psutil = None
+    psutil_available = False
+
+
+class _FileLock:
+    """跨进程文件锁（同一进程内的线程也互斥）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._fh = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            self._fh = open(self.path, "a+b")
+            if fcntl is not None:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+            else:
+                self._fh.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self._fh.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue  # LK_LOCK 重试 10 秒后仍失败会抛出异常，继续等待
+        except BaseException:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            else:
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._fh.close()
+            self._fh = None
+            self._thread_lock.release()
+
+
+class AdmissionSlot:
+    """已获取的执行槽位，可作为上下文管理器使用"""
+
+    def __init__(self, scheduler: "AdmissionScheduler", slot_id: str):
+        self.scheduler = scheduler
+        self.slot_id = slot_id
+        self.released = False
+
+    def release(self):
+        """释放槽位（重复调用是安全的）"""
+        if not self.released:
+            self.released = True
+            self.scheduler.release(self.slot_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class AdmissionScheduler:
+    """基于文件锁的跨进程并发准入调度器"""
+
+    def __init__(
+        self,
+        key: str,
+        state_dir: Optional[str] = None,
+        reconcile_interval: float = 15.0,
+        poll_interval: float = 0.25,
+        lease_ttl: float = 6 * 3600,
+        waiter_ttl: float = 10.0
+    ):
+        """
+        初始化调度器
+
+        Args:
+            key: 额度标识（通常是 API Key），同一标识的所有进程共享槽位
+            state_dir: 状态文件目录，默认 <临时目录>/runninghub_admission，可用环境变量 RH_ADMISSION_DIR 覆盖
+            reconcile_interval: 远程计数校准间隔（秒）
+            poll_interval: 等待者检查本地状态的间隔（秒）
+            lease_ttl: 槽位租约时长（秒），持有者崩溃且无法检测进程时按此回收
+            waiter_ttl: 等待者心跳超时（秒）
+        """
+        state_dir = state_dir or os.getenv("RH_ADMISSION_DIR") or os.path.join(
+            tempfile.gettempdir(), "runninghub_admission"
+        )
+        os.makedirs(state_dir, exist_ok=True)
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        self.state_path = os.path.join(state_dir, f"{name}.json")
+        self._lock = _FileLock(os.path.join(state_dir, f"{name}.lock"))
+        self.reconcile_interval = reconcile_interval
+        self.poll_interval = poll_interval
+        self.lease_ttl = lease_ttl
+        self.waiter_ttl = waiter_ttl
+
+    # --- 状态读写（需持有文件锁） ---
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        state.setdefault("slots", {})
+        state.setdefault("waiters", [])
+        state.setdefault("seq", 0)
+        state.setdefault("remote_count", 0)
+        state.setdefault("remote_checked_at", 0)
+        state.setdefault("remote_checking_until", 0)
+        return state
+
+    def _save(self, state: Dict[str, Any]):
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        if pid == os.getpid():
+            return True
+        if psutil_available:
+            return psutil.pid_exists(pid)
+        if os.name != "nt":
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return False
+            except PermissionError:
+                return True
+        return True
+
+    def _cleanup(self, state: Dict[str, Any], now: float):
+        """回收崩溃进程遗留的槽位和等待者"""
+        for slot_id, slot in list(state["slots"].items()):
+            if slot["expires_at"] < now or not self._pid_alive(slot["pid"]):
+                print(f"⚠️ 回收失效的并发槽位: {slot_id} (pid {slot['pid']})")
+                del state["slots"][slot_id]
+                state["remote_count"] = max(0, state["remote_count"] - 1)
+        state["waiters"] = [
+            w for w in state["waiters"]
+            if now - w["heartbeat"] <= self.waiter_ttl and self._pid_alive(w["pid"])
+        ]
+
+    # --- 对外接口 ---
+
+    def acquire(
+        self,
+        limit: int = 1,
+        priority: int = 0,
+        timeout: Optional[float] = None,
+        fetch_remote_count: Optional[Callable[[], int]] = None
+    ) -> AdmissionSlot:
+        """
+        获取一个执行槽位
+
+        Args:
+            limit: 本次调用允许的账户并发上限
+            priority: 优先级，数值大的先获取；相同优先级按先来先到
+            timeout: 最长等待时间（秒），None 表示一直等待
+            fetch_remote_count: 返回账户当前远程任务数的函数，为None时只做本地调度
+
+        Returns:
+            AdmissionSlot，用完后调用 release() 或使用 with 语句
+
+        Raises:
+            TimeoutError: 等待超时
+        """
+        waiter_id = uuid.uuid4().hex
+        deadline = None if timeout is None else time.time() + timeout
+        last_report = 0.0
+
+        with self._lock:
+            state = self._load()
+            state["seq"] += 1
+            state["waiters"].append({
+                "id": waiter_id, "pid": os.getpid(), "priority": priority,
+                "limit": limit, "seq": state["seq"], "heartbeat": time.time(),
+            })
+            self._save(state)
+
+        try:
+            while True:
+                now = time.time()
+                with self._lock:
+                    state = self._load()
+                    self._cleanup(state, now)
+                    waiter = next((w for w in state["waiters"] if w["id"] == waiter_id), None)
+                    if waiter is None:
+                        # 心跳曾超时被清理（如进程长时间挂起），重新排队到队尾
+                        state["seq"] += 1
+                        waiter = {
+                            "id": waiter_id, "pid": os.getpid(), "priority": priority,
+                            "limit": limit, "seq": state["seq"], "heartbeat": now,
+                        }
+                        state["waiters"].append(waiter)
+                    waiter["heartbeat"] = now
+
+                    # 轮到本进程刷新远程计数时，先刷新再判断，避免依据过期计数放行
+                    reconcile = self._claim_reconcile(state, now, fetch_remote_count)
+                    if not reconcile and self._admit(state, waiter_id, fetch_remote_count is not None):
+                        state["waiters"].remove(waiter)
+                        state["slots"][waiter_id] = {
+                            "pid": os.getpid(), "acquired_at": now, "expires_at": now + self.lease_ttl,
+                        }
+                        state["remote_count"] += 1
+                        self._save(state)
+                        return AdmissionSlot(self, waiter_id)
+
+                    used = max(len(state["slots"]), state["remote_count"])
+                    position = self._ordered(state).index(waiter)
+                    self._save(state)
+
+                if reconcile:
+                    self._reconcile(fetch_remote_count)
+                    continue
+
+                if deadline is not None and now > deadline:
+                    raise TimeoutError(f"等待并发槽位超时 ({used}/{limit})")
+                if now - last_report >= 10:
+                    print(f"⏳ 等待并发槽位... (使用中 {used}/{limit}，前面还有 {position} 个)")
+                    last_report = now
+                time.sleep(self.poll_interval)
+        except BaseException:
+            self._remove_waiter(waiter_id)
+            raise
+
+    def release(self, slot_id: str):
+        """释放槽位"""
+        with self._lock:
+            state = self._load()
+            if state["slots"].pop(slot_id, None) is not None:
+                state["remote_count"] = max(0, state["remote_count"] - 1)
+                self._save(state)
+
+    def reconcile(self, fetch_remote_count: Callable[[], int]):
+        """立即用远程计数校准本地状态"""
+        with self._lock:
+            state = self._load()
+            state["remote_checking_until"] = time.time() + 60
+            self._save(state)
+        self._reconcile(fetch_remote_count)
+
+    def stats(self) -> Dict[str, Any]:
+        """调度器统计信息"""
+        with self._lock:
+            state = self._load()
+            self._cleanup(state, time.time())
+            return {
+                "held": len(state["slots"]),
+                "waiting": len(state["waiters"]),
+                "remote_count": state["remote_count"],
+                "remote_checked_at": state["remote_checked_at"],
+            }
+
+    # --- 内部逻辑 ---
+
+    @staticmethod
+    def _ordered(state: Dict[str, Any]) -> list:
+        return sorted(state["waiters"], key=lambda w: (-w["priority"], w["seq"]))
+
+    def _admit(self, state: Dict[str, Any], waiter_id: str, remote: bool) -> bool:
+        """按顺序判断是否轮到该等待者，排在前面的等待者未满足时后面的不能插队"""
+        if remote and not state["remote_checked_at"]:
+            return False  # 首次远程校准完成前不放行
+        used = max(len(state["slots"]), state["remote_count"])
+        for granted, waiter in enumerate(self._ordered(state)):
+            if used + granted >= waiter["limit"]:
+                return False
+            if waiter["id"] == waiter_id:
+                return True
+        return False
+
+    def _claim_reconcile(self, state: Dict[str, Any], now: float,
+                         fetch_remote_count: Optional[Callable[[], int]]) -> bool:
+        """判断是否需要由当前进程刷新远程计数，是则占用刷新权"""
+        if fetch_remote_count is None:
+            return False
+        if now - state["remote_checked_at"] < self.reconcile_interval or state["remote_checking_until"] > now:
+            return False
+        state["remote_checking_until"] = now + 60
+        return True
+
+    def _reconcile(self, fetch_remote_count: Callable[[], int]):
+        try:
+            count = int(fetch_remote_count())
+        except Exception as e:
+            print(f"⚠️ 获取远程任务数失败，沿用本地计数: {e}")
+            count = None
+        with self._lock:
+            state = self._load()
+            now = time.time()
+            if count is not None:
+                state["remote_count"] = count
+            state["remote_checked_at"] = now
+            state["remote_checking_until"] = 0
+            self._save(state)
+
+    def _remove_waiter(self, waiter_id: str):
+        with self._lock:
+            state = self._load()
+            state["waiters"] = [w for w in state["waiters"] if w["id"] != waiter_id]
+            self._save(state)
+
+
+# 进程内按账户共享调度器
+_schedulers: Dict[str, AdmissionScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_admission_scheduler(key: str, **kwargs) -> AdmissionScheduler:
+    """
+    获取指定账户的调度器（同一进程内复用同一个实例）
+
+    Args:
+        key: 额度标识（通常是 API Key）
+        **kwargs: 首次创建时传给 AdmissionScheduler 的调度参数（状态目录、间隔等）；
+                  与调用方相关的远程计数函数在 acquire 时传入
+    """
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            scheduler = AdmissionScheduler(key, **kwargs)
+            _schedulers[key] = scheduler
+        return scheduler
@@ -2,22 +2,40 @@
 RunningHub 去水印系统 - Flask后端API
 """
 
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
+from flask.helpers import get_debug_flag
 import requests
+import hashlib
+import hmac
 import json
 import os
+import queue
+import sys
+import threading
 import time
-import tempfile
+from collections import OrderedDict
 from pathlib import Path
 from werkzeug.utils import secure_filename
 from config import (
     API_KEY, BASE_URL, WORKFLOW_IDS, VIDEO_NODE_ID,
     HEADERS, UPLOAD_HEADERS, MAX_RETRIES, POLL_INTERVAL,
-    INPUT_DIR, OUTPUT_DIR,
+    INPUT_DIR, OUTPUT_DIR, CONCURRENCY_LIMIT, ADMISSION_TIMEOUT, WEBHOOK_BASE_URL, WEBHOOK_SECRET,
+    RESULT_CACHE_ENABLED,
     POSE_WORKFLOW_ID, POSE_SOURCE_IMAGE_NODE_ID, POSE_POSE_IMAGE_NODE_ID,
     POSE_PROMPT1_NODE_ID, POSE_PROMPT2_NODE_ID, POSE_DEFAULT_PROMPT1, POSE_DEFAULT_PROMPT2
 )
 
+from runninghub_client import RunningHubClient
+from http_pool import get_shared_pool
+from streaming_upload import StreamingUpload, build_multipart_body
+from download_manager import DownloadManager
+from task_watcher import TaskWatcher
+from admission import get_admission_scheduler
+from workflow_cache import get_workflow_cache
+from task_store import get_task_store, account_id
+from upload_cache import get_upload_cache
+from result_cache import get_result_cache, result_key
+
 try:
     from config import IMAGE_NODE_ID
 except ImportError:
@@ -30,11 +48,164 @@ app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 最大500MB
 Path(INPUT_DIR).mkdir(exist_ok=True)
 Path(OUTPUT_DIR).mkdir(exist_ok=True)
 
+# 所有任务的状态由同一个监视器统一轮询，多个浏览器查询同一任务时不会重复请求API
+rh_client = RunningHubClient(API_KEY)
+rh_client.BASE_URL = BASE_URL
+task_watcher = TaskWatcher(rh_client.query_task_status)
+
+
+def fetch_remote_task_count():
+    """查询账户当前远程任务数，用于并发调度器校准"""
+    result = rh_client.get_account_status()
+    if result.get('code') != 0:
+        raise Exception(result.get('msg'))
+    return int(result['data']['currentTaskCounts'])
+
+
+# 与本机其他进程（如 ComfyUI 节点）共享同一账户的并发额度
+admission = get_admission_scheduler(API_KEY)
+
+# 工作流JSON缓存（内存 + 磁盘）
+workflow_cache = get_workflow_cache(rh_client.get_workflow_json)
+
+# 任务状态持久化（服务重启后继续跟踪未结束的任务）
+task_store = get_task_store()
+
+# 上传去重（内容哈希 -> RunningHub fileName，与 ComfyUI 节点共用）
+upload_cache = get_upload_cache()
+
+# 结果缓存（可选，默认关闭）
+result_cache = get_result_cache() if RESULT_CACHE_ENABLED else None
+
+# 输出文件下载管理（后台并行下载，支持断点续传）
+downloader = DownloadManager(OUTPUT_DIR)
+
+# 已完成任务的输出列表（taskId -> RunningHub 返回结果）
+task_outputs = OrderedDict()
+task_outputs_lock = threading.Lock()
+task_outputs_fetching = {}
+
+# 已提交、尚未取得输出的任务对应的结果缓存键（taskId -> (key, workflowId)）
+task_result_keys = {}
+
+# SSE 心跳间隔（秒），防止空闲连接被代理断开
+SSE_KEEPALIVE = 15
+
 # 允许的文件类型
 ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv'}
 ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
 
 
+def webhook_url():
+    """任务结束回调地址；WEBHOOK_BASE_URL 和 WEBHOOK_SECRET 都配置时才启用，否则返回None"""
+    if not WEBHOOK_BASE_URL or not WEBHOOK_SECRET:
+        return None
+    return f"{WEBHOOK_BASE_URL.rstrip('/')}/api/webhook/runninghub?token={WEBHOOK_SECRET}"
+
+
+def cache_key(workflow_id, node_info_list):
+    """结果缓存键，已上传文件按内容哈希计入"""
+    return result_key(workflow_id, node_info_list, resolve=lambda name: upload_cache.digest_for(name, API_KEY))
+
+
+def cached_task(hit):
+    """把命中的缓存结果当作一个已成功的任务返回，状态查询、SSE 和 get_outputs 都直接使用缓存的输出"""
+    task_id = hit['taskId']
+    remember_outputs(task_id, {'code': 0, 'msg': 'success', 'data': hit['outputs']})
+    task_watcher.update(task_id, 'SUCCESS')
+    return {'code': 0, 'msg': 'success', 'data': {'taskId': task_id, 'taskStatus': 'SUCCESS', 'cached': True}}
+
+
+def submit_task(payload, workflow_id, use_cache=True):
+    """
+    创建任务；配置了 CONCURRENCY_LIMIT 时先申请并发槽位，任务结束（含监视器放弃）时释放
+    启用结果缓存时，相同输入直接返回上次的任务（use_cache 为 False 时强制重新运行）
+    """
+    key = None
+    if result_cache is not None:
+        key = cache_key(workflow_id, payload.get('nodeInfoList'))
+        hit = result_cache.get(key) if use_cache else None
+        if hit is not None:
+            return cached_task(hit)
+    
+    slot = None
+    if CONCURRENCY_LIMIT:
+        try:
+            slot = admission.acquire(limit=CONCURRENCY_LIMIT, timeout=ADMISSION_TIMEOUT,
+                                     fetch_remote_count=fetch_remote_task_count)
+        except TimeoutError:
+            return {'code': 421, 'msg': '并发任务已达上限，请稍后重试', 'data': None}
+    
+    def release_slot():
+        if slot is not None:
+            slot.release()
+    
+    callback = webhook_url()
+    if callback:
+        payload = dict(payload, webhookUrl=callback)
+    
+    try:
+        resp = requests.post(f"{BASE_URL}/task/openapi/create", headers=HEADERS, json=payload, timeout=30)
+        result = resp.json()
+    except Exception:
+        release_slot()
+        raise
+    
+    if result.get('code') != 0 or not result.get('data'):
+        release_slot()
+        return result
+    
+    def release_when_done(snapshot):
+        # done 包括 SUCCESS/FAILED 以及监视器放弃时的 ERROR，卡住的任务不会一直占用槽位
+        if snapshot['done']:
+            release_slot()
+            if snapshot['status'] != 'SUCCESS':
+                with task_outputs_lock:
+                    task_result_keys.pop(task_id, None)
+    
+    task_id = result['data'].get('taskId')
+    if key is not None:
+        with task_outputs_lock:
+            task_result_keys[task_id] = (key, workflow_id)
+    task_store.record_created(task_id, workflow_id, payload.get('nodeInfoList'),
+                              account=account_id(API_KEY), source='app')
+    task_watcher.watch(task_id, workflow_id=workflow_id, push='webhookUrl' in payload)
+    track_task(task_id)
+    task_watcher.subscribe(task_id, release_when_done)
+    return result
+
+
+def is_known_task(task_id):
+    """只监视本应用创建过（任务存储中有记录）的任务，避免客户端让服务端轮询任意ID"""
+    return task_watcher.snapshot(task_id) is not None or task_store.get(task_id) is not None
+
+
+def track_task(task_id):
+    """把监视器中的状态变化写入任务存储"""
+    def record(snapshot):
+        task_store.record_status(task_id, snapshot['status'])
+    
+    task_watcher.subscribe(task_id, record)
+
+
+def recover_tasks():
+    """启动时恢复跟踪上次运行时尚未结束的任务（不会重新提交），成功后在后台下载输出"""
+    tasks = task_store.unfinished(account=account_id(API_KEY))
+    for task in tasks:
+        task_id = task['taskId']
+        task_watcher.watch(task_id, workflow_id=task['workflowId'])
+        track_task(task_id)
+        
+        def download_when_done(snapshot, task_id=task_id):
+            if snapshot['status'] == 'SUCCESS':
+                threading.Thread(target=load_outputs, args=(task_id, True), daemon=True).start()
+        
+        task_watcher.subscribe(task_id, download_when_done)
+    if tasks:
+        print(f"已恢复 {len(tasks)} 个未结束的任务")
+    return [task['taskId'] for task in tasks]
+
+
 def allowed_file(filename, file_type):
     """检查文件类型是否允许"""
     ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
@@ -53,38 +224,56 @@ def index():
 
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
-    """上传文件到RunningHub"""
+    """上传文件到RunningHub（边接收边转发，不落盘）"""
     try:
-        if 'file' not in request.files:
+        boundary = request.mimetype_params.get('boundary')
+        if request.mimetype != 'multipart/form-data' or not boundary:
             return jsonify({'code': -1, 'msg': '没有文件'}), 400
         
-        file = request.files['file']
-        file_type = request.form.get('type', 'video')
+        # 只读取到文件部分开头，文件内容在转发时再按需读取
+        upload = StreamingUpload(request.stream, boundary)
+        part = upload.read_until_file()
+        if part is None:
+            return jsonify({'code': -1, 'msg': '没有文件'}), 400
         
-        if file.filename == '':
+        if part.filename == '':
             return jsonify({'code': -1, 'msg': '文件名为空'}), 400
         
-        if not allowed_file(file.filename, file_type):
-            return jsonify({'code': -1, 'msg': '不支持的文件类型'}), 400
+        # 前端应先发送 type 字段；若在文件之后才发送，则按扩展名推断
+        ext = part.filename.rsplit('.', 1)[1].lower() if '.' in part.filename else ''
+        file_type = upload.fields.get('type') or ('video' if ext in ALLOWED_VIDEO_EXTENSIONS else 'image')
         
-        # 保存到临时目录
-        filename = secure_filename(file.filename)
-        temp_dir = tempfile.gettempdir()
-        local_path = Path(temp_dir) / filename
-        file.save(local_path)
+        if not allowed_file(part.filename, file_type):
+            return jsonify({'code': -1, 'msg': '不支持的文件类型'}), 400
         
-        # 上传到RunningHub
+        # 上传到RunningHub（中文文件名经 secure_filename 处理后可能只剩扩展名）
+        filename = secure_filename(part.filename)
+        if '.' not in filename:
+            filename = f'upload.{ext}'
         upload_url = f"{BASE_URL}/task/openapi/upload"
+        kind = 'video' if file_type == 'video' else 'image'
+        digest = hashlib.sha256()
+        
+        def hashed_chunks():
+            # 转发的同时计算内容哈希，成功后记入去重缓存
+            for chunk in upload.iter_file():
+                digest.update(chunk)
+                yield chunk
+        
+        content_type, body = build_multipart_body(
+            {'apiKey': API_KEY, 'fileType': 'input'},
+            'file',
+            filename,
+            f'{kind}/{ext}',
+            hashed_chunks()
+        )
+        headers = dict(UPLOAD_HEADERS, **{'Content-Type': content_type})
+        
+        resp = get_shared_pool().post(upload_url, data=body, headers=headers, timeout=120)
+        result = resp.json()
         
-        with open(local_path, 'rb') as f:
-            files = {'file': (filename, f, f'{"video" if file_type == "video" else "image"}/{filename.rsplit(".", 1)[1]}')}
-            data = {'apiKey': API_KEY, 'fileType': 'input'}
-            
-            resp = requests.post(upload_url, data=data, files=files, headers=UPLOAD_HEADERS, timeout=120)
-            result = resp.json()
-        
-        # 删除本地临时文件
-        local_path.unlink(missing_ok=True)
+        if result.get('code') == 0 and (result.get('data') or {}).get('fileName'):
+            upload_cache.put(digest.hexdigest(), API_KEY, kind, result['data']['fileName'], size=upload.file_size)
         
         return jsonify(result)
         
@@ -92,6 +281,22 @@ def upload_file():
         return jsonify({'code': -1, 'msg': f'上传失败: {str(e)}'}), 500
 
 
+@app.route('/api/upload/check', methods=['POST'])
+def check_upload():
+    """按内容哈希（SHA-256）查询文件是否已上传过，命中时页面无需再上传"""
+    data = request.get_json(silent=True) or {}
+    digest = str(data.get('sha256') or '').lower()
+    if len(digest) != 64:
+        return jsonify({'code': -1, 'msg': '缺少文件哈希'}), 400
+    
+    # 与上传时相同的类型（网页发送 type 字段），与 ComfyUI 上传节点共用同一类型
+    kind = 'video' if data.get('type') == 'video' else 'image'
+    file_name = upload_cache.get(digest, API_KEY, kind)
+    if not file_name:
+        return jsonify({'code': 1, 'msg': '未上传过', 'data': None})
+    return jsonify({'code': 0, 'msg': 'success', 'data': {'fileName': file_name, 'fileType': 'input', 'cached': True}})
+
+
 @app.route('/api/create_task', methods=['POST'])
 def create_task():
     """创建去水印任务"""
@@ -117,7 +322,6 @@ def create_task():
             field_name = 'image'
         
         # 创建任务
-        url = f"{BASE_URL}/task/openapi/create"
         payload = {
             "apiKey": API_KEY,
             "workflowId": workflow_id,
@@ -130,8 +334,7 @@ def create_task():
             ]
         }
         
-        resp = requests.post(url, headers=HEADERS, json=payload, timeout=30)
-        result = resp.json()
+        result = submit_task(payload, workflow_id, use_cache=not data.get('noCache'))
         
         return jsonify(result)
         
@@ -149,18 +352,107 @@ def query_status():
         if not task_id:
             return jsonify({'code': -1, 'msg': '缺少任务ID'}), 400
         
-        url = f"{BASE_URL}/task/openapi/status"
-        payload = {"apiKey": API_KEY, "taskId": task_id}
+        if not is_known_task(task_id):
+            return jsonify({'code': -1, 'msg': '未知的任务ID'}), 404
         
-        resp = requests.post(url, headers=HEADERS, json=payload, timeout=30)
-        result = resp.json()
+        # 返回监视器缓存的状态；查询暂时失败时返回最近一次已知状态
+        task_watcher.watch(task_id)
+        snapshot = task_watcher.snapshot(task_id, wait_first=30)
         
-        return jsonify(result)
+        if snapshot is None or snapshot['status'] in (None, 'ERROR'):
+            # 尚无状态，或监视器已放弃该任务
+            error = snapshot.get('lastError') if snapshot else None
+            return jsonify({'code': -1, 'msg': error or '查询超时', 'data': None})
+        
+        return jsonify({'code': 0, 'msg': 'success', 'data': snapshot['status']})
         
     except Exception as e:
         return jsonify({'code': -1, 'msg': f'查询失败: {str(e)}'}), 500
 
 
+def remember_outputs(task_id, result):
+    """缓存已完成任务的输出列表"""
+    task_store.record_outputs(task_id, result['data'])
+    with task_outputs_lock:
+        task_outputs[task_id] = result
+        while len(task_outputs) > 256:
+            task_outputs.popitem(last=False)
+        pending_key = task_result_keys.pop(task_id, None)
+    if pending_key is not None and result_cache is not None:
+        key, workflow_id = pending_key
+        result_cache.put(key, workflow_id, task_id, result['data'])
+
+
+def fetch_outputs(task_id):
+    """获取任务输出列表；已完成任务的输出不会变化，成功结果按任务缓存，多个页面共用一次请求"""
+    with task_outputs_lock:
+        cached = task_outputs.get(task_id)
+        if cached is not None:
+            return cached
+        task_lock = task_outputs_fetching.setdefault(task_id, threading.Lock())
+    
+    # 同一任务的并发请求只有一个真正访问 API，其余等待并复用结果
+    try:
+        with task_lock:
+            with task_outputs_lock:
+                cached = task_outputs.get(task_id)
+            if cached is not None:
+                return cached
+            
+            url = f"{BASE_URL}/task/openapi/outputs"
+            payload = {"apiKey": API_KEY, "taskId": task_id}
+            
+            resp = requests.post(url, headers=HEADERS, json=payload, timeout=30)
+            result = resp.json()
+            
+            if result.get('code') == 0 and result.get('data'):
+                remember_outputs(task_id, result)
+            return result
+    finally:
+        # 无论命中、失败还是异常都移除，避免每个查询过的任务ID都留下一把锁
+        with task_outputs_lock:
+            if task_outputs_fetching.get(task_id) is task_lock:
+                del task_outputs_fetching[task_id]
+
+
+def load_outputs(task_id, background=False):
+    """获取任务输出并下载到本地（并行、流式写盘、断点续传），返回带 localUrl 的结果"""
+    result = fetch_outputs(task_id)
+    if result.get('code') != 0 or not result.get('data'):
+        return result
+    
+    result = dict(result, data=[dict(item) for item in result['data']])
+    
+    def record_file(future):
+        if future.exception() is None:
+            task_store.add_local_file(task_id, future.result())
+    
+    pending = []
+    for item in result['data']:
+        file_url = item.get('fileUrl')
+        if file_url:
+            # 从URL中提取文件名
+            file_name = secure_filename(file_url.split('/')[-1].split('?')[0])
+            future = downloader.submit(file_url, file_name)
+            future.add_done_callback(record_file)
+            pending.append((item, file_name, future))
+    
+    for item, file_name, future in pending:
+        if background:
+            # 立即返回，文件下载完成前访问 localUrl 会得到 202
+            item['localUrl'] = f'/output/{file_name}'
+            item['downloadStatus'] = downloader.status(file_name)
+            continue
+        try:
+            future.result()
+            item['localUrl'] = f'/output/{file_name}'
+            item['downloadStatus'] = 'done'
+        except Exception as e:
+            item['downloadStatus'] = 'failed'
+            print(f"下载文件失败: {e}")
+    return result
+
+
 @app.route('/api/get_outputs', methods=['POST'])
 def get_outputs():
     """获取任务输出"""
@@ -171,38 +463,123 @@ def get_outputs():
         if not task_id:
             return jsonify({'code': -1, 'msg': '缺少任务ID'}), 400
         
-        url = f"{BASE_URL}/task/openapi/outputs"
-        payload = {"apiKey": API_KEY, "taskId": task_id}
-        
-        resp = requests.post(url, headers=HEADERS, json=payload, timeout=30)
-        result = resp.json()
-        
-        # 如果有输出文件，下载到本地
-        if result.get('code') == 0 and result.get('data'):
-            for item in result['data']:
-                file_url = item.get('fileUrl')
-                if file_url:
-                    try:
-                        file_resp = requests.get(file_url, timeout=300)
-                        if file_resp.status_code == 200:
-                            # 从URL中提取文件名
-                            file_name = file_url.split('/')[-1]
-                            local_path = Path(OUTPUT_DIR) / file_name
-                            with open(local_path, 'wb') as f:
-                                f.write(file_resp.content)
-                            item['localUrl'] = f'/output/{file_name}'
-                    except Exception as e:
-                        print(f"下载文件失败: {e}")
-        
-        return jsonify(result)
+        return jsonify(load_outputs(task_id, background=data.get('background', False)))
         
     except Exception as e:
         return jsonify({'code': -1, 'msg': f'获取输出失败: {str(e)}'}), 500
 
 
+@app.route('/api/tasks', methods=['GET'])
+def list_tasks():
+    """列出已提交的任务（可按 status / workflowId 筛选），页面刷新或服务重启后仍可找回"""
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+        tasks = task_store.list(
+            status=request.args.get('status'),
+            workflow_id=request.args.get('workflowId'),
+            limit=limit
+        )
+        return jsonify({'code': 0, 'msg': 'success', 'data': tasks})
+    except Exception as e:
+        return jsonify({'code': -1, 'msg': f'查询失败: {str(e)}'}), 500
+
+
+@app.route('/api/tasks/<task_id>/events')
+def task_events(task_id):
+    """
+    以 Server-Sent Events 推送任务状态
+    状态来自服务端监视器，无论打开多少页面，每个任务只轮询一次 RunningHub
+    """
+    if not is_known_task(task_id):
+        return jsonify({'code': -1, 'msg': '未知的任务ID'}), 404
+    
+    def sse(data, event=None):
+        head = f"event: {event}\n" if event else ""
+        return f"{head}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    def stream():
+        events = task_watcher.subscribe_queue(task_id)
+        try:
+            last_status = None
+            while True:
+                try:
+                    snapshot = events.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                
+                status = snapshot['status']
+                if status == 'ERROR':
+                    # 监视器已放弃（持续查询失败或超时）
+                    yield sse({'taskId': task_id, 'msg': snapshot.get('lastError') or '查询状态失败'}, 'error')
+                    return
+                if snapshot['errors'] >= task_watcher.config.max_errors:
+                    # 连续查询失败只是告警，监视器会继续轮询
+                    yield sse({'taskId': task_id, 'msg': snapshot.get('lastError') or '查询失败'}, 'warning')
+                    continue
+                if status is None or (status == last_status and not snapshot['done']):
+                    continue
+                last_status = status
+                
+                message = {'taskId': task_id, 'status': status, 'done': snapshot['done']}
+                if status == 'SUCCESS':
+                    outputs = load_outputs(task_id, background=True)
+                    if outputs.get('code') != 0:
+                        yield sse({'taskId': task_id, 'msg': outputs.get('msg') or '获取输出失败'}, 'error')
+                        return
+                    for item in outputs['data']:
+                        # 本地文件尚未下载完成时页面直接使用 fileUrl
+                        if item.get('downloadStatus') != 'done':
+                            item.pop('localUrl', None)
+                    message['outputs'] = outputs['data']
+                yield sse(message)
+                if snapshot['done']:
+                    return
+        finally:
+            task_watcher.unsubscribe(task_id, events)
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # 禁止反向代理缓冲
+    })
+
+
+@app.route('/api/webhook/runninghub', methods=['POST'])
+def runninghub_webhook():
+    """
+    接收 RunningHub 任务结束回调
+    请求体: {"event": "TASK_END", "taskId": "...", "eventData": "..."}
+    回调内容不可信，只作为唤醒信号：状态和输出都重新向 API 查询，eventData 不会被使用
+    """
+    # 未配置令牌时不接受回调（服务监听 0.0.0.0，任务ID可从 /api/tasks 获得）
+    if not WEBHOOK_SECRET or not hmac.compare_digest(request.args.get('token', ''), WEBHOOK_SECRET):
+        return jsonify({'code': -1, 'msg': '校验失败'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    task_id = str(data.get('taskId') or '')
+    if not task_id:
+        return jsonify({'code': -1, 'msg': '缺少任务ID'}), 400
+    if data.get('event') != 'TASK_END':
+        return jsonify({'code': 0, 'msg': 'ignored'})
+    
+    # 只接受本服务提交（正在监视）的任务
+    snapshot = task_watcher.refresh(task_id)
+    if snapshot is None:
+        return jsonify({'code': -1, 'msg': '未知任务'}), 404
+    
+    if snapshot['status'] == 'SUCCESS':
+        # 输出经 fetch_outputs 从 API 获取；成功但没有输出的任务保持 SUCCESS
+        load_outputs(task_id, background=True)
+    
+    return jsonify({'code': 0, 'msg': 'success'})
+
+
 @app.route('/output/<filename>')
 def serve_output(filename):
     """提供输出文件下载"""
+    status = downloader.status(filename)
+    if status == 'pending':
+        return jsonify({'code': 1, 'msg': '文件下载中', 'data': {'downloadStatus': status}}), 202
     return send_from_directory(OUTPUT_DIR, filename)
 
 
@@ -214,19 +591,12 @@ def pose_page():
 
 @app.route('/api/get_workflow_prompts', methods=['GET'])
 def get_workflow_prompts():
-    """获取工作流的默认提示词（实时从RunningHub获取）"""
+    """获取工作流的默认提示词（从RunningHub获取，带缓存）"""
     try:
-        # 从RunningHub获取工作流JSON
-        url = f"{BASE_URL}/api/openapi/getJsonApiFormat"
-        payload = {
-            "apiKey": API_KEY,
-            "workflowId": POSE_WORKFLOW_ID
-        }
-        
-        resp = requests.post(url, headers=HEADERS, json=payload, timeout=30)
-        result = resp.json()
+        # 工作流JSON走缓存，过期时先返回旧数据并在后台刷新
+        prompt_data = workflow_cache.get(POSE_WORKFLOW_ID, account=account_id(API_KEY))
         
-        if result.get("code") != 0:
+        if prompt_data is None:
             # 如果获取失败，返回本地配置的默认值
             return jsonify({
                 'code': 0,
@@ -237,11 +607,6 @@ def get_workflow_prompts():
                 }
             })
         
-        # 解析工作流JSON
-        workflow_data = result.get("data", {})
-        prompt_str = workflow_data.get("prompt", "{}")
-        prompt_data = json.loads(prompt_str)
-        
         # 提取提示词
         prompt1 = POSE_DEFAULT_PROMPT1
         prompt2 = POSE_DEFAULT_PROMPT2
@@ -298,7 +663,6 @@ def create_pose_task():
             return jsonify({'code': -1, 'msg': '缺少姿势参考图文件名'}), 400
 
         # 创建任务
-        url = f"{BASE_URL}/task/openapi/create"
         node_info_list = [
             {
                 "nodeId": POSE_SOURCE_IMAGE_NODE_ID,
@@ -331,8 +695,7 @@ def create_pose_task():
             "nodeInfoList": node_info_list
         }
 
-        resp = requests.post(url, headers=HEADERS, json=payload, timeout=30)
-        result = resp.json()
+        result = submit_task(payload, POSE_WORKFLOW_ID, use_cache=not data.get('noCache'))
 
         return jsonify(result)
 
@@ -340,5 +703,24 @@ def create_pose_task():
         return jsonify({'code': -1, 'msg': f'创建任务失败: {str(e)}'}), 500
 
 
+def is_reloader_parent():
+    """是否为 werkzeug 重载器的父进程：它只监视文件并重启子进程，不提供服务"""
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        return False
+    if __name__ == '__main__':
+        return True  # 下方 app.run(debug=True) 总是启用重载器
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true' and 'run' in sys.argv:
+        # flask run：--reload/--no-reload 显式指定，否则调试模式下启用
+        if '--no-reload' in sys.argv:
+            return False
+        return '--reload' in sys.argv or get_debug_flag()
+    return False
+
+
+# 加载时恢复一次上次未结束的任务（python app.py、flask run 和 WSGI 服务器均适用）
+if not is_reloader_parent():
+    recover_tasks()
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
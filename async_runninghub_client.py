@@ -0,0 +1,242 @@
+"""
+RunningHub API 异步客户端
+与 RunningHubClient 接口一致的 asyncio 版本，单个事件循环即可驱动大量并发任务
+
+使用方法:
+    import asyncio
+    from async_runninghub_client import AsyncRunningHubClient
+
+    async def main():
+        async with AsyncRunningHubClient(api_key="your-api-key") as client:
+            results = await asyncio.gather(*[
+                client.run_workflow("2016195556967714818") for _ in range(100)
+            ])
+
+    asyncio.run(main())
+
+依赖:
+    aiohttp（见 requirements.txt）
+"""
+
+import asyncio
+import os
+from typing import Optional, List, Dict, Any
+
+try:
+    import aiohttp
+    aiohttp_available = True
+except ImportError:
+    aiohttp = None
+    aiohttp_available = False
+
+from runninghub_client import BaseRunningHubClient
+from upload_cache import UploadCache, get_upload_cache, media_kind
+
+
+class AsyncRunningHubClient(BaseRunningHubClient):
+    """RunningHub API 异步客户端"""
+
+    def __init__(
+        self,
+        api_key: str,
+        session: Optional["aiohttp.ClientSession"] = None,
+        limit: int = 100,
+        limit_per_host: int = 50,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        upload_cache: Optional[UploadCache] = None
+    ):
+        """
+        初始化客户端
+
+        Args:
+            api_key: RunningHub API Key (32位字符串)
+            session: 外部传入的 aiohttp 会话，默认在首次请求时自动创建
+            limit: 连接池总连接数上限，超出的请求会排队等待而不是失败
+            limit_per_host: 每个主机的连接数上限
+            connect_timeout: 建立连接超时（秒）
+            read_timeout: 读取响应超时（秒）
+            upload_cache: 上传去重缓存，默认使用本机共享缓存
+        """
+        if not aiohttp_available:
+            raise ImportError("AsyncRunningHubClient 需要 aiohttp，请先执行: pip install aiohttp")
+
+        super().__init__(api_key)
+        self._session = session
+        self._owns_session = session is None
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.upload_cache = upload_cache or get_upload_cache()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        """获取会话（首次调用时创建，连接在各协程间复用）"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._owns_session = True
+        return self._session
+
+    def _timeout(self, read_timeout: Optional[float] = None) -> "aiohttp.ClientTimeout":
+        return aiohttp.ClientTimeout(
+            sock_connect=self.connect_timeout,
+            sock_read=read_timeout or self.read_timeout
+        )
+
+    async def close(self):
+        """关闭由客户端创建的会话"""
+        if self._owns_session and self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _post(self, endpoint: str, payload: Dict) -> Dict[str, Any]:
+        """发送POST请求"""
+        url = f"{self.BASE_URL}{endpoint}"
+        try:
+            async with self._get_session().post(
+                url, headers=self.headers, json=payload, timeout=self._timeout()
+            ) as resp:
+                resp.raise_for_status()
+                return await resp.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return self._error_result(f"请求异常: {str(e) or type(e).__name__}")
+
+    async def _upload(self, file_path: str, content_type: str, timeout: float) -> Dict[str, Any]:
+        """以 multipart/form-data 上传本地文件，相同内容已上传过时直接返回缓存的 fileName"""
+        url = f"{self.BASE_URL}{self.UPLOAD_ENDPOINT}"
+        loop = asyncio.get_running_loop()
+        try:
+            # 哈希计算需要读取整个文件，放到线程中避免阻塞事件循环
+            digest = await loop.run_in_executor(None, self.upload_cache.hash_file, file_path)
+            file_name = self.upload_cache.get(digest, self.api_key, media_kind(content_type))
+            if file_name:
+                return {"code": 0, "msg": "success", "data": {"fileName": file_name, "fileType": "input", "cached": True}}
+
+            # 打开和关闭文件同样放到线程中；aiohttp 发送文件时按块在线程中读取，不会一次读入内存
+            f = await loop.run_in_executor(None, open, file_path, 'rb')
+            try:
+                size = os.fstat(f.fileno()).st_size
+                form = aiohttp.FormData()
+                form.add_field('file', f, filename=os.path.basename(file_path), content_type=content_type)
+                async with self._get_session().post(
+                    url, headers=self.upload_headers, data=form, timeout=self._timeout(timeout)
+                ) as resp:
+                    resp.raise_for_status()
+                    result = await resp.json(content_type=None)
+            finally:
+                await loop.run_in_executor(None, f.close)
+        except FileNotFoundError:
+            return self._error_result(f"文件不存在: {file_path}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return self._error_result(f"上传失败: {str(e) or type(e).__name__}")
+
+        if result.get("code") == 0 and (result.get("data") or {}).get("fileName"):
+            self.upload_cache.put(digest, self.api_key, media_kind(content_type), result["data"]["fileName"],
+                                  size=size)
+        return result
+
+    async def get_account_status(self) -> Dict[str, Any]:
+        """获取账户信息"""
+        return await self._post(self.ACCOUNT_STATUS_ENDPOINT, self._account_status_payload())
+
+    async def get_workflow_json(self, workflow_id: str) -> Dict[str, Any]:
+        """获取工作流JSON结构"""
+        return await self._post(self.WORKFLOW_JSON_ENDPOINT, self._workflow_payload(workflow_id))
+
+    async def create_task(
+        self,
+        workflow_id: str,
+        node_info_list: Optional[List[Dict]] = None,
+        webhook_url: Optional[str] = None,
+        instance_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """创建任务，参数同 RunningHubClient.create_task"""
+        payload = self._create_task_payload(workflow_id, node_info_list, webhook_url, instance_type)
+        return await self._post(self.CREATE_TASK_ENDPOINT, payload)
+
+    async def query_task_status(self, task_id: str) -> Dict[str, Any]:
+        """查询任务状态"""
+        return await self._post(self.TASK_STATUS_ENDPOINT, self._task_payload(task_id))
+
+    async def get_task_outputs(self, task_id: str) -> Dict[str, Any]:
+        """获取任务生成结果"""
+        return await self._post(self.TASK_OUTPUTS_ENDPOINT, self._task_payload(task_id))
+
+    async def cancel_task(self, task_id: str) -> Dict[str, Any]:
+        """取消任务"""
+        return await self._post(self.CANCEL_TASK_ENDPOINT, self._task_payload(task_id))
+
+    async def upload_image(self, image_path: str) -> Dict[str, Any]:
+        """上传图片到 RunningHub"""
+        return await self._upload(image_path, 'image/jpeg', self.IMAGE_UPLOAD_TIMEOUT)
+
+    async def upload_video(self, video_path: str) -> Dict[str, Any]:
+        """上传视频到 RunningHub"""
+        return await self._upload(video_path, 'video/mp4', self.VIDEO_UPLOAD_TIMEOUT)
+
+    async def wait_for_task(
+        self,
+        task_id: str,
+        max_retries: int = 30,
+        interval: float = 10,
+        callback=None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        轮询等待任务完成（等待期间不占用线程）
+
+        Args:
+            task_id: 任务ID
+            max_retries: 最大重试次数，默认30次
+            interval: 轮询间隔（秒），默认10秒
+            callback: 状态变更回调函数，接收(status, retry_count)参数
+
+        Returns:
+            任务成功时返回输出结果，失败或超时返回None
+        """
+        print(f"开始轮询任务状态 (taskId: {task_id})...")
+
+        for i in range(max_retries):
+            result = await self.query_task_status(task_id)
+            outcome = self._handle_poll_result(result, i, max_retries, callback)
+
+            if outcome == "SUCCESS":
+                return await self.get_task_outputs(task_id)
+            elif outcome in ("FAILED", "ERROR"):
+                return None
+
+            await asyncio.sleep(interval)
+
+        print("⏰ 轮询超时，任务可能仍在执行中")
+        return None
+
+    async def run_workflow(
+        self,
+        workflow_id: str,
+        node_info_list: Optional[List[Dict]] = None,
+        max_retries: int = 30,
+        interval: float = 10,
+        webhook_url: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        运行完整工作流（创建任务 + 轮询等待 + 获取结果）
+
+        Returns:
+            任务成功时返回输出结果，失败返回None
+        """
+        create_result = await self.create_task(
+            workflow_id=workflow_id,
+            node_info_list=node_info_list,
+            webhook_url=webhook_url
+        )
+
+        task_id = self._parse_created_task(create_result)
+        if not task_id:
+            return None
+
+        return await self.wait_for_task(task_id, max_retries, interval)
@@ -1,12 +1,507 @@
 """
 ComfyUI 图片加密/解密节点
 支持密码保护，完全在节点内完成加解密
+
+算法说明:
+    - 每张图片按 (密码种子, 图片序号, 用途) 建立独立的 np.random.Generator 流，
+      结果与批大小、处理顺序无关，批内图片在线程池中并行处理（numpy 运算会释放 GIL）
+    - XOR: 像素量化为 0-255 级后与同形状的 float32 密钥做模 256 加法，解密时做模 256 减法，
+      8 位图片可精确还原（旧实现的 |img - key| 不可逆）
+    - SHUFFLE: 对 H*W 个像素位置做随机置换（int32 索引）
+    - COMBINE: 先 XOR 再 SHUFFLE，量化、加密钥在同一缓冲区原地完成，再一次 gather 写入输出
+    - 置换、逆置换和密钥只由 (种子, 序号, 形状) 决定，缓存在有内存上限的 LRU 中（CryptoCache），
+      同一密码、同一分辨率反复加解密时不再重新生成；上限由环境变量 RH_CRYPTO_CACHE_MB 设置（默认 512）
+    - 节点使用 torch 实现（encrypt_tensor/decrypt_tensor），张量保持原 dtype 和设备，不经过 numpy 往返；
+      numpy 实现（encrypt_batch/decrypt_batch）保留为逐位一致的参考实现
+    - 分块模式（memory_budget）：逐帧、按行块处理，密钥与噪声按块顺序生成（与整帧生成的序列相同），
+      临时内存不超过预算，结果与整帧处理一致；encrypt_frames/decrypt_frames 以生成器方式逐帧处理
 """
 
-import torch
-import numpy as np
-from PIL import Image
 import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+ENCRYPT_MODES = ["XOR", "SHUFFLE", "COMBINE"]
+LEVELS = 255.0
+
+# 随机流用途，与种子、图片序号一起决定每个流
+STREAM_KEY = 0
+STREAM_PERMUTATION = 1
+STREAM_NOISE = 2
+
+# 批内并行处理的线程数
+CRYPTO_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def password_to_seed(password):
+    """将密码转换为随机种子"""
+    if not password:
+        return 42  # 默认种子
+    hash_obj = hashlib.md5(password.encode('utf-8'))
+    return int(hash_obj.hexdigest(), 16) % (2**32)
+
+
+def image_rng(seed, index, stream):
+    """第 index 张图片某一用途的独立随机流"""
+    return np.random.default_rng([seed, index, stream])
+
+
+def _next_key(rng, shape):
+    """从密钥流中取下一段；分段连续取出与一次取出的结果相同"""
+    key = rng.random(shape, dtype=np.float32)
+    key *= 256.0
+    np.floor(key, out=key)
+    return key
+
+
+def make_keystream(seed, index, shape):
+    """生成 0-255 整数级的 float32 密钥（直接生成 float32，不经过 uint8/float64）"""
+    return _next_key(image_rng(seed, index, STREAM_KEY), shape)
+
+
+def make_permutation(seed, index, pixels):
+    """生成像素位置的随机置换（int32，原地打乱，不产生 int64 临时数组）"""
+    perm = np.arange(pixels, dtype=np.int32)
+    image_rng(seed, index, STREAM_PERMUTATION).shuffle(perm)
+    return perm
+
+
+def invert_permutation(perm):
+    """置换的逆：inverse[perm[i]] = i"""
+    inverse = np.empty_like(perm)
+    inverse[perm] = np.arange(perm.size, dtype=perm.dtype)
+    return inverse
+
+
+class CryptoCache:
+    """
+    置换、逆置换与密钥的 LRU 缓存，按总字节数限制大小
+    条目以 CPU torch 张量保存：numpy 实现取其只读视图，torch 实现直接使用，其他设备上的副本另行缓存
+    """
+
+    def __init__(self, max_bytes=None):
+        """
+        Args:
+            max_bytes: 缓存数组的总字节数上限，默认取环境变量 RH_CRYPTO_CACHE_MB（MB，默认 512）；0 表示不缓存
+        """
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("RH_CRYPTO_CACHE_MB", 512)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _get(self, key, build):
+        with self._lock:
+            tensor = self._entries.get(key)
+            if tensor is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return tensor
+            self._stats["misses"] += 1
+
+        tensor = build()
+        size = tensor.numel() * tensor.element_size()
+        if size > self.max_bytes:
+            return tensor
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = tensor
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= evicted.numel() * evicted.element_size()
+                    self._stats["evictions"] += 1
+        return tensor
+
+    def _tensor(self, key, build, device=None):
+        cpu = self._get(key, lambda: torch.from_numpy(build()))
+        if device is None or torch.device(device).type == "cpu":
+            return cpu
+        return self._get(key + (str(device),), lambda: cpu.to(device))
+
+    def _array(self, key, build):
+        array = self._tensor(key, build).numpy()
+        array.setflags(write=False)  # 缓存的数组在线程间共享，只读
+        return array
+
+    def keystream(self, seed, index, shape):
+        """make_keystream 的缓存版本"""
+        shape = tuple(shape)
+        return self._array(("key", seed, index, shape), lambda: make_keystream(seed, index, shape))
+
+    def permutation(self, seed, index, pixels):
+        """make_permutation 的缓存版本"""
+        return self._array(("perm", seed, index, pixels), lambda: make_permutation(seed, index, pixels))
+
+    def inverse_permutation(self, seed, index, pixels):
+        """逆置换，由（缓存的）置换求得"""
+        return self._array(("inverse", seed, index, pixels),
+                           lambda: invert_permutation(self.permutation(seed, index, pixels)))
+
+    def keystream_tensor(self, seed, index, shape, device=None):
+        """密钥的 torch 张量（在 device 上）"""
+        shape = tuple(shape)
+        return self._tensor(("key", seed, index, shape), lambda: make_keystream(seed, index, shape), device)
+
+    def permutation_tensor(self, seed, index, pixels, device=None):
+        """置换的 int32 torch 张量（在 device 上）"""
+        return self._tensor(("perm", seed, index, pixels), lambda: make_permutation(seed, index, pixels), device)
+
+    def inverse_permutation_tensor(self, seed, index, pixels, device=None):
+        """逆置换的 int32 torch 张量（在 device 上）"""
+        return self._tensor(("inverse", seed, index, pixels),
+                            lambda: invert_permutation(self.permutation(seed, index, pixels)), device)
+
+    def stats(self):
+        """命中/未命中/淘汰次数，以及当前条目数和字节数"""
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self._bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+# 进程级共享缓存
+_crypto_cache = None
+_crypto_cache_lock = threading.Lock()
+
+
+def get_crypto_cache():
+    """获取进程级共享的置换/密钥缓存"""
+    global _crypto_cache
+    with _crypto_cache_lock:
+        if _crypto_cache is None:
+            _crypto_cache = CryptoCache()
+        return _crypto_cache
+
+
+def _quantize(img, out):
+    """把 [0, 1] 浮点像素量化为 0-255 整数级，写入 out"""
+    np.multiply(img, LEVELS, out=out)
+    np.rint(out, out=out)
+    np.clip(out, 0.0, LEVELS, out=out)
+    return out
+
+
+def encrypt_array(img, seed, index, encrypt_mode, noise_strength=0.0, out=None, cache=None):
+    """
+    加密一张图片
+
+    Args:
+        img: numpy 数组 [H, W, C]，取值 0-1
+        seed: password_to_seed 得到的种子
+        index: 图片在批内的序号
+        encrypt_mode: 加密模式 (XOR/SHUFFLE/COMBINE)
+        noise_strength: 额外噪声强度（有损，解密后无法完全还原）
+        out: 可选的 float32 输出数组 [H, W, C]
+        cache: 置换/密钥缓存，默认使用进程级共享缓存
+
+    Returns:
+        加密后的 float32 数组 [H, W, C]
+    """
+    cache = cache or get_crypto_cache()
+    h, w, c = img.shape
+    if out is None:
+        out = np.empty((h, w, c), dtype=np.float32)
+    out_flat = out.reshape(h * w, c)
+
+    shuffle = encrypt_mode in ("SHUFFLE", "COMBINE")
+    levels = np.empty((h * w, c), dtype=np.float32) if shuffle else out_flat
+    _quantize(img.reshape(h * w, c), levels)
+
+    if encrypt_mode in ("XOR", "COMBINE"):
+        levels += cache.keystream(seed, index, (h * w, c))
+        # 和在 0-510 之间，减一次 256 即取模（比 np.remainder 快一个数量级）
+        np.subtract(levels, 256.0, out=levels, where=levels >= 256.0)
+
+    if shuffle:
+        np.take(levels, cache.permutation(seed, index, h * w), axis=0, out=out_flat)
+    out_flat /= LEVELS
+
+    # 添加可选噪声
+    if noise_strength > 0:
+        noise = image_rng(seed, index, STREAM_NOISE).standard_normal((h, w, c), dtype=np.float32)
+        noise *= noise_strength
+        out += noise
+        np.clip(out, 0.0, 1.0, out=out)
+    return out
+
+
+def decrypt_array(img, seed, index, encrypt_mode, out=None, cache=None):
+    """
+    解密一张图片，参数同 encrypt_array（模式必须与加密时一致）
+
+    Returns:
+        解密后的 float32 数组 [H, W, C]
+    """
+    cache = cache or get_crypto_cache()
+    h, w, c = img.shape
+    if out is None:
+        out = np.empty((h, w, c), dtype=np.float32)
+    out_flat = out.reshape(h * w, c)
+
+    if encrypt_mode in ("SHUFFLE", "COMBINE"):
+        levels = np.empty((h * w, c), dtype=np.float32)
+        _quantize(img.reshape(h * w, c), levels)
+        np.take(levels, cache.inverse_permutation(seed, index, h * w), axis=0, out=out_flat)
+    else:
+        _quantize(img.reshape(h * w, c), out_flat)
+
+    if encrypt_mode in ("XOR", "COMBINE"):
+        out_flat -= cache.keystream(seed, index, (h * w, c))
+        np.add(out_flat, 256.0, out=out_flat, where=out_flat < 0.0)
+    out_flat /= LEVELS
+    return out
+
+
+def _for_each_frame(fn, count, workers):
+    """对序号 0..count-1 调用 fn(index)，多张时在线程池中并行（numpy/torch 运算会释放 GIL）"""
+    workers = max(1, min(workers or CRYPTO_WORKERS, count))
+    if workers == 1:
+        for b in range(count):
+            fn(b)
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ImageCrypto") as pool:
+            list(pool.map(fn, range(count)))
+
+
+def _map_batch(fn, batch, workers):
+    """对批内每张图片调用 fn(img, index, out)，结果直接写入预分配的输出批"""
+    out = np.empty(batch.shape, dtype=np.float32)
+    _for_each_frame(lambda b: fn(batch[b], b, out[b]), len(batch), workers)
+    return out
+
+
+def encrypt_batch(batch, password, encrypt_mode, noise_strength=0.0, workers=None, cache=None):
+    """加密 numpy 批 [B, H, W, C]，返回 float32 批"""
+    seed = password_to_seed(password)
+    return _map_batch(lambda img, b, out: encrypt_array(img, seed, b, encrypt_mode, noise_strength, out, cache),
+                      batch, workers)
+
+
+def decrypt_batch(batch, password, encrypt_mode, workers=None, cache=None):
+    """解密 numpy 批 [B, H, W, C]，返回 float32 批"""
+    seed = password_to_seed(password)
+    return _map_batch(lambda img, b, out: decrypt_array(img, seed, b, encrypt_mode, out, cache), batch, workers)
+
+
+def _levels_divisor(device):
+    """0 维张量形式的 255：标量除数在部分后端会被换成乘倒数，结果与 numpy 参考实现不再逐位一致"""
+    return torch.full((), LEVELS, dtype=torch.float32, device=device)
+
+
+def _float_buffer(out_flat, shape, device):
+    """输出是 float32 时直接在输出上计算，否则使用临时 float32 缓冲区"""
+    if out_flat.dtype == torch.float32:
+        return out_flat
+    return torch.empty(shape, dtype=torch.float32, device=device)
+
+
+def _encrypt_frame_tensor(frame, seed, index, encrypt_mode, noise_strength, cache, out):
+    """加密一帧 [H, W, C]，写入 out；每帧使用自己的临时缓冲区，可在线程间并行"""
+    h, w, c = frame.shape
+    device = frame.device
+    shuffle = encrypt_mode in ("SHUFFLE", "COMBINE")
+    out_flat = out.view(h * w, c)
+    dest = _float_buffer(out_flat, (h * w, c), device)
+    current = torch.empty((h * w, c), dtype=torch.float32, device=device) if shuffle else dest
+    torch.mul(frame.reshape(h * w, c).to(torch.float32), LEVELS, out=current)
+    current.round_().clamp_(0.0, LEVELS)
+
+    if encrypt_mode in ("XOR", "COMBINE"):
+        current.add_(cache.keystream_tensor(seed, index, (h * w, c), device))
+        current.remainder_(256.0)  # 整数级除以 2 的幂，结果精确
+
+    if shuffle:
+        torch.index_select(current, 0, cache.permutation_tensor(seed, index, h * w, device), out=dest)
+    dest.div_(_levels_divisor(device))
+
+    if noise_strength > 0:
+        noise = image_rng(seed, index, STREAM_NOISE).standard_normal((h * w, c), dtype=np.float32)
+        noise_t = torch.from_numpy(noise).to(device)
+        noise_t.mul_(noise_strength)
+        dest.add_(noise_t).clamp_(0.0, 1.0)
+    if dest is not out_flat:
+        out_flat.copy_(dest)
+
+
+def _decrypt_frame_tensor(frame, seed, index, encrypt_mode, cache, out):
+    """解密一帧 [H, W, C]，写入 out，参数同 _encrypt_frame_tensor"""
+    h, w, c = frame.shape
+    device = frame.device
+    shuffle = encrypt_mode in ("SHUFFLE", "COMBINE")
+    out_flat = out.view(h * w, c)
+    dest = _float_buffer(out_flat, (h * w, c), device)
+    current = torch.empty((h * w, c), dtype=torch.float32, device=device) if shuffle else dest
+    torch.mul(frame.reshape(h * w, c).to(torch.float32), LEVELS, out=current)
+    current.round_().clamp_(0.0, LEVELS)
+
+    if shuffle:
+        torch.index_select(current, 0, cache.inverse_permutation_tensor(seed, index, h * w, device), out=dest)
+
+    if encrypt_mode in ("XOR", "COMBINE"):
+        dest.sub_(cache.keystream_tensor(seed, index, (h * w, c), device))
+        dest.remainder_(256.0)
+    dest.div_(_levels_divisor(device))
+    if dest is not out_flat:
+        out_flat.copy_(dest)
+
+
+def encrypt_tensor(image, password, encrypt_mode, noise_strength=0.0, cache=None, memory_budget=None, workers=None):
+    """
+    加密 torch 批 [B, H, W, C]，结果保持输入的 dtype 和设备
+    与 encrypt_batch 逐位一致（float32 输入）；置换用 index_select，密钥原地加
+    批内各帧（含缓存未命中时的置换/密钥生成）在 CRYPTO_WORKERS 线程池中并行，workers 可覆盖线程数
+    memory_budget: 临时内存预算（字节），设置后逐帧分块、串行处理，密钥不进入缓存
+    """
+    cache = cache or get_crypto_cache()
+    seed = password_to_seed(password)
+    out = torch.empty_like(image, memory_format=torch.contiguous_format)
+    if memory_budget:
+        for b in range(image.shape[0]):
+            _encrypt_frame_tiled(image[b], seed, b, encrypt_mode, noise_strength, memory_budget, cache, out[b])
+        return out
+    _for_each_frame(lambda b: _encrypt_frame_tensor(image[b], seed, b, encrypt_mode, noise_strength, cache, out[b]),
+                    image.shape[0], workers)
+    return out
+
+
+def decrypt_tensor(image, password, encrypt_mode, cache=None, memory_budget=None, workers=None):
+    """
+    解密 torch 批 [B, H, W, C]，结果保持输入的 dtype 和设备
+    与 decrypt_batch 逐位一致（float32 输入）；workers、memory_budget 同 encrypt_tensor
+    """
+    cache = cache or get_crypto_cache()
+    seed = password_to_seed(password)
+    out = torch.empty_like(image, memory_format=torch.contiguous_format)
+    if memory_budget:
+        for b in range(image.shape[0]):
+            _decrypt_frame_tiled(image[b], seed, b, encrypt_mode, memory_budget, cache, out[b])
+        return out
+    _for_each_frame(lambda b: _decrypt_frame_tensor(image[b], seed, b, encrypt_mode, cache, out[b]),
+                    image.shape[0], workers)
+    return out
+
+
+def _tile_pixels(height, width, channels, memory_budget):
+    """
+    按内存预算计算每块的像素数（整行）
+    每个像素的临时内存约为: 源像素 + 量化级 + 密钥 + 噪声（各 4 字节/通道）+ int64 索引
+    """
+    per_row = width * (channels * 16 + 8)
+    rows = max(1, min(height, int(memory_budget) // per_row))
+    return rows * width
+
+
+def _encrypt_frame_tiled(frame, seed, index, encrypt_mode, noise_strength, memory_budget, cache, out):
+    """
+    分块加密一帧 [H, W, C] 到 out
+    按源像素顺序分块：量化、加密钥后用逆置换把整块散射到输出位置，因此密钥按块顺序生成即可
+    """
+    h, w, c = frame.shape
+    device = frame.device
+    pixels = h * w
+    tile = _tile_pixels(h, w, c, memory_budget)
+    src = frame.reshape(pixels, c)
+    out_flat = out.view(pixels, c)
+    divisor = _levels_divisor(device)
+    shuffle = encrypt_mode in ("SHUFFLE", "COMBINE")
+    inverse = cache.inverse_permutation_tensor(seed, index, pixels, device) if shuffle else None
+    key_rng = image_rng(seed, index, STREAM_KEY) if encrypt_mode in ("XOR", "COMBINE") else None
+    buffer = torch.empty((tile, c), dtype=torch.float32, device=device)
+
+    for p0 in range(0, pixels, tile):
+        p1 = min(p0 + tile, pixels)
+        levels = buffer[:p1 - p0]
+        torch.mul(src[p0:p1].to(torch.float32), LEVELS, out=levels)
+        levels.round_().clamp_(0.0, LEVELS)
+        if key_rng is not None:
+            levels.add_(torch.from_numpy(_next_key(key_rng, (p1 - p0, c))).to(device))
+            levels.remainder_(256.0)
+        levels.div_(divisor)
+        if shuffle:
+            out_flat.index_copy_(0, inverse[p0:p1].long(), levels.to(out.dtype))
+        else:
+            out_flat[p0:p1].copy_(levels)
+
+    if noise_strength > 0:
+        # 噪声按输出位置顺序分块添加
+        noise_rng = image_rng(seed, index, STREAM_NOISE)
+        for p0 in range(0, pixels, tile):
+            p1 = min(p0 + tile, pixels)
+            noise = torch.from_numpy(noise_rng.standard_normal((p1 - p0, c), dtype=np.float32)).to(device)
+            noise.mul_(noise_strength)
+            values = out_flat[p0:p1].to(torch.float32)  # float32 输出时是视图，直接原地修改
+            values.add_(noise).clamp_(0.0, 1.0)
+            if out.dtype != torch.float32:
+                out_flat[p0:p1].copy_(values)
+    return out
+
+
+def _decrypt_frame_tiled(frame, seed, index, encrypt_mode, memory_budget, cache, out):
+    """分块解密一帧 [H, W, C] 到 out：按输出行块用逆置换 gather，密钥按块顺序生成"""
+    h, w, c = frame.shape
+    device = frame.device
+    pixels = h * w
+    tile = _tile_pixels(h, w, c, memory_budget)
+    src = frame.reshape(pixels, c)
+    out_flat = out.view(pixels, c)
+    divisor = _levels_divisor(device)
+    shuffle = encrypt_mode in ("SHUFFLE", "COMBINE")
+    inverse = cache.inverse_permutation_tensor(seed, index, pixels, device) if shuffle else None
+    key_rng = image_rng(seed, index, STREAM_KEY) if encrypt_mode in ("XOR", "COMBINE") else None
+    buffer = torch.empty((tile, c), dtype=torch.float32, device=device)
+
+    for p0 in range(0, pixels, tile):
+        p1 = min(p0 + tile, pixels)
+        levels = buffer[:p1 - p0]
+        gathered = torch.index_select(src, 0, inverse[p0:p1]) if shuffle else src[p0:p1]
+        torch.mul(gathered.to(torch.float32), LEVELS, out=levels)
+        levels.round_().clamp_(0.0, LEVELS)
+        if key_rng is not None:
+            levels.sub_(torch.from_numpy(_next_key(key_rng, (p1 - p0, c))).to(device))
+            levels.remainder_(256.0)
+        levels.div_(divisor)
+        out_flat[p0:p1].copy_(levels)
+    return out
+
+
+def encrypt_frames(frames, password, encrypt_mode, noise_strength=0.0, memory_budget=64 * 1024 * 1024,
+                   start_index=0, cache=None):
+    """
+    逐帧加密的生成器，适合逐帧输入的流水线
+
+    Args:
+        frames: 可迭代的帧 tensor [H, W, C]
+        memory_budget: 每帧处理时的临时内存预算（字节）
+        start_index: 第一帧在整段序列中的序号（序号决定密钥和置换）
+
+    Yields:
+        加密后的帧 tensor [H, W, C]，与 encrypt_tensor 对整批处理的对应帧一致
+    """
+    cache = cache or get_crypto_cache()
+    seed = password_to_seed(password)
+    for index, frame in enumerate(frames, start_index):
+        out = torch.empty_like(frame, memory_format=torch.contiguous_format)
+        yield _encrypt_frame_tiled(frame, seed, index, encrypt_mode, noise_strength, memory_budget, cache, out)
+
+
+def decrypt_frames(frames, password, encrypt_mode, memory_budget=64 * 1024 * 1024, start_index=0, cache=None):
+    """逐帧解密的生成器，参数同 encrypt_frames"""
+    cache = cache or get_crypto_cache()
+    seed = password_to_seed(password)
+    for index, frame in enumerate(frames, start_index):
+        out = torch.empty_like(frame, memory_format=torch.contiguous_format)
+        yield _decrypt_frame_tiled(frame, seed, index, encrypt_mode, memory_budget, cache, out)
 
 
 class ImageEncryptNode:
@@ -14,102 +509,42 @@ class ImageEncryptNode:
     图片加密节点
     使用密码对图片进行像素级加密，生成不可识别的乱码图
     """
-    
+
     @classmethod
     def INPUT_TYPES(cls):
         return {
             "required": {
                 "image": ("IMAGE",),  # 输入图片
                 "password": ("STRING", {"default": "", "multiline": False}),  # 加密密码
-                "encrypt_mode": (["XOR", "SHUFFLE", "COMBINE"], {"default": "COMBINE"}),  # 加密模式
+                "encrypt_mode": (ENCRYPT_MODES, {"default": "COMBINE"}),  # 加密模式
                 "noise_strength": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 1.0, "step": 0.01}),  # 额外噪声强度
+            },
+            "optional": {
+                "memory_budget_mb": ("INT", {"default": 0, "min": 0, "max": 65536}),  # 分块处理的内存预算，0 表示整帧处理
             }
         }
-    
+
     RETURN_TYPES = ("IMAGE",)
     RETURN_NAMES = ("encrypted_image",)
     FUNCTION = "encrypt_image"
     CATEGORY = "image/crypto"
-    
-    def encrypt_image(self, image, password, encrypt_mode, noise_strength):
+
+    def encrypt_image(self, image, password, encrypt_mode, noise_strength, memory_budget_mb=0):
         """
         加密图片
-        
+
         Args:
             image: 输入图片 tensor [B, H, W, C]
             password: 加密密码
             encrypt_mode: 加密模式 (XOR/SHUFFLE/COMBINE)
             noise_strength: 额外噪声强度
-        
+            memory_budget_mb: 分块处理的内存预算（MB），长视频帧批次可避免内存溢出
+
         Returns:
             加密后的图片 tensor
         """
-        # 转换为 numpy 数组
-        img_np = image.cpu().numpy()
-        batch_size, height, width, channels = img_np.shape
-        
-        # 使用密码生成随机种子
-        seed = self._password_to_seed(password)
-        np.random.seed(seed)
-        
-        encrypted_batch = []
-        
-        for b in range(batch_size):
-            img = img_np[b].copy()  # [H, W, C]
-            
-            if encrypt_mode in ["XOR", "COMBINE"]:
-                img = self._xor_encrypt(img, seed + b)
-            
-            if encrypt_mode in ["SHUFFLE", "COMBINE"]:
-                img = self._shuffle_encrypt(img, seed + b)
-            
-            # 添加可选噪声
-            if noise_strength > 0:
-                noise = np.random.randn(*img.shape) * noise_strength
-                img = np.clip(img + noise, 0, 1)
-            
-            encrypted_batch.append(img)
-        
-        # 转换回 tensor
-        encrypted_np = np.stack(encrypted_batch, axis=0)
-        encrypted_tensor = torch.from_numpy(encrypted_np).float()
-        
-        return (encrypted_tensor,)
-    
-    def _password_to_seed(self, password):
-        """将密码转换为随机种子"""
-        if not password:
-            return 42  # 默认种子
-        hash_obj = hashlib.md5(password.encode('utf-8'))
-        return int(hash_obj.hexdigest(), 16) % (2**32)
-    
-    def _xor_encrypt(self, img, seed):
-        """异或加密 - 对像素值进行变换"""
-        np.random.seed(seed)
-        
-        # 生成与图片形状相同的密钥矩阵
-        key = np.random.randint(0, 256, size=img.shape, dtype=np.uint8) / 255.0
-        
-        # 异或操作 (在浮点数域中进行)
-        encrypted = np.abs(img - key)
-        encrypted = np.clip(encrypted, 0, 1)
-        
-        return encrypted
-    
-    def _shuffle_encrypt(self, img, seed):
-        """置换加密 - 打乱像素位置"""
-        np.random.seed(seed)
-        h, w, c = img.shape
-        
-        # 生成像素索引的随机置换
-        indices = np.arange(h * w)
-        np.random.shuffle(indices)
-        
-        # 重塑图片并应用置换
-        img_flat = img.reshape(-1, c)
-        shuffled = img_flat[indices]
-        
-        return shuffled.reshape(h, w, c)
+        return (encrypt_tensor(image, password, encrypt_mode, noise_strength,
+                               memory_budget=memory_budget_mb * 1024 * 1024),)
 
 
 class ImageDecryptNode:
@@ -117,37 +552,48 @@ class ImageDecryptNode:
     图片解密节点
     使用正确的密码还原被加密的图片
     """
-    
+
     @classmethod
     def INPUT_TYPES(cls):
         return {
             "required": {
                 "encrypted_image": ("IMAGE",),  # 加密后的图片
                 "password": ("STRING", {"default": "", "multiline": False}),  # 解密密码
-                "encrypt_mode": (["XOR", "SHUFFLE", "COMBINE"], {"default": "COMBINE"}),  # 加密模式（必须与加密时一致）
+                "encrypt_mode": (ENCRYPT_MODES, {"default": "COMBINE"}),  # 加密模式（必须与加密时一致）
+            },
+            "optional": {
+                "memory_budget_mb": ("INT", {"default": 0, "min": 0, "max": 65536}),  # 分块处理的内存预算，0 表示整帧处理
             }
         }
-    
+
     RETURN_TYPES = ("IMAGE",)
     RETURN_NAMES = ("decrypted_image",)
     FUNCTION = "decrypt_image"
     CATEGORY = "image/crypto"
-    
-    def decrypt_image(self, encrypted_image, password, encrypt_mode):
+
+    def decrypt_image(self, encrypted_image, password, encrypt_mode, memory_budget_mb=0):
         """
         解密图片
-        
+
         Args:
             encrypted_image: 加密后的图片 tensor [B, H, W, C]
             password: 解密密码
             encrypt_mode: 加密模式（必须与加密时一致）
-        
+            memory_budget_mb: 分块处理的内存预算（MB）
+
         Returns:
             解密后的图片 tensor
         """
-        # 转换为 numpy 数组
-        img_np = encrypted_image.cpu().numpy()
-        batch_size, height, width, channels = img_np.shape
-        
-        # 使用密码生成随机种子
-        seed = self._password_to_seed(password
\ No newline at end of file
+        return (decrypt_tensor(encrypted_image, password, encrypt_mode,
+                               memory_budget=memory_budget_mb * 1024 * 1024),)
+
+
+NODE_CLASS_MAPPINGS = {
+    "ImageEncryptNode": ImageEncryptNode,
+    "ImageDecryptNode": ImageDecryptNode,
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "ImageEncryptNode": "图片加密",
+    "ImageDecryptNode": "图片解密",
+}
@@ -52,6 +52,20 @@ UPLOAD_HEADERS = {
 MAX_RETRIES = 60
 POLL_INTERVAL = 10
 
+# 并发配置（同一账户的并发额度由本机所有客户端共享，见 admission.py）
+# 默认不在本地限流，由 RunningHub 按账户额度拒绝；设置为账户的实际并发数后，超出的创建请求在本地排队
+CONCURRENCY_LIMIT = int(os.getenv("RUNNINGHUB_CONCURRENCY_LIMIT", "0")) or None
+ADMISSION_TIMEOUT = 30  # 网页请求等待并发槽位的最长时间（秒）
+
+# Webhook 配置：同时填写本服务的公网地址和校验令牌后，任务结束由 RunningHub 回调唤醒，轮询只作低频兜底；
+# 未配置令牌时不发送回调地址，回调端点一律拒绝
+WEBHOOK_BASE_URL = os.getenv("RUNNINGHUB_WEBHOOK_BASE_URL", "")  # 如 https://example.com
+WEBHOOK_SECRET = os.getenv("RUNNINGHUB_WEBHOOK_SECRET", "")      # 回调URL中携带的校验令牌
+
+# 结果缓存：相同工作流 + 相同参数 + 相同输入文件内容直接返回上次的输出，不再创建付费任务
+# 工作流含随机种子时每次结果本应不同，因此默认关闭；单次请求可传 noCache: true 绕过
+RESULT_CACHE_ENABLED = os.getenv("RUNNINGHUB_RESULT_CACHE", "0") == "1"
+
 # 文件路径配置
 INPUT_DIR = "Input"
 OUTPUT_DIR = "Output"
@@ -24,6 +24,10 @@ from enum import Enum
 
 import requests
 
+from task_store import account_id
+from workflow_cache import get_workflow_cache
+from workflow_graph import get_workflow_graph, sort_node_ids
+
 
 class WorkflowType(Enum):
     """工作流类型"""
@@ -132,16 +136,33 @@ class ConfigManager:
         print("   - URL: https://www.runninghub.cn/workflow/2024401195896410114")
         return None
 
-    def get_workflow_json(self, workflow_id: str) -> Optional[Dict]:
+    def get_workflow_json(self, workflow_id: str, force_refresh: bool = False) -> Optional[Dict]:
         """
-        获取工作流JSON结构
+        获取工作流JSON结构（带缓存，见 workflow_cache.py）
 
         Args:
             workflow_id: 工作流ID
+            force_refresh: 忽略缓存重新获取
 
         Returns:
             工作流JSON字典，失败返回None
         """
+        return get_workflow_cache().get(workflow_id, fetch_fn=self._fetch_workflow_json,
+                                        force_refresh=force_refresh, account=account_id(self.api_key))
+
+    def get_workflow_json_with_version(self, workflow_id: str,
+                                       force_refresh: bool = False) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        同 get_workflow_json，同时返回内容对应的 etag，可直接作为 analyze_workflow_nodes 的 version
+
+        Returns:
+            (工作流JSON字典, etag)，失败返回 (None, None)
+        """
+        return get_workflow_cache().get_with_etag(workflow_id, fetch_fn=self._fetch_workflow_json,
+                                                  force_refresh=force_refresh, account=account_id(self.api_key))
+
+    def _fetch_workflow_json(self, workflow_id: str) -> Dict:
+        """请求 getJsonApiFormat，返回原始结果"""
         url = f"{self.BASE_URL}/api/openapi/getJsonApiFormat"
         payload = {
             "apiKey": self.api_key,
@@ -150,26 +171,19 @@ class ConfigManager:
 
         try:
             resp = requests.post(url, headers=self.headers, json=payload, timeout=30)
-            result = resp.json()
-
-            if result.get('code') == 0:
-                prompt_data = result.get('data', {}).get('prompt', '{}')
-                if isinstance(prompt_data, str):
-                    return json.loads(prompt_data)
-                return prompt_data
-            else:
-                print(f"❌ 获取工作流JSON失败: {result.get('msg', '未知错误')}")
-                return None
+            return resp.json()
         except Exception as e:
-            print(f"❌ 请求异常: {e}")
-            return None
+            return {"code": -1, "msg": f"请求异常: {e}", "data": None}
 
-    def analyze_workflow_nodes(self, workflow_json: Dict) -> Dict[str, List[NodeConfig]]:
+    def analyze_workflow_nodes(self, workflow_json: Dict,
+                               version: Optional[str] = None) -> Dict[str, List[NodeConfig]]:
         """
         分析工作流节点，识别输入节点
 
         Args:
             workflow_json: 工作流JSON字典
+            version: 与 workflow_json 同一次读取得到的 etag（见 get_workflow_json_with_version），
+                     同一版本的图索引只构建一次；为空时按内容哈希
 
         Returns:
             按类型分类的节点配置列表
@@ -181,62 +195,34 @@ class ConfigManager:
             'other': []
         }
 
-        for node_id, node_data in workflow_json.items():
-            class_type = node_data.get('class_type', '')
-            inputs = node_data.get('inputs', {})
-
-            # 识别节点类型
-            node_type = self._identify_node_type(class_type, inputs)
-
-            if node_type == 'video':
-                # 查找视频字段
-                field_name = self._find_field_name(inputs, 'video')
-                if field_name:
-                    nodes_by_type['video'].append(NodeConfig(
-                        node_id=node_id,
-                        field_name=field_name,
-                        class_type=class_type,
-                        node_type='video'
-                    ))
-
-            elif node_type == 'image':
-                # 查找图片字段
-                field_name = self._find_field_name(inputs, 'image')
-                if field_name:
-                    nodes_by_type['image'].append(NodeConfig(
-                        node_id=node_id,
-                        field_name=field_name,
-                        class_type=class_type,
-                        node_type='image'
-                    ))
-
-            elif node_type == 'text':
-                # 查找文本字段
-                field_name = self._find_field_name(inputs, 'text')
-                if field_name:
-                    nodes_by_type['text'].append(NodeConfig(
-                        node_id=node_id,
-                        field_name=field_name,
-                        class_type=class_type,
-                        node_type='text'
-                    ))
-
-        return nodes_by_type
+        graph = get_workflow_graph(workflow_json, version=version)
 
-    def _identify_node_type(self, class_type: str, inputs: Dict) -> str:
-        """识别节点类型"""
-        # 检查class_type
+        # 先按 class_type 归类（只扫描不同的 class_type），再按输入名归类（只扫描不同的输入名）
+        assigned: Dict[str, str] = {}
         for node_type, type_list in self.INPUT_NODE_TYPES.items():
-            if any(t in class_type for t in type_list):
-                return node_type
+            for node_id in graph.nodes_matching(type_list):
+                assigned.setdefault(node_id, node_type)
 
-        # 检查inputs中的字段
+        input_names = graph.input_names()
         for node_type, field_patterns in self.FIELD_NAME_PATTERNS.items():
-            for field in inputs.keys():
+            for field in input_names:
                 if any(pattern in field.lower() for pattern in field_patterns):
-                    return node_type
+                    for node_id in graph.nodes_with_input(field):
+                        assigned.setdefault(node_id, node_type)
+
+        # 只对识别出的输入节点查找字段名
+        for node_id in sort_node_ids(assigned):
+            node_type = assigned[node_id]
+            field_name = self._find_field_name(graph.inputs(node_id), node_type)
+            if field_name:
+                nodes_by_type[node_type].append(NodeConfig(
+                    node_id=node_id,
+                    field_name=field_name,
+                    class_type=graph.class_type(node_id),
+                    node_type=node_type
+                ))
 
-        return 'other'
+        return nodes_by_type
 
     def _find_field_name(self, inputs: Dict, node_type: str) -> Optional[str]:
         """查找字段名"""
@@ -496,13 +482,13 @@ class ConfigManager:
 
         # 2. 获取工作流JSON
         print("\n🔍 获取工作流JSON...")
-        workflow_json = self.get_workflow_json(workflow_id)
+        workflow_json, version = self.get_workflow_json_with_version(workflow_id)
         if not workflow_json:
             return False
 
         # 3. 分析节点
         print("\n🔍 分析工作流节点...")
-        nodes_by_type = self.analyze_workflow_nodes(workflow_json)
+        nodes_by_type = self.analyze_workflow_nodes(workflow_json, version=version)
 
         # 打印分析结果
         print("\n📊 节点分析结果:")
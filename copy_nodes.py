@@ -9,6 +9,10 @@ dest = r"D:\ComfyUI_windows_portable\ComfyUI\custom_nodes\ComfyUI_RH_APICall"
 print(f"源目录: {source}")
 print(f"目标目录: {dest}")
 
+# 与根目录共用的模块：源码只在根目录保留一份，部署时复制到目标插件目录
+shared_modules = ["admission.py", "workflow_cache.py", "task_store.py", "upload_cache.py", "result_cache.py"]
+project_root = os.path.dirname(os.path.abspath(__file__))
+
 # 如果目标目录已存在，先删除（跳过.git目录）
 def onerror(func, path, exc_info):
     import stat
@@ -45,6 +49,11 @@ except Exception as e:
             shutil.copy2(s, d)
     print("逐个文件复制完成")
 
+# 复制共享模块
+for name in shared_modules:
+    shutil.copy2(os.path.join(project_root, name), os.path.join(dest, name))
+    print(f"复制共享模块: {name}")
+
 # 验证
 if os.path.exists(dest):
     files = os.listdir(dest)
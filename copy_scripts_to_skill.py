@@ -6,6 +6,14 @@ import os
 # 核心脚本列表
 scripts = [
     "runninghub_client.py",
+    "http_pool.py",
+    "async_runninghub_client.py",
+    "task_watcher.py",
+    "task_store.py",
+    "upload_cache.py",
+    "result_cache.py",
+    "workflow_cache.py",
+    "workflow_graph.py",
     "config_manager.py",
     "config.py"
 ]
@@ -0,0 +1,177 @@
+"""
+RunningHub 输出文件下载管理
+分块流式写盘、多文件并行、断线后通过 HTTP Range 续传，可在后台下载
+
+使用方法:
+    from download_manager import DownloadManager
+
+    manager = DownloadManager("Output", max_workers=4)
+    future = manager.submit(file_url, "result.mp4")   # 后台下载，返回 Future
+    path = future.result()                            # 等待完成，返回本地路径
+    manager.status("result.mp4")                      # pending / done / failed / None
+
+说明:
+    - 下载过程中写入 <文件名>.part，完成后再重命名，未完成的文件不会被当作结果提供
+    - 连接中断时保留已下载部分，重试时发送 Range 请求续传；服务器不支持 Range 时从头下载
+    - 目标文件已存在时直接视为完成，重复查询同一任务不会重复下载
+"""
+
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Dict
+
+import requests
+
+from http_pool import ConnectionPool, get_shared_pool
+
+
+class DownloadManager:
+    """输出文件下载管理器"""
+
+    def __init__(
+        self,
+        output_dir: str,
+        pool: Optional[ConnectionPool] = None,
+        max_workers: int = 4,
+        chunk_size: int = 1024 * 1024,
+        max_attempts: int = 5,
+        retry_delay: float = 1.0,
+        timeout: float = 300
+    ):
+        """
+        初始化下载管理器
+
+        Args:
+            output_dir: 下载目录
+            pool: HTTP连接池，默认使用进程级共享连接池
+            max_workers: 同时下载的文件数
+            chunk_size: 每次写盘的块大小（字节）
+            max_attempts: 单个文件的最大尝试次数（含续传）
+            retry_delay: 重试间隔（秒），每次翻倍
+            timeout: 单次读取超时（秒）
+        """
+        self.output_dir = output_dir
+        self._pool = pool
+        self.chunk_size = chunk_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="OutputDownload")
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        os.makedirs(output_dir, exist_ok=True)
+
+    @property
+    def pool(self) -> ConnectionPool:
+        return self._pool or get_shared_pool()
+
+    def submit(self, url: str, file_name: str) -> Future:
+        """
+        提交下载任务（同一文件正在下载时返回已有的 Future）
+
+        Args:
+            url: 文件URL
+            file_name: 保存的文件名（位于 output_dir 下）
+
+        Returns:
+            完成时结果为本地路径的 Future，下载失败时抛出异常
+        """
+        path = os.path.join(self.output_dir, file_name)
+        with self._lock:
+            future = self._futures.get(file_name)
+            if future is not None and not (future.done() and future.exception() is not None):
+                return future
+            if os.path.exists(path):
+                future = Future()
+                future.set_result(path)
+            else:
+                future = self._executor.submit(self.download, url, path)
+            self._futures[file_name] = future
+            return future
+
+    def status(self, file_name: str) -> Optional[str]:
+        """文件下载状态: pending / done / failed，未提交过时返回None"""
+        with self._lock:
+            future = self._futures.get(file_name)
+        if future is None:
+            return "done" if os.path.exists(os.path.join(self.output_dir, file_name)) else None
+        if not future.done():
+            return "pending"
+        return "failed" if future.exception() is not None else "done"
+
+    def close(self, wait: bool = True):
+        """停止接收新的下载，wait 为 True 时等待进行中的下载结束"""
+        self._executor.shutdown(wait=wait)
+
+    def download(self, url: str, path: str) -> str:
+        """
+        下载单个文件（阻塞），支持断点续传
+
+        Returns:
+            本地路径
+        """
+        part_path = f"{path}.part"
+        delay = self.retry_delay
+        last_error = None
+
+        for attempt in range(self.max_attempts):
+            try:
+                self._download_once(url, part_path)
+                os.replace(part_path, path)
+                return path
+            except (requests.exceptions.RequestException, IOError) as e:
+                last_error = e
+                done = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+                print(f"⚠️ 下载中断 ({attempt + 1}/{self.max_attempts})，已下载 {done} 字节: {e}")
+                if attempt < self.max_attempts - 1:
+                    time.sleep(delay)
+                    delay *= 2
+
+        raise IOError(f"下载失败: {url} ({last_error})")
+
+    def _download_once(self, url: str, part_path: str):
+        """从 .part 文件已有的位置继续下载"""
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        # 请求不压缩的原始内容，Content-Length 与 Range 才能对应到落盘的字节
+        headers = {"Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+
+        with self.pool.get(url, headers=headers, stream=True, timeout=self.timeout) as resp:
+            if resp.status_code == 416:
+                # Content-Range: bytes */N 给出完整大小；一致说明已下载完，
+                # 不一致（如 .part 来自旧版本的文件）则丢弃重新下载
+                match = re.match(r"bytes \*/(\d+)$", resp.headers.get("Content-Range", ""))
+                if match and int(match.group(1)) == offset:
+                    return
+                print(f"⚠️ 已下载部分与服务器文件大小不一致，重新下载: {url}")
+                resp.close()
+                open(part_path, "wb").close()
+                return self._download_once(url, part_path)
+            resp.raise_for_status()
+
+            # 服务端仍然压缩时，iter_content 写入的是解压后的内容：
+            # Content-Length 是压缩后的长度，无法校验大小，也不能在解压后的文件上续传
+            encoded = resp.headers.get("Content-Encoding", "identity").lower() != "identity"
+            if encoded:
+                mode = "wb"
+                expected = -1
+            elif offset and resp.status_code == 206 and \
+                    resp.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+                mode = "ab"
+                expected = offset + int(resp.headers.get("Content-Length", -1 - offset))
+            else:
+                mode = "wb"  # 不支持续传，从头开始
+                expected = int(resp.headers.get("Content-Length", -1))
+
+            with open(part_path, mode) as f:
+                for chunk in resp.iter_content(chunk_size=self.chunk_size):
+                    if chunk:
+                        f.write(chunk)
+
+        size = os.path.getsize(part_path)
+        if expected >= 0 and size != expected:
+            raise IOError(f"文件不完整: {size}/{expected} 字节")
@@ -0,0 +1,196 @@
+"""
+RunningHub HTTP 连接池
+为所有客户端提供共享的 keep-alive 连接池，避免每次请求都重新建立 TCP+TLS 连接
+
+使用方法:
+    from http_pool import get_shared_pool, configure_shared_pool, PoolConfig
+
+    # 可选：在程序启动时调整连接池参数
+    configure_shared_pool(PoolConfig(pool_maxsize=32, read_timeout=60))
+
+    pool = get_shared_pool()
+    resp = pool.post("https://www.runninghub.cn/task/openapi/status", json=payload)
+    print(pool.stats())
+
+说明:
+    requests/urllib3 不支持 HTTP/1.1 管线化（pipelining），且对 POST 这类非幂等请求
+    管线化本身并不安全。这里通过长连接复用来省去握手开销，效果等价且更稳妥。
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Union, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+@dataclass
+class PoolConfig:
+    """连接池配置"""
+    pool_connections: int = 4       # 缓存的主机连接池数量（每个主机一个）
+    pool_maxsize: int = 16          # 每个主机最多保持的连接数
+    pool_block: bool = False        # 连接数达到上限时是否阻塞等待空闲连接
+    connect_timeout: float = 5.0    # 建立连接超时（秒）
+    read_timeout: float = 30.0      # 读取响应超时（秒）
+    keep_alive: bool = True         # 是否启用长连接
+
+
+class ConnectionPool:
+    """基于 requests.Session 的共享连接池"""
+
+    def __init__(self, config: Optional[PoolConfig] = None):
+        """
+        初始化连接池
+
+        Args:
+            config: 连接池配置，默认使用 PoolConfig()
+        """
+        self.config = config or PoolConfig()
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._total_requests = 0
+        self._failed_requests = 0
+
+        self._adapter = HTTPAdapter(
+            pool_connections=self.config.pool_connections,
+            pool_maxsize=self.config.pool_maxsize,
+            pool_block=self.config.pool_block,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        if not self.config.keep_alive:
+            self.session.headers["Connection"] = "close"
+
+    def _resolve_timeout(self, timeout) -> Union[float, Tuple[float, float]]:
+        """
+        统一超时参数
+
+        - None: 使用配置的 (connect_timeout, read_timeout)
+        - 数字: 视为读取超时，连接超时仍使用配置值
+        - 元组: 原样传给 requests
+        """
+        if timeout is None:
+            return (self.config.connect_timeout, self.config.read_timeout)
+        if isinstance(timeout, (int, float)):
+            return (self.config.connect_timeout, timeout)
+        return timeout
+
+    def request(self, method: str, url: str, timeout=None, **kwargs) -> requests.Response:
+        """发送请求，复用连接池中的连接"""
+        with self._lock:
+            self._in_flight += 1
+            self._total_requests += 1
+        try:
+            return self.session.request(method, url, timeout=self._resolve_timeout(timeout), **kwargs)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._failed_requests += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """发送GET请求"""
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """发送POST请求"""
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取连接池统计信息
+
+        Returns:
+            包含以下字段的字典:
+            - open_connections: 当前打开的连接数（空闲 + 使用中）
+            - idle_connections: 空闲可复用的连接数
+            - in_flight: 正在进行的请求数
+            - connections_created: 累计新建连接数
+            - requests: 累计请求数
+            - failed_requests: 累计失败请求数
+            - reuse_ratio: 连接复用率 (0~1)
+            - hosts: 按主机统计的明细
+        """
+        hosts = {}
+        connections_created = 0
+        pool_requests = 0
+        idle_connections = 0
+
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            host_pool = pools.get(key)
+            if host_pool is None:
+                continue
+            # 连接队列中预填了 None 占位，非 None 的才是真实的空闲连接
+            idle = sum(1 for conn in list(host_pool.pool.queue) if conn is not None) if host_pool.pool else 0
+            created = host_pool.num_connections
+            served = host_pool.num_requests
+            hosts[f"{host_pool.scheme}://{host_pool.host}:{host_pool.port}"] = {
+                "idle_connections": idle,
+                "connections_created": created,
+                "requests": served,
+            }
+            idle_connections += idle
+            connections_created += created
+            pool_requests += served
+
+        with self._lock:
+            in_flight = self._in_flight
+            total_requests = self._total_requests
+            failed_requests = self._failed_requests
+
+        reuse_ratio = 0.0
+        if pool_requests > 0:
+            reuse_ratio = max(0.0, (pool_requests - connections_created) / pool_requests)
+
+        return {
+            "open_connections": idle_connections + in_flight,
+            "idle_connections": idle_connections,
+            "in_flight": in_flight,
+            "connections_created": connections_created,
+            "requests": total_requests,
+            "failed_requests": failed_requests,
+            "reuse_ratio": round(reuse_ratio, 4),
+            "hosts": hosts,
+        }
+
+    def close(self):
+        """关闭连接池中的所有连接"""
+        self.session.close()
+
+
+# 进程级共享连接池
+_shared_pool: Optional[ConnectionPool] = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_shared_pool() -> ConnectionPool:
+    """获取进程级共享连接池（首次调用时创建）"""
+    global _shared_pool
+    if _shared_pool is None:
+        with _shared_pool_lock:
+            if _shared_pool is None:
+                _shared_pool = ConnectionPool()
+    return _shared_pool
+
+
+def configure_shared_pool(config: PoolConfig) -> ConnectionPool:
+    """
+    使用新配置重建共享连接池
+
+    Args:
+        config: 连接池配置
+
+    Returns:
+        新的共享连接池
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is not None:
+            _shared_pool.close()
+        _shared_pool = ConnectionPool(config)
+    return _shared_pool
@@ -0,0 +1,161 @@
+"""
+RunningHub 工作流结果缓存（可选）
+相同的 工作流ID + 节点参数 + 输入文件内容 再次提交时直接返回上次的输出，不再创建付费任务
+
+使用方法:
+    from result_cache import get_result_cache, result_key
+    from upload_cache import get_upload_cache
+
+    cache = get_result_cache()
+    key = result_key(workflow_id, node_info_list,
+                     resolve=lambda name: get_upload_cache().digest_for(name, api_key))
+    hit = cache.get(key)          # {"taskId", "outputs", "createdAt"}，未命中返回None
+    if hit is None:
+        ...                       # 正常运行任务
+        cache.put(key, workflow_id, task_id, outputs)
+
+说明:
+    - 键是规范化后内容的 SHA-256：nodeInfoList 按 (nodeId, fieldName) 排序、nodeId 统一为字符串，
+      已上传文件的 fileName 替换为其内容哈希，因此同一文件重新上传得到不同 fileName 时仍能命中
+    - 数据保存在 ~/.runninghub/results.db（环境变量 RH_RESULT_CACHE），条目在 ttl 秒后过期
+      （默认 7 天，环境变量 RH_RESULT_CACHE_TTL），总数超过 max_entries 时淘汰最久未使用的
+    - 工作流内含随机种子时相同参数也会得到不同结果，因此缓存默认关闭，由调用方显式启用
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional, List, Dict, Any
+
+Resolver = Callable[[str], Optional[str]]
+
+
+def result_key(workflow_id: str, node_info_list: Optional[List[Dict]], resolve: Optional[Resolver] = None) -> str:
+    """
+    计算结果缓存键
+
+    Args:
+        workflow_id: 工作流ID
+        node_info_list: 节点参数列表
+        resolve: 把 fieldValue 映射为输入文件内容哈希的函数，不是已上传文件时返回None
+    """
+    items = []
+    for node_info in node_info_list or []:
+        value = node_info.get("fieldValue")
+        if resolve is not None and isinstance(value, str) and value:
+            digest = resolve(value)
+            if digest:
+                value = f"sha256:{digest}"
+        items.append([str(node_info.get("nodeId")), str(node_info.get("fieldName")), value])
+    items.sort(key=lambda item: (item[0], item[1]))
+    data = json.dumps([str(workflow_id), items], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """工作流输出缓存"""
+
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None, max_entries: int = 1000):
+        """
+        Args:
+            path: 数据库文件路径，默认 ~/.runninghub/results.db；传入 ":memory:" 表示只保存在内存中
+            ttl: 条目有效期（秒）
+            max_entries: 最多保留的条目数
+        """
+        if path is None:
+            path = os.getenv("RH_RESULT_CACHE") or os.path.join(os.path.expanduser("~"), ".runninghub", "results.db")
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if ttl is None:
+            ttl = float(os.getenv("RH_RESULT_CACHE_TTL", 7 * 24 * 3600))
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, workflow_id TEXT, task_id TEXT, outputs TEXT,"
+            " created_at REAL, last_used_at REAL, hits INTEGER DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_used ON results(last_used_at)")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """查找缓存的输出，未命中或已过期时返回None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT task_id, outputs, created_at FROM results WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is None or now - row[2] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE results SET last_used_at = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self._stats["hits"] += 1
+        return {"taskId": row[0], "outputs": json.loads(row[1]), "createdAt": row[2]}
+
+    def put(self, key: str, workflow_id: str, task_id: str, outputs: List[Dict]):
+        """记录一次成功运行的输出"""
+        if not outputs:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, workflow_id, task_id, outputs, created_at, last_used_at, hits)"
+                " VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (key, str(workflow_id), str(task_id), json.dumps(outputs, ensure_ascii=False), now, now)
+            )
+            self._stats["stores"] += 1
+            self._evict(now)
+
+    def invalidate(self, key: Optional[str] = None):
+        """删除指定键（或全部）的缓存"""
+        with self._lock:
+            if key is None:
+                self._conn.execute("DELETE FROM results")
+            else:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            return dict(self._stats, entries=entries)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self, now: float):
+        """删除过期条目，超出数量上限时淘汰最久未使用的；需持有锁"""
+        expired = self._conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl,)).rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        overflow = max(0, count - self.max_entries)
+        if overflow:
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_used_at LIMIT ?)",
+                (overflow,)
+            )
+        self._stats["evictions"] += expired + overflow
+
+
+# 进程级共享实例（按数据库路径区分）
+_caches: Dict[str, ResultCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_result_cache(path: Optional[str] = None) -> ResultCache:
+    """获取进程级共享的结果缓存"""
+    key = path or os.getenv("RH_RESULT_CACHE") or ""
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = ResultCache(path)
+            _caches[key] = cache
+        return cache
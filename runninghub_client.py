@@ -13,14 +13,42 @@ import requests
 import json
 import time
 import os
-from typing import Optional, List, Dict, Any
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, List, Dict, Any, Iterator
 
+from http_pool import ConnectionPool, get_shared_pool
+from task_watcher import TaskWatcher
+from task_store import TaskStore, account_id
+from upload_cache import UploadCache, get_upload_cache, media_kind
+from result_cache import ResultCache, result_key
 
-class RunningHubClient:
-    """RunningHub API 客户端"""
+
+class BaseRunningHubClient:
+    """
+    RunningHub 客户端基类
+    封装同步/异步客户端共用的请求构造与响应处理，子类只负责发送请求
+    """
     
     BASE_URL = "https://www.runninghub.cn"
     
+    # 接口路径
+    ACCOUNT_STATUS_ENDPOINT = "/uc/openapi/accountStatus"
+    WORKFLOW_JSON_ENDPOINT = "/api/openapi/getJsonApiFormat"
+    CREATE_TASK_ENDPOINT = "/task/openapi/create"
+    TASK_STATUS_ENDPOINT = "/task/openapi/status"
+    TASK_OUTPUTS_ENDPOINT = "/task/openapi/outputs"
+    CANCEL_TASK_ENDPOINT = "/task/openapi/cancel"
+    UPLOAD_ENDPOINT = "/file/openapi/upload"
+    
+    # 共享型 API 并发达到上限，需要等待后重试
+    TASK_QUEUE_MAXED = 421
+    
+    # 上传读取超时（秒）
+    IMAGE_UPLOAD_TIMEOUT = 60
+    VIDEO_UPLOAD_TIMEOUT = 120
+    
     def __init__(self, api_key: str):
         """
         初始化客户端
@@ -34,16 +62,180 @@ class RunningHubClient:
             "Content-Type": "application/json",
             "Authorization": f"Bearer {api_key}"
         }
+        # 上传使用 multipart/form-data，不能带 JSON 的 Content-Type
+        self.upload_headers = {
+            "Host": "www.runninghub.cn",
+            "Authorization": f"Bearer {api_key}"
+        }
+    
+    @staticmethod
+    def _error_result(msg: str) -> Dict[str, Any]:
+        """构造与API响应格式一致的错误结果"""
+        return {"code": -1, "msg": msg, "data": None}
+    
+    def _account_status_payload(self) -> Dict[str, Any]:
+        return {"apikey": self.api_key}
+    
+    def _workflow_payload(self, workflow_id: str) -> Dict[str, Any]:
+        return {
+            "apiKey": self.api_key,
+            "workflowId": workflow_id
+        }
+    
+    def _task_payload(self, task_id: str) -> Dict[str, Any]:
+        return {
+            "apiKey": self.api_key,
+            "taskId": task_id
+        }
+    
+    def _create_task_payload(
+        self,
+        workflow_id: str,
+        node_info_list: Optional[List[Dict]] = None,
+        webhook_url: Optional[str] = None,
+        instance_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        payload = self._workflow_payload(workflow_id)
+        
+        if node_info_list:
+            payload["nodeInfoList"] = node_info_list
+        if webhook_url:
+            payload["webhookUrl"] = webhook_url
+        if instance_type:
+            payload["instanceType"] = instance_type
+        
+        return payload
+    
+    def _handle_poll_result(
+        self,
+        result: Dict[str, Any],
+        attempt: int,
+        max_retries: int,
+        callback=None
+    ) -> Optional[str]:
+        """
+        处理一次状态轮询结果
+        
+        Returns:
+            "SUCCESS" / "FAILED" 表示任务已结束，"ERROR" 表示查询失败，None 表示继续轮询
+        """
+        if result.get("code") != 0:
+            print(f"查询状态失败: {result.get('msg')}")
+            return "ERROR"
+        
+        status = result.get("data")
+        
+        if callback:
+            callback(status, attempt + 1)
+        else:
+            print(f"[{attempt+1}/{max_retries}] 任务状态: {status}")
+        
+        if status == "SUCCESS":
+            print("✅ 任务执行成功！")
+            return "SUCCESS"
+        elif status == "FAILED":
+            print("❌ 任务执行失败！")
+            return "FAILED"
+        elif status == "QUEUED":
+            print("⏳ 任务正在排队中...")
+        elif status == "RUNNING":
+            print("🔄 任务正在运行中...")
+        return None
+    
+    def _parse_created_task(self, create_result: Dict[str, Any]) -> Optional[str]:
+        """解析创建任务的结果，成功时返回taskId"""
+        if create_result.get("code") != 0:
+            print(f"❌ 创建任务失败: {create_result.get('msg')}")
+            return None
+        
+        data = create_result.get("data", {})
+        task_id = data.get("taskId")
+        task_status = data.get("taskStatus")
+        
+        print(f"✅ 任务创建成功!")
+        print(f"   Task ID: {task_id}")
+        print(f"   Initial Status: {task_status}")
+        return task_id
+
+
+class RunningHubClient(BaseRunningHubClient):
+    """RunningHub API 客户端"""
+    
+    def __init__(
+        self,
+        api_key: str,
+        pool: Optional[ConnectionPool] = None,
+        watcher: Optional[TaskWatcher] = None,
+        store: Optional[TaskStore] = None,
+        upload_cache: Optional[UploadCache] = None,
+        result_cache: Optional[ResultCache] = None
+    ):
+        """
+        初始化客户端
+        
+        Args:
+            api_key: RunningHub API Key (32位字符串)
+            pool: HTTP连接池，默认使用进程级共享连接池
+            watcher: 任务监视器，设置后 wait_for_task 交由监视器统一轮询
+            store: 任务状态存储，设置后提交的任务、状态变化和输出都会持久化
+            upload_cache: 上传去重缓存，默认使用本机共享缓存
+            result_cache: 结果缓存，设置后 run_workflow 遇到相同输入时直接返回上次的输出（默认不启用）
+        """
+        super().__init__(api_key)
+        self._pool = pool
+        self.watcher = watcher
+        self.store = store
+        self._upload_cache = upload_cache
+        self.result_cache = result_cache
+    
+    @property
+    def upload_cache(self) -> UploadCache:
+        """当前使用的上传去重缓存"""
+        return self._upload_cache or get_upload_cache()
+    
+    @property
+    def pool(self) -> ConnectionPool:
+        """当前使用的HTTP连接池"""
+        return self._pool or get_shared_pool()
+    
+    def result_key(self, workflow_id: str, node_info_list: Optional[List[Dict]]) -> str:
+        """结果缓存键：已上传文件按内容哈希计入，重新上传同一文件不影响命中"""
+        return result_key(workflow_id, node_info_list,
+                          resolve=lambda name: self.upload_cache.digest_for(name, self.api_key))
     
     def _post(self, endpoint: str, payload: Dict) -> Dict[str, Any]:
         """发送POST请求"""
         url = f"{self.BASE_URL}{endpoint}"
         try:
-            resp = requests.post(url, headers=self.headers, json=payload, timeout=30)
+            resp = self.pool.post(url, headers=self.headers, json=payload)
             resp.raise_for_status()
             return resp.json()
         except requests.exceptions.RequestException as e:
-            return {"code": -1, "msg": f"请求异常: {str(e)}", "data": None}
+            return self._error_result(f"请求异常: {str(e)}")
+    
+    def _upload(self, file_path: str, content_type: str, timeout: float) -> Dict[str, Any]:
+        """以 multipart/form-data 上传本地文件，相同内容已上传过时直接返回缓存的 fileName"""
+        url = f"{self.BASE_URL}{self.UPLOAD_ENDPOINT}"
+        try:
+            digest = self.upload_cache.hash_file(file_path)
+            file_name = self.upload_cache.get(digest, self.api_key, media_kind(content_type))
+            if file_name:
+                return {"code": 0, "msg": "success", "data": {"fileName": file_name, "fileType": "input", "cached": True}}
+            
+            with open(file_path, 'rb') as f:
+                files = {'file': (os.path.basename(file_path), f, content_type)}
+                resp = self.pool.post(url, headers=self.upload_headers, files=files, timeout=timeout)
+                resp.raise_for_status()
+                result = resp.json()
+        except FileNotFoundError:
+            return self._error_result(f"文件不存在: {file_path}")
+        except requests.exceptions.RequestException as e:
+            return self._error_result(f"上传失败: {str(e)}")
+        
+        if result.get("code") == 0 and (result.get("data") or {}).get("fileName"):
+            self.upload_cache.put(digest, self.api_key, media_kind(content_type), result["data"]["fileName"],
+                                  size=os.path.getsize(file_path))
+        return result
     
     def get_account_status(self) -> Dict[str, Any]:
         """
@@ -52,8 +244,7 @@ class RunningHubClient:
         Returns:
             包含账户余额、任务数量等信息的字典
         """
-        payload = {"apikey": self.api_key}
-        return self._post("/uc/openapi/accountStatus", payload)
+        return self._post(self.ACCOUNT_STATUS_ENDPOINT, self._account_status_payload())
     
     def get_workflow_json(self, workflow_id: str) -> Dict[str, Any]:
         """
@@ -65,11 +256,7 @@ class RunningHubClient:
         Returns:
             工作流的JSON配置
         """
-        payload = {
-            "apiKey": self.api_key,
-            "workflowId": workflow_id
-        }
-        return self._post("/api/openapi/getJsonApiFormat", payload)
+        return self._post(self.WORKFLOW_JSON_ENDPOINT, self._workflow_payload(workflow_id))
     
     def create_task(
         self, 
@@ -102,19 +289,15 @@ class RunningHubClient:
             }]
             result = client.create_task("2016195556967714818", node_info)
         """
-        payload = {
-            "apiKey": self.api_key,
-            "workflowId": workflow_id
-        }
-        
-        if node_info_list:
-            payload["nodeInfoList"] = node_info_list
-        if webhook_url:
-            payload["webhookUrl"] = webhook_url
-        if instance_type:
-            payload["instanceType"] = instance_type
-            
-        return self._post("/task/openapi/create", payload)
+        payload = self._create_task_payload(workflow_id, node_info_list, webhook_url, instance_type)
+        result = self._post(self.CREATE_TASK_ENDPOINT, payload)
+        if self.store is not None and result.get("code") == 0 and result.get("data"):
+            self.store.record_created(
+                result["data"]["taskId"], workflow_id, node_info_list,
+                account=account_id(self.api_key), source="client",
+                status=result["data"].get("taskStatus") or "QUEUED"
+            )
+        return result
     
     def query_task_status(self, task_id: str) -> Dict[str, Any]:
         """
@@ -126,11 +309,10 @@ class RunningHubClient:
         Returns:
             包含任务状态的字典，状态值：QUEUED, RUNNING, SUCCESS, FAILED
         """
-        payload = {
-            "apiKey": self.api_key,
-            "taskId": task_id
-        }
-        return self._post("/task/openapi/status", payload)
+        result = self._post(self.TASK_STATUS_ENDPOINT, self._task_payload(task_id))
+        if self.store is not None and result.get("code") == 0 and isinstance(result.get("data"), str):
+            self.store.record_status(task_id, result["data"])
+        return result
     
     def get_task_outputs(self, task_id: str) -> Dict[str, Any]:
         """
@@ -142,11 +324,10 @@ class RunningHubClient:
         Returns:
             包含生成文件URL列表的字典
         """
-        payload = {
-            "apiKey": self.api_key,
-            "taskId": task_id
-        }
-        return self._post("/task/openapi/outputs", payload)
+        result = self._post(self.TASK_OUTPUTS_ENDPOINT, self._task_payload(task_id))
+        if self.store is not None and result.get("code") == 0 and isinstance(result.get("data"), list):
+            self.store.record_outputs(task_id, result["data"])
+        return result
     
     def cancel_task(self, task_id: str) -> Dict[str, Any]:
         """
@@ -158,11 +339,7 @@ class RunningHubClient:
         Returns:
             取消结果
         """
-        payload = {
-            "apiKey": self.api_key,
-            "taskId": task_id
-        }
-        return self._post("/task/openapi/cancel", payload)
+        return self._post(self.CANCEL_TASK_ENDPOINT, self._task_payload(task_id))
     
     def upload_image(self, image_path: str) -> Dict[str, Any]:
         """
@@ -179,23 +356,7 @@ class RunningHubClient:
             if result.get("code") == 0:
                 filename = result["data"]["fileName"]
         """
-        url = f"{self.BASE_URL}/file/openapi/upload"
-        
-        headers = {
-            "Host": "www.runninghub.cn",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
-        try:
-            with open(image_path, 'rb') as f:
-                files = {'file': (os.path.basename(image_path), f, 'image/jpeg')}
-                resp = requests.post(url, headers=headers, files=files, timeout=60)
-                resp.raise_for_status()
-                return resp.json()
-        except FileNotFoundError:
-            return {"code": -1, "msg": f"文件不存在: {image_path}", "data": None}
-        except requests.exceptions.RequestException as e:
-            return {"code": -1, "msg": f"上传失败: {str(e)}", "data": None}
+        return self._upload(image_path, 'image/jpeg', self.IMAGE_UPLOAD_TIMEOUT)
     
     def upload_video(self, video_path: str) -> Dict[str, Any]:
         """
@@ -207,23 +368,7 @@ class RunningHubClient:
         Returns:
             上传结果，包含 fileName 等信息
         """
-        url = f"{self.BASE_URL}/file/openapi/upload"
-        
-        headers = {
-            "Host": "www.runninghub.cn",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
-        try:
-            with open(video_path, 'rb') as f:
-                files = {'file': (os.path.basename(video_path), f, 'video/mp4')}
-                resp = requests.post(url, headers=headers, files=files, timeout=120)
-                resp.raise_for_status()
-                return resp.json()
-        except FileNotFoundError:
-            return {"code": -1, "msg": f"文件不存在: {video_path}", "data": None}
-        except requests.exceptions.RequestException as e:
-            return {"code": -1, "msg": f"上传失败: {str(e)}", "data": None}
+        return self._upload(video_path, 'video/mp4', self.VIDEO_UPLOAD_TIMEOUT)
     
     def wait_for_task(
         self, 
@@ -246,43 +391,63 @@ class RunningHubClient:
         """
         print(f"开始轮询任务状态 (taskId: {task_id})...")
         
+        if self.watcher is not None:
+            return self._wait_with_watcher(task_id, max_retries, interval, callback)
+        
         for i in range(max_retries):
             result = self.query_task_status(task_id)
+            outcome = self._handle_poll_result(result, i, max_retries, callback)
             
-            if result.get("code") != 0:
-                print(f"查询状态失败: {result.get('msg')}")
-                return None
-            
-            status = result.get("data")
-            
-            if callback:
-                callback(status, i + 1)
-            else:
-                print(f"[{i+1}/{max_retries}] 任务状态: {status}")
-            
-            if status == "SUCCESS":
-                print("✅ 任务执行成功！")
+            if outcome == "SUCCESS":
                 return self.get_task_outputs(task_id)
-            elif status == "FAILED":
-                print("❌ 任务执行失败！")
+            elif outcome in ("FAILED", "ERROR"):
                 return None
-            elif status == "QUEUED":
-                print("⏳ 任务正在排队中...")
-            elif status == "RUNNING":
-                print("🔄 任务正在运行中...")
             
             time.sleep(interval)
         
         print("⏰ 轮询超时，任务可能仍在执行中")
         return None
     
+    def _wait_with_watcher(
+        self,
+        task_id: str,
+        max_retries: int,
+        interval: float,
+        callback=None
+    ) -> Optional[Dict[str, Any]]:
+        """通过任务监视器等待任务完成，总等待时长与逐个轮询时一致"""
+        def on_change(snap):
+            if snap["status"] in ("QUEUED", "RUNNING", "SUCCESS", "FAILED"):
+                self._handle_poll_result({"code": 0, "data": snap["status"]}, snap["polls"] - 1, max_retries, callback)
+        
+        self.watcher.subscribe(task_id, on_change)
+        try:
+            final = self.watcher.wait(task_id, timeout=max_retries * interval)
+            snap = final or self.watcher.snapshot(task_id)
+        finally:
+            # 超时后不再有人等待，监视器随之停止轮询该任务
+            self.watcher.unsubscribe(task_id, on_change)
+        
+        if final is None:
+            if snap and snap.get("errors"):
+                print(f"查询状态失败: {snap.get('lastError')}")
+            print("⏰ 轮询超时，任务可能仍在执行中")
+            return None
+        if final["status"] == "ERROR":
+            print(f"查询状态失败: {final.get('lastError')}")
+            return None
+        if final["status"] == "SUCCESS":
+            return self.get_task_outputs(task_id)
+        return None
+    
     def run_workflow(
         self,
         workflow_id: str,
         node_info_list: Optional[List[Dict]] = None,
         max_retries: int = 30,
         interval: int = 10,
-        webhook_url: Optional[str] = None
+        webhook_url: Optional[str] = None,
+        use_cache: bool = True
     ) -> Optional[Dict[str, Any]]:
         """
         运行完整工作流（创建任务 + 轮询等待 + 获取结果）
@@ -293,9 +458,10 @@ class RunningHubClient:
             max_retries: 最大轮询次数
             interval: 轮询间隔（秒）
             webhook_url: 回调URL
+            use_cache: 为 False 时跳过结果缓存查询，强制重新运行（新结果仍会写入缓存）
             
         Returns:
-            任务成功时返回输出结果，失败返回None
+            任务成功时返回输出结果，失败返回None；命中结果缓存时带有 "cached": True 和原任务的 "taskId"
             
         Example:
             client = RunningHubClient("your-api-key")
@@ -305,6 +471,15 @@ class RunningHubClient:
                 for item in result.get("data", []):
                     print(f"生成文件: {item['fileUrl']}")
         """
+        # 0. 查询结果缓存
+        key = None
+        if self.result_cache is not None:
+            key = self.result_key(workflow_id, node_info_list)
+            hit = self.result_cache.get(key) if use_cache else None
+            if hit is not None:
+                print(f"♻️ 命中结果缓存 (原 taskId: {hit['taskId']})，跳过任务创建")
+                return {"code": 0, "msg": "success", "data": hit["outputs"], "taskId": hit["taskId"], "cached": True}
+        
         # 1. 创建任务
         create_result = self.create_task(
             workflow_id=workflow_id,
@@ -312,20 +487,223 @@ class RunningHubClient:
             webhook_url=webhook_url
         )
         
-        if create_result.get("code") != 0:
-            print(f"❌ 创建任务失败: {create_result.get('msg')}")
+        task_id = self._parse_created_task(create_result)
+        if not task_id:
             return None
         
-        data = create_result.get("data", {})
-        task_id = data.get("taskId")
-        task_status = data.get("taskStatus")
-        
-        print(f"✅ 任务创建成功!")
-        print(f"   Task ID: {task_id}")
-        print(f"   Initial Status: {task_status}")
+        if self.watcher is not None:
+            # 有回调时由 webhook 接收端调用 watcher.update() 唤醒，轮询只作兜底
+            self.watcher.watch(task_id, workflow_id=workflow_id, push=bool(webhook_url))
         
         # 2. 等待任务完成
-        return self.wait_for_task(task_id, max_retries, interval)
+        result = self.wait_for_task(task_id, max_retries, interval)
+        if key is not None and result and result.get("code") == 0:
+            self.result_cache.put(key, workflow_id, task_id, result.get("data") or [])
+        return result
+
+
+    def run_workflow_batch(
+        self,
+        workflow_id: str,
+        node_info_lists: List[List[Dict]],
+        max_in_flight: int = 3,
+        output_dir: Optional[str] = None,
+        output_names: Optional[List[str]] = None,
+        timeout: float = 3600,
+        quota_backoff: float = 10,
+        max_quota_backoff: float = 120
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        批量运行同一个工作流（上传 → 创建 → 等待 → 下载 流水线），按完成顺序逐个返回结果
+        
+        Args:
+            workflow_id: 工作流ID
+            node_info_lists: 每个输入对应一个 nodeInfoList；节点项中带 "localFile" 时，
+                             会先上传该本地文件，并用返回的 fileName 作为 fieldValue
+            max_in_flight: 同时处理的输入数上限
+            output_dir: 结果下载目录，为None时不下载
+            output_names: 每个输入的输出文件名前缀，默认使用 taskId
+            timeout: 单个任务的最长等待时间（秒）
+            quota_backoff: 遇到并发上限(421)时的初始等待时间（秒），连续遇到时指数增长
+            max_quota_backoff: 并发上限等待时间的上限（秒）
+            
+        Yields:
+            每个输入的结果字典:
+            - index: 输入在 node_info_lists 中的序号
+            - taskId: 任务ID（创建失败时为None）
+            - status: SUCCESS / FAILED / ERROR
+            - outputs: 任务输出列表（fileUrl、fileType）
+            - files: 已下载的本地文件路径
+            - msg: 失败原因
+            
+        Example:
+            inputs = [[{"nodeId": "1", "fieldName": "video", "localFile": p}] for p in videos]
+            for item in client.run_workflow_batch(workflow_id, inputs, max_in_flight=3, output_dir="Output"):
+                print(item["index"], item["status"], item["files"])
+        """
+        watcher = self.watcher or TaskWatcher(self.query_task_status)
+        gate = _QuotaGate(quota_backoff, max_quota_backoff)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        
+        executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="RunningHubBatch")
+        try:
+            futures = [
+                executor.submit(
+                    self._run_batch_item, index, workflow_id, node_info_list, watcher, gate,
+                    output_dir, output_names[index] if output_names else None, timeout
+                )
+                for index, node_info_list in enumerate(node_info_lists)
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # 调用方提前停止迭代时，取消尚未开始的输入
+            executor.shutdown(wait=False, cancel_futures=True)
+            if watcher is not self.watcher:
+                watcher.stop()
+    
+    def _run_batch_item(
+        self,
+        index: int,
+        workflow_id: str,
+        node_info_list: List[Dict],
+        watcher: TaskWatcher,
+        gate: "_QuotaGate",
+        output_dir: Optional[str],
+        output_name: Optional[str],
+        timeout: float
+    ) -> Dict[str, Any]:
+        """处理批量中的单个输入"""
+        item = {"index": index, "taskId": None, "status": "ERROR", "outputs": [], "files": [], "msg": None}
+        
+        # 1. 上传本地文件
+        node_info_list, error = self._upload_batch_inputs(node_info_list)
+        if error:
+            item["msg"] = error
+            return item
+        
+        # 2. 创建任务（遇到并发上限时等待后重试）
+        deadline = time.time() + timeout
+        while True:
+            gate.wait()
+            create_result = self.create_task(workflow_id, node_info_list)
+            if create_result.get("code") != self.TASK_QUEUE_MAXED:
+                gate.release()
+                break
+            delay = gate.block()
+            print(f"⏳ [{index}] 并发已达上限，{delay:.0f}秒后重试创建任务")
+            if time.time() + delay > deadline:
+                item["msg"] = create_result.get("msg")
+                return item
+        
+        if create_result.get("code") != 0:
+            item["msg"] = create_result.get("msg")
+            return item
+        
+        task_id = create_result["data"]["taskId"]
+        item["taskId"] = task_id
+        
+        # 3. 等待任务完成（由监视器统一轮询）
+        watcher.watch(task_id, workflow_id=workflow_id)
+        latest = {}
+        record = latest.update  # 订阅期间任务保持被监视，超时后仍可读取最近的错误
+        watcher.subscribe(task_id, record)
+        try:
+            final = watcher.wait(task_id, timeout=max(0, deadline - time.time()))
+        finally:
+            watcher.unsubscribe(task_id, record)
+        if final is None:
+            item["msg"] = latest.get("lastError") or "等待超时"
+            return item
+        item["status"] = final["status"]
+        if final["status"] != "SUCCESS":
+            item["msg"] = final.get("lastError") or "任务执行失败"
+            return item
+        
+        # 4. 获取并下载结果
+        outputs_result = self.get_task_outputs(task_id)
+        if outputs_result.get("code") != 0:
+            item["status"] = "ERROR"
+            item["msg"] = outputs_result.get("msg")
+            return item
+        item["outputs"] = outputs_result.get("data") or []
+        
+        if output_dir:
+            prefix = output_name or f"task_{task_id}"
+            for n, output in enumerate(item["outputs"], 1):
+                file_url = output.get("fileUrl")
+                if not file_url:
+                    continue
+                path = os.path.join(output_dir, f"{prefix}_{n}.{output.get('fileType', 'bin')}")
+                error = self._download(file_url, path)
+                if error:
+                    item["status"] = "ERROR"
+                    item["msg"] = error
+                else:
+                    item["files"].append(path)
+                    if self.store is not None:
+                        self.store.add_local_file(task_id, path)
+        return item
+    
+    def _upload_batch_inputs(self, node_info_list: List[Dict]):
+        """上传节点项中的 localFile，返回 (新的nodeInfoList, 错误信息)"""
+        prepared = []
+        for node_info in node_info_list or []:
+            local_file = node_info.get("localFile")
+            if not local_file:
+                prepared.append(node_info)
+                continue
+            content_type = mimetypes.guess_type(local_file)[0] or "application/octet-stream"
+            upload_result = self._upload(local_file, content_type, self.VIDEO_UPLOAD_TIMEOUT)
+            if upload_result.get("code") != 0:
+                return None, f"上传失败: {upload_result.get('msg')}"
+            node_info = {k: v for k, v in node_info.items() if k != "localFile"}
+            node_info["fieldValue"] = upload_result["data"]["fileName"]
+            prepared.append(node_info)
+        return prepared, None
+    
+    def _download(self, url: str, path: str) -> Optional[str]:
+        """流式下载文件，失败时返回错误信息"""
+        try:
+            with self.pool.get(url, stream=True, timeout=300) as resp:
+                resp.raise_for_status()
+                with open(path, 'wb') as f:
+                    for chunk in resp.iter_content(chunk_size=1024 * 1024):
+                        f.write(chunk)
+            return None
+        except (requests.exceptions.RequestException, OSError) as e:
+            return f"下载失败: {str(e)}"
+
+
+class _QuotaGate:
+    """批量任务共享的并发上限退避：任一输入遇到421时，所有输入都暂停创建"""
+    
+    def __init__(self, backoff: float, max_backoff: float):
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._until = 0.0
+        self._streak = 0
+    
+    def wait(self):
+        while True:
+            with self._lock:
+                delay = self._until - time.time()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+    
+    def block(self) -> float:
+        with self._lock:
+            delay = min(self.max_backoff, self.backoff * (2 ** self._streak))
+            self._streak += 1
+            self._until = max(self._until, time.time() + delay)
+            return delay
+    
+    def release(self):
+        with self._lock:
+            self._streak = 0
 
 
 # 便捷函数
@@ -0,0 +1,166 @@
+"""
+multipart 上传流式转发
+边读取浏览器上传的 multipart 请求体，边把文件内容写入发往 RunningHub 的 multipart 请求体，
+文件不落盘、内存占用与文件大小无关
+
+使用方法:
+    upload = StreamingUpload(request.stream, boundary)
+    part = upload.read_until_file()              # 读取到文件部分开头，之前的表单字段在 upload.fields 中
+    content_type, body = build_multipart_body(
+        {"apiKey": API_KEY, "fileType": "input"}, "file", part.filename, part.content_type, upload.iter_file()
+    )
+    requests.post(url, data=body, headers={"Content-Type": content_type})
+
+说明:
+    - 出站请求体是生成器，requests 以分块传输(chunked)发送；只有上游读走一块才会从浏览器再读一块，
+      慢速客户端或慢速上游都会通过 TCP 流控自然形成背压
+    - 任意时刻缓存在内存中的数据不超过一个 chunk_size
+"""
+
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Tuple
+
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+
+@dataclass
+class FilePart:
+    """请求体中的文件部分"""
+    name: str
+    filename: str
+    content_type: Optional[str]
+
+
+class StreamingUpload:
+    """增量解析 multipart 请求体"""
+
+    def __init__(self, stream, boundary: str, chunk_size: int = 64 * 1024, max_field_size: int = 64 * 1024):
+        """
+        Args:
+            stream: 请求体输入流（如 flask.request.stream）
+            boundary: multipart 边界字符串
+            chunk_size: 每次从输入流读取的字节数
+            max_field_size: 普通表单字段的最大长度
+        """
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.max_field_size = max_field_size
+        self.fields: Dict[str, str] = {}
+        self.bytes_read = 0
+        self.file_size = 0
+        self._decoder = MultipartDecoder(boundary.encode("latin-1"), max_parts=100)
+        self._eof = False
+        self._field_name = None
+        self._field_data = bytearray()
+
+    def _next_event(self):
+        """取下一个解析事件，数据不足时从输入流再读一块"""
+        while True:
+            event = self._decoder.next_event()
+            if not isinstance(event, NeedData):
+                return event
+            if self._eof:
+                return None
+            chunk = self.stream.read(self.chunk_size)
+            if chunk:
+                self.bytes_read += len(chunk)
+                self._decoder.receive_data(chunk)
+            else:
+                self._eof = True
+                self._decoder.receive_data(None)
+
+    def _collect_field(self, event) -> bool:
+        """处理普通表单字段事件，返回是否已处理"""
+        if isinstance(event, Field):
+            self._field_name = event.name
+            self._field_data = bytearray()
+            return True
+        if isinstance(event, Data) and self._field_name is not None:
+            self._field_data += event.data
+            if len(self._field_data) > self.max_field_size:
+                raise ValueError(f"表单字段过大: {self._field_name}")
+            if not event.more_data:
+                self.fields[self._field_name] = self._field_data.decode("utf-8", "replace")
+                self._field_name = None
+            return True
+        return False
+
+    def read_until_file(self) -> Optional[FilePart]:
+        """
+        读取到第一个文件部分的开头
+
+        Returns:
+            文件部分信息，请求中没有文件时返回None（此时整个请求体已读完）
+        """
+        while True:
+            event = self._next_event()
+            if event is None or isinstance(event, Epilogue):
+                return None
+            if self._collect_field(event):
+                continue
+            if isinstance(event, File):
+                return FilePart(event.name, event.filename or "", event.headers.get("Content-Type"))
+
+    def iter_file(self) -> Iterator[bytes]:
+        """逐块产出当前文件部分的内容；结束后继续读完剩余的表单字段"""
+        while True:
+            event = self._next_event()
+            if event is None:
+                raise ValueError("请求体不完整")
+            if isinstance(event, Data):
+                if event.data:
+                    self.file_size += len(event.data)
+                    yield event.data
+                if not event.more_data:
+                    break
+        self.finish()
+
+    def finish(self):
+        """读完请求体中剩余的部分，收集文件之后的表单字段"""
+        while True:
+            event = self._next_event()
+            if event is None or isinstance(event, Epilogue):
+                return
+            self._collect_field(event)
+
+
+def build_multipart_body(
+    fields: Dict[str, str],
+    file_field: str,
+    filename: str,
+    content_type: str,
+    file_chunks: Iterator[bytes]
+) -> Tuple[str, Iterator[bytes]]:
+    """
+    构造流式 multipart 请求体
+
+    Args:
+        fields: 放在文件之前的普通表单字段
+        file_field: 文件字段名
+        filename: 文件名
+        content_type: 文件的 Content-Type
+        file_chunks: 文件内容的分块迭代器
+
+    Returns:
+        (Content-Type 请求头, 请求体生成器)
+    """
+    boundary = uuid.uuid4().hex
+
+    def body():
+        for name, value in fields.items():
+            yield (
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f"{value}\r\n"
+            ).encode("utf-8")
+        yield (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        for chunk in file_chunks:
+            yield chunk
+        yield f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+    return f"multipart/form-data; boundary={boundary}", body()
@@ -0,0 +1,301 @@
+"""
+RunningHub 任务状态持久化（SQLite）
+记录所有已提交任务的工作流、节点参数、状态历史、输出URL、本地文件和耗时，
+Flask 服务重启或 ComfyUI 崩溃后可以继续跟踪尚未结束的任务，而不是重新提交（重新付费）
+
+使用方法:
+    from task_store import get_task_store, account_id
+
+    store = get_task_store()
+    store.record_created(task_id, workflow_id, node_info_list, account=account_id(api_key), source="app")
+    store.record_status(task_id, "RUNNING")
+    store.record_outputs(task_id, [{"fileUrl": "...", "fileType": "png"}])
+    store.add_local_file(task_id, "Output/result.png")
+
+    for task in store.unfinished(account=account_id(api_key)):   # 启动时恢复
+        watcher.watch(task["taskId"], workflow_id=task["workflowId"])
+
+说明:
+    - 数据库默认位于 ~/.runninghub/tasks.db，可用环境变量 RH_TASK_DB 覆盖；
+      同一台机器上的 Flask 服务和 ComfyUI 节点共用同一个数据库（WAL 模式，多进程可同时读写）
+    - 状态只在发生变化时写入，重复轮询到相同状态不会产生写操作
+    - 不保存 API Key 本身，只保存其哈希（account）用于区分账户
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, List, Dict, Any
+
+# 远程任务的最终状态；ERROR（本地查询失败）不算结束，恢复时会继续跟踪
+FINISHED_STATUSES = ("SUCCESS", "FAILED", "CANCELLED")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    workflow_id TEXT,
+    account TEXT,
+    source TEXT,
+    node_info TEXT,
+    fingerprint TEXT,
+    status TEXT,
+    outputs TEXT,
+    local_files TEXT,
+    created_at REAL,
+    updated_at REAL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+CREATE INDEX IF NOT EXISTS idx_tasks_workflow ON tasks(workflow_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_created ON tasks(created_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_fingerprint ON tasks(fingerprint);
+CREATE TABLE IF NOT EXISTS task_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL,
+    status TEXT,
+    at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_events_task ON task_events(task_id);
+"""
+
+
+def account_id(api_key: str) -> str:
+    """API Key 的哈希，用于区分账户而不落盘保存密钥"""
+    return hashlib.sha1((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def fingerprint(workflow_id: str, node_info_list: Optional[List[Dict]]) -> str:
+    """同一工作流 + 相同节点参数的提交具有相同指纹，用于识别崩溃后的重复提交"""
+    data = json.dumps([str(workflow_id), node_info_list or []], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+class TaskStore:
+    """任务状态存储"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: 数据库文件路径，默认 ~/.runninghub/tasks.db（环境变量 RH_TASK_DB）；
+                  传入 ":memory:" 表示只保存在内存中
+        """
+        if path is None:
+            path = os.getenv("RH_TASK_DB") or os.path.join(os.path.expanduser("~"), ".runninghub", "tasks.db")
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    # --- 写入 ---
+
+    def record_created(
+        self,
+        task_id: str,
+        workflow_id: Optional[str],
+        node_info_list: Optional[List[Dict]] = None,
+        account: Optional[str] = None,
+        source: Optional[str] = None,
+        status: str = "QUEUED"
+    ):
+        """记录新提交的任务（重复记录同一任务时保留原有数据）"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO tasks (task_id, workflow_id, account, source, node_info, fingerprint,"
+                    " status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (str(task_id), workflow_id, account, source,
+                     json.dumps(node_info_list or [], ensure_ascii=False),
+                     fingerprint(workflow_id, node_info_list), status, now, now)
+                )
+                if cur.rowcount:
+                    self._conn.execute("INSERT INTO task_events (task_id, status, at) VALUES (?, ?, ?)",
+                                       (str(task_id), status, now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def record_status(self, task_id: str, status: Optional[str]) -> bool:
+        """
+        记录状态变化（只对已记录的任务生效）
+
+        Returns:
+            状态是否发生了变化
+        """
+        if not status:
+            return False
+        now = time.time()
+        finished = status in FINISHED_STATUSES
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = self._conn.execute(
+                    "UPDATE tasks SET status = ?, updated_at = ?,"
+                    " started_at = CASE WHEN ? = 'RUNNING' AND started_at IS NULL THEN ? ELSE started_at END,"
+                    " finished_at = CASE WHEN ? THEN ? ELSE finished_at END"
+                    " WHERE task_id = ? AND status IS NOT ? AND (status IS NULL OR status NOT IN (?, ?, ?))",
+                    (status, now, status, now, finished, now, str(task_id), status) + FINISHED_STATUSES
+                )
+                changed = cur.rowcount > 0
+                if changed:
+                    self._conn.execute("INSERT INTO task_events (task_id, status, at) VALUES (?, ?, ?)",
+                                       (str(task_id), status, now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return changed
+
+    def record_outputs(self, task_id: str, outputs: List[Dict]):
+        """记录任务输出列表（fileUrl、fileType）"""
+        with self._lock:
+            self._conn.execute("UPDATE tasks SET outputs = ?, updated_at = ? WHERE task_id = ?",
+                               (json.dumps(outputs, ensure_ascii=False), time.time(), str(task_id)))
+
+    def add_local_file(self, task_id: str, path: str):
+        """追加一个已下载的本地文件路径"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT local_files FROM tasks WHERE task_id = ?",
+                                         (str(task_id),)).fetchone()
+                if row is not None:
+                    files = json.loads(row["local_files"] or "[]")
+                    if path not in files:
+                        files.append(path)
+                        self._conn.execute("UPDATE tasks SET local_files = ?, updated_at = ? WHERE task_id = ?",
+                                           (json.dumps(files, ensure_ascii=False), time.time(), str(task_id)))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # --- 查询 ---
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """单个任务的记录，不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM tasks WHERE task_id = ?", (str(task_id),)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def history(self, task_id: str) -> List[Dict[str, Any]]:
+        """任务的状态历史 [{"status", "at"}]，按时间排序"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, at FROM task_events WHERE task_id = ? ORDER BY id",
+                                      (str(task_id),)).fetchall()
+        return [{"status": r["status"], "at": r["at"]} for r in rows]
+
+    def list(
+        self,
+        status: Optional[str] = None,
+        workflow_id: Optional[str] = None,
+        since: Optional[float] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """按状态 / 工作流 / 创建时间筛选任务，最新的在前"""
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if workflow_id is not None:
+            clauses.append("workflow_id = ?")
+            params.append(workflow_id)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM tasks{where} ORDER BY created_at DESC LIMIT ?",
+                                      params + [limit]).fetchall()
+        return [self._to_dict(r) for r in rows]
+
+    def unfinished(self, account: Optional[str] = None, max_age: float = 24 * 3600) -> List[Dict[str, Any]]:
+        """
+        尚未结束的任务（用于启动时恢复），最早提交的在前
+
+        Args:
+            account: 只返回该账户的任务
+            max_age: 超过该时长（秒）的任务不再恢复
+        """
+        sql = ("SELECT * FROM tasks WHERE (status IS NULL OR status NOT IN (?, ?, ?)) AND created_at >= ?")
+        params = list(FINISHED_STATUSES) + [time.time() - max_age]
+        if account is not None:
+            sql += " AND account = ?"
+            params.append(account)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY created_at", params).fetchall()
+        return [self._to_dict(r) for r in rows]
+
+    def find_unfinished(
+        self,
+        workflow_id: str,
+        node_info_list: Optional[List[Dict]],
+        account: Optional[str] = None,
+        max_age: float = 24 * 3600
+    ) -> Optional[Dict[str, Any]]:
+        """
+        查找参数完全相同、尚未结束的最近一次提交，不存在时返回None
+
+        只用于用户显式要求的恢复（ComfyUI ExecuteNode 的 resume_unfinished）；正常提交总是创建新任务，
+        相同输入的两次运行（如含随机种子的工作流）是合法的独立任务。网页服务启动时的恢复见 unfinished()
+        """
+        sql = ("SELECT * FROM tasks WHERE fingerprint = ? AND (status IS NULL OR status NOT IN (?, ?, ?))"
+               " AND created_at >= ?")
+        params = [fingerprint(workflow_id, node_info_list)] + list(FINISHED_STATUSES) + [time.time() - max_age]
+        if account is not None:
+            sql += " AND account = ?"
+            params.append(account)
+        with self._lock:
+            row = self._conn.execute(sql + " ORDER BY created_at DESC LIMIT 1", params).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        started, finished = row["started_at"], row["finished_at"]
+        return {
+            "taskId": row["task_id"],
+            "workflowId": row["workflow_id"],
+            "account": row["account"],
+            "source": row["source"],
+            "nodeInfoList": json.loads(row["node_info"] or "[]"),
+            "status": row["status"],
+            "outputs": json.loads(row["outputs"]) if row["outputs"] else None,
+            "localFiles": json.loads(row["local_files"] or "[]"),
+            "createdAt": row["created_at"],
+            "updatedAt": row["updated_at"],
+            "startedAt": started,
+            "finishedAt": finished,
+            "runSeconds": finished - started if started and finished else None,
+        }
+
+
+# 进程级共享实例（按数据库路径区分）
+_stores: Dict[str, TaskStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_task_store(path: Optional[str] = None) -> TaskStore:
+    """获取进程级共享的任务存储"""
+    key = path or os.getenv("RH_TASK_DB") or ""
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = TaskStore(path)
+            _stores[key] = store
+        return store
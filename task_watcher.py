@@ -0,0 +1,505 @@
+"""
+RunningHub 任务监视器
+在单个调度循环中统一轮询所有进行中的任务，并把状态变化分发给订阅者
+
+使用方法:
+    from runninghub_client import RunningHubClient
+    from task_watcher import TaskWatcher
+
+    client = RunningHubClient(api_key="your-api-key")
+    watcher = TaskWatcher(client.query_task_status)
+
+    watcher.watch(task_id, workflow_id="2016195556967714818")
+    watcher.subscribe(task_id, lambda snap: print(snap["status"]))   # 回调
+    future = watcher.future(task_id)                                  # Future
+    q = watcher.subscribe_queue(task_id)                              # 队列
+    final = future.result(timeout=600)
+
+说明:
+    - 500 个并发任务只有 1 个调度线程，状态查询在一个小线程池中执行，
+      同时在途的查询数不超过 max_concurrent_polls
+    - 轮询间隔自适应：刚提交时快速轮询，长时间运行时逐渐放慢，
+      接近预计完成时间（按工作流统计的 EWMA 耗时）时再加快
+    - 外部渠道可通过 update() 直接推送状态，或通过 refresh() 立即查询一次（如 webhook 唤醒），
+      立即唤醒等待者；以 watch(..., push=True) 登记的任务只按 push_interval 做兜底轮询
+    - 查询失败只会拉长轮询间隔；连续失败达到 max_errors 次时向订阅者推送一次
+      带 errors/lastError 的快照作为告警，下一次查询成功后自动恢复
+    - 连续失败达到 give_up_errors 次（如任务已被删除）或监视超过 max_age 秒时放弃，
+      以 ERROR 状态结束任务，Future 和订阅者都会收到这个最终快照
+    - wait() 超时或最后一个订阅者取消后，没有人再关心的未结束任务自动停止监视
+"""
+
+import heapq
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Dict, Any, List
+
+# ERROR 只在监视器放弃时设置（见 give_up_errors/max_age），单次查询失败不会结束任务
+FINAL_STATUSES = ("SUCCESS", "FAILED", "ERROR")
+
+
+@dataclass
+class WatcherConfig:
+    """监视器配置"""
+    min_interval: float = 2.0           # 最短轮询间隔（秒）
+    max_interval: float = 30.0          # 最长轮询间隔（秒）
+    warmup: float = 20.0                # 提交后的快速轮询期（秒）
+    backoff_ratio: float = 0.1          # 无耗时估计时，间隔 = 已等待时间 * 该比例
+    near_finish_ratio: float = 0.2      # 剩余时间小于预计耗时的该比例时视为接近完成
+    ewma_alpha: float = 0.3             # 耗时估计的平滑系数
+    max_errors: int = 5                 # 连续查询失败多少次后向订阅者告警（继续轮询）
+    give_up_errors: int = 60            # 连续查询失败多少次后放弃，以 ERROR 结束任务
+    max_age: Optional[float] = 6 * 3600  # 监视超过该时长（秒）仍未结束时放弃；None 表示不限
+    max_concurrent_polls: int = 8       # 同时进行的状态查询数
+    retention: float = 600.0            # 已结束任务的快照保留时间（秒）
+    push_interval: float = 120.0        # 有 webhook 推送的任务的兜底轮询间隔（秒）
+
+
+@dataclass
+class TaskState:
+    """单个任务的监视状态"""
+    task_id: str
+    workflow_id: Optional[str] = None
+    status: Optional[str] = None
+    push: bool = False
+    polls: int = 0
+    errors: int = 0
+    last_error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: Optional[float] = None
+    running_since: Optional[float] = None
+    finished_at: Optional[float] = None
+    next_poll_at: Optional[float] = None
+    generation: int = 0
+    polling: bool = False
+    subscribers: List[Any] = field(default_factory=list)
+    futures: List[Future] = field(default_factory=list)
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINAL_STATUSES
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "taskId": self.task_id,
+            "workflowId": self.workflow_id,
+            "status": self.status,
+            "done": self.done,
+            "push": self.push,
+            "polls": self.polls,
+            "errors": self.errors,
+            "lastError": self.last_error,
+            "createdAt": self.created_at,
+            "updatedAt": self.updated_at,
+            "finishedAt": self.finished_at,
+            "nextPollAt": self.next_poll_at,
+        }
+
+
+class TaskWatcher:
+    """多任务状态监视器"""
+
+    def __init__(
+        self,
+        query_fn: Callable[[str], Dict[str, Any]],
+        config: Optional[WatcherConfig] = None
+    ):
+        """
+        初始化监视器
+
+        Args:
+            query_fn: 状态查询函数，接收taskId，返回 {"code": 0, "data": "RUNNING"} 格式的结果，
+                      通常传入 RunningHubClient.query_task_status
+            config: 监视器配置，默认使用 WatcherConfig()
+        """
+        self.query_fn = query_fn
+        self.config = config or WatcherConfig()
+        self._tasks: Dict[str, TaskState] = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._expected: Dict[str, float] = {}
+        self._cond = threading.Condition()
+        self._executor = None
+        self._thread = None
+        self._stopped = False
+        self._in_flight = 0
+        self._total_polls = 0
+
+    # --- 生命周期 ---
+
+    def start(self):
+        """启动调度线程（watch 时会自动调用）"""
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._stopped = False
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.config.max_concurrent_polls,
+                thread_name_prefix="TaskWatcherPoll"
+            )
+            self._thread = threading.Thread(target=self._run, name="TaskWatcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """停止调度线程"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            thread, executor = self._thread, self._executor
+        if thread is not None:
+            thread.join(timeout)
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    # --- 任务管理 ---
+
+    def watch(self, task_id: str, workflow_id: Optional[str] = None, push: bool = False) -> Dict[str, Any]:
+        """
+        开始监视任务（重复调用是安全的）
+
+        Args:
+            task_id: 任务ID
+            workflow_id: 工作流ID，用于统计该工作流的平均耗时
+            push: 任务结束时会通过 webhook 调用 update()，轮询只作为 push_interval 间隔的兜底
+
+        Returns:
+            任务当前快照
+        """
+        self.start()
+        with self._cond:
+            state = self._tasks.get(task_id)
+            if state is None:
+                state = TaskState(task_id=str(task_id), workflow_id=workflow_id, push=push)
+                self._tasks[task_id] = state
+                self._schedule(state, time.time())
+            else:
+                if workflow_id and not state.workflow_id:
+                    state.workflow_id = workflow_id
+                if push and not state.push:
+                    state.push = True
+                    if not state.done and not state.polling:
+                        self._schedule(state, time.time())
+            return state.snapshot()
+
+    def unwatch(self, task_id: str):
+        """停止监视任务，未完成的 Future 会被取消（wait 超时或最后一个订阅者取消时会自动调用）"""
+        with self._cond:
+            state = self._tasks.pop(task_id, None)
+        if state is not None:
+            for fut in state.futures:
+                fut.cancel()
+
+    def snapshot(self, task_id: str, wait_first: float = 0) -> Optional[Dict[str, Any]]:
+        """
+        获取任务快照
+
+        Args:
+            task_id: 任务ID
+            wait_first: 尚未拿到首次状态时最多等待的秒数
+
+        Returns:
+            快照字典，任务未被监视时返回None
+        """
+        deadline = time.time() + wait_first
+        with self._cond:
+            while True:
+                state = self._tasks.get(task_id)
+                if state is None:
+                    return None
+                remaining = deadline - time.time()
+                if state.status is not None or state.errors or remaining <= 0:
+                    return state.snapshot()
+                self._cond.wait(remaining)
+
+    def update(self, task_id: str, status: str, workflow_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        由外部渠道（如 webhook）直接推送任务状态
+
+        Args:
+            task_id: 任务ID
+            status: 新状态 QUEUED / RUNNING / SUCCESS / FAILED
+
+        Returns:
+            更新后的快照
+        """
+        self.start()
+        with self._cond:
+            state = self._tasks.get(task_id)
+            if state is None:
+                state = TaskState(task_id=str(task_id), workflow_id=workflow_id)
+                self._tasks[task_id] = state
+            notify = self._apply_status(state, status, time.time())
+            if not state.done:
+                self._schedule(state, time.time())
+            snap = state.snapshot()
+        self._dispatch(notify)
+        return snap
+
+    def refresh(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        立即查询一次任务状态（例如收到 webhook 唤醒时），不等下一次轮询
+
+        Returns:
+            查询后的快照，任务未被监视时返回None
+        """
+        with self._cond:
+            state = self._tasks.get(task_id)
+            if state is None or state.done:
+                return state.snapshot() if state is not None else None
+        try:
+            result = self.query_fn(task_id)
+        except Exception as e:
+            result = {"code": -1, "msg": f"查询异常: {str(e)}", "data": None}
+
+        with self._cond:
+            state = self._tasks.get(task_id)
+            if state is None:
+                return None
+            notify = [] if state.done else self._apply_result(state, result, time.time())
+            snap = state.snapshot()
+            self._cond.notify_all()
+        self._dispatch(notify)
+        return snap
+
+    # --- 订阅 ---
+
+    def subscribe(self, task_id: str, callback: Callable[[Dict[str, Any]], None]):
+        """订阅状态变化，callback 接收快照字典；返回值可用于 unsubscribe"""
+        return self._add_subscriber(task_id, callback)
+
+    def subscribe_queue(self, task_id: str, maxsize: int = 0) -> queue.Queue:
+        """订阅状态变化到队列，每次变化放入一个快照，done 为 True 的快照是最后一个"""
+        q = queue.Queue(maxsize)
+        self._add_subscriber(task_id, q)
+        return q
+
+    def unsubscribe(self, task_id: str, subscriber):
+        """取消订阅（回调或队列）"""
+        with self._cond:
+            state = self._tasks.get(task_id)
+            if state is not None and subscriber in state.subscribers:
+                state.subscribers.remove(subscriber)
+                self._forget_if_idle(state)
+
+    def future(self, task_id: str) -> Future:
+        """返回一个在任务结束时以最终快照完成的 Future"""
+        fut = Future()
+        self.watch(task_id)
+        with self._cond:
+            state = self._tasks[task_id]
+            if state.done:
+                fut.set_result(state.snapshot())
+            else:
+                state.futures.append(fut)
+        return fut
+
+    def wait(self, task_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """阻塞等待任务结束，超时返回None（超时的 Future 会被移除）"""
+        fut = self.future(task_id)
+        try:
+            return fut.result(timeout)
+        except Exception:
+            with self._cond:
+                state = self._tasks.get(task_id)
+                if state is not None and fut in state.futures:
+                    state.futures.remove(fut)
+                    self._forget_if_idle(state)
+            return None
+
+    def _forget_if_idle(self, state: TaskState):
+        """未结束且已没有等待者和订阅者的任务停止监视；需持有锁"""
+        if not state.done and not state.subscribers and not state.futures \
+                and self._tasks.get(state.task_id) is state:
+            del self._tasks[state.task_id]
+
+    def _add_subscriber(self, task_id: str, subscriber):
+        self.watch(task_id)
+        with self._cond:
+            state = self._tasks[task_id]
+            state.subscribers.append(subscriber)
+            snap = state.snapshot() if state.status is not None else None
+        # 立即推送当前状态，避免订阅前发生的变化丢失
+        if snap is not None:
+            self._dispatch([([subscriber], [], snap)])
+        return subscriber
+
+    # --- 统计 ---
+
+    def expected_duration(self, workflow_id: Optional[str]) -> Optional[float]:
+        """某工作流的预计运行耗时（秒），尚无统计时返回None"""
+        with self._cond:
+            return self._expected.get(workflow_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """监视器统计信息"""
+        with self._cond:
+            active = sum(1 for s in self._tasks.values() if not s.done)
+            return {
+                "tracked": len(self._tasks),
+                "active": active,
+                "in_flight": self._in_flight,
+                "total_polls": self._total_polls,
+                "expected_durations": dict(self._expected),
+            }
+
+    # --- 调度 ---
+
+    def _next_interval(self, state: TaskState, now: float) -> float:
+        """计算下一次轮询间隔"""
+        cfg = self.config
+        if state.errors:
+            return min(cfg.max_interval, cfg.min_interval * (2 ** state.errors))
+        if state.push:
+            return cfg.push_interval
+
+        age = now - state.created_at
+        if age < cfg.warmup:
+            return cfg.min_interval
+
+        expected = self._expected.get(state.workflow_id)
+        if state.status == "RUNNING" and state.running_since is not None and expected:
+            running = now - state.running_since
+            remaining = expected - running
+            if remaining <= max(cfg.min_interval, expected * cfg.near_finish_ratio):
+                # 接近预计完成时间；大幅超出预计时退回到逐步放慢
+                if running <= expected * 2:
+                    return cfg.min_interval
+            else:
+                return max(cfg.min_interval, min(cfg.max_interval, remaining / 2))
+
+        return max(cfg.min_interval, min(cfg.max_interval, age * cfg.backoff_ratio))
+
+    def _schedule(self, state: TaskState, now: float):
+        state.generation += 1
+        state.next_poll_at = now + (0 if state.polls == 0 and state.status is None
+                                    else self._next_interval(state, now))
+        heapq.heappush(self._heap, (state.next_poll_at, next(self._seq), state.task_id, state.generation))
+        self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                now = time.time()
+                self._evict(now)
+                due = []
+                while self._heap and self._heap[0][0] <= now and \
+                        self._in_flight < self.config.max_concurrent_polls:
+                    _, _, task_id, generation = heapq.heappop(self._heap)
+                    state = self._tasks.get(task_id)
+                    if state is None or state.done or state.polling or state.generation != generation:
+                        continue
+                    state.polling = True
+                    self._in_flight += 1
+                    due.append(task_id)
+
+                if not due:
+                    wait = None
+                    if self._heap and self._in_flight < self.config.max_concurrent_polls:
+                        wait = max(0.0, self._heap[0][0] - now)
+                    self._cond.wait(min(wait, self.config.retention) if wait is not None else self.config.retention)
+                    continue
+
+            for task_id in due:
+                self._executor.submit(self._poll, task_id)
+
+    def _poll(self, task_id: str):
+        try:
+            result = self.query_fn(task_id)
+        except Exception as e:
+            result = {"code": -1, "msg": f"查询异常: {str(e)}", "data": None}
+
+        notify = []
+        with self._cond:
+            self._in_flight -= 1
+            self._total_polls += 1
+            state = self._tasks.get(task_id)
+            if state is not None:
+                state.polling = False
+                notify = self._apply_result(state, result, time.time())
+            self._cond.notify_all()
+        self._dispatch(notify)
+
+    def _apply_result(self, state: TaskState, result: Dict[str, Any], now: float) -> list:
+        """处理一次状态查询的结果并安排下一次轮询，返回需要分发的列表；需持有锁"""
+        state.polls += 1
+        notify = []
+        if result.get("code") == 0:
+            warned = state.errors >= self.config.max_errors
+            state.errors = 0
+            state.last_error = None
+            notify = self._apply_status(state, result.get("data"), now)
+            if warned and not notify:
+                # 状态未变化时也通知一次，让订阅者撤销告警
+                notify = [(list(state.subscribers), [], state.snapshot())]
+        else:
+            state.errors += 1
+            state.last_error = result.get("msg")
+            if state.errors == self.config.max_errors:
+                # 只告警一次，任务仍按退避间隔继续轮询
+                notify = [(list(state.subscribers), [], state.snapshot())]
+        cfg = self.config
+        if not state.done and (state.errors >= cfg.give_up_errors or
+                               cfg.max_age is not None and now - state.created_at > cfg.max_age):
+            # 任务可能已被删除或永远不会结束：以 ERROR 结束，释放等待者与订阅者
+            if state.last_error is None:
+                state.last_error = f"监视超过 {cfg.max_age:.0f} 秒仍未结束"
+            notify = self._apply_status(state, "ERROR", now)
+        if not state.done:
+            self._schedule(state, now)
+        return notify
+
+    def _apply_status(self, state: TaskState, status: Optional[str], now: float) -> list:
+        """更新状态，返回需要分发的 (订阅者, futures, 快照) 列表；需持有锁"""
+        state.updated_at = now
+        if status == state.status or state.done:
+            return []
+
+        state.status = status
+        if status == "RUNNING" and state.running_since is None:
+            state.running_since = now
+        if not state.done:
+            return [(list(state.subscribers), [], state.snapshot())]
+
+        state.finished_at = now
+        if status == "SUCCESS" and state.workflow_id:
+            self._record_duration(state.workflow_id, now - (state.running_since or state.created_at))
+        futures, state.futures = state.futures, []
+        return [(list(state.subscribers), futures, state.snapshot())]
+
+    def _record_duration(self, workflow_id: str, duration: float):
+        previous = self._expected.get(workflow_id)
+        if previous is None:
+            self._expected[workflow_id] = duration
+        else:
+            alpha = self.config.ewma_alpha
+            self._expected[workflow_id] = alpha * duration + (1 - alpha) * previous
+
+    def _evict(self, now: float):
+        expired = [tid for tid, s in self._tasks.items()
+                   if s.done and now - s.finished_at > self.config.retention]
+        for tid in expired:
+            del self._tasks[tid]
+
+    @staticmethod
+    def _dispatch(notify: list):
+        """在锁外通知订阅者"""
+        for subscribers, futures, snap in notify:
+            for sub in subscribers:
+                try:
+                    if isinstance(sub, queue.Queue):
+                        sub.put_nowait(snap)
+                    else:
+                        sub(snap)
+                except Exception as e:
+                    print(f"⚠️ 任务状态订阅者处理失败: {e}")
+            for fut in futures:
+                if not fut.done():
+                    fut.set_result(snap)
+
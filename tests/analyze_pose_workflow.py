@@ -5,6 +5,14 @@ import json
 import sys
 import os
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workflow_graph import get_workflow_graph, parse_workflow, sort_node_ids
+
+def print_inputs(graph, node_id, indent):
+    for key, value in graph.inputs(node_id).items():
+        print(f"{indent}- {key}: {value}")
+
 def main():
     # 读取工作流JSON
     workflow_path = os.path.join(os.path.dirname(__file__), "pose_workflow.json")
@@ -17,66 +25,47 @@ def main():
         json.dump(workflow_data, f, indent=2, ensure_ascii=False)
     print(f"✅ 格式化后的JSON已保存到: {formatted_path}")
     
-    # 分析工作流
-    if "workflow" in workflow_data:
-        workflow = workflow_data["workflow"]
-    elif "prompt" in workflow_data:
-        # 有些API返回的格式是 {"prompt": {...}}
-        workflow = json.loads(workflow_data["prompt"])
-    else:
-        workflow = workflow_data
+    # 解析工作流并建立图索引（兼容 {"workflow": ...}、{"prompt": "<json>"} 和裸节点字典）
+    workflow = parse_workflow(workflow_data)
+    graph = get_workflow_graph(workflow)
+    node_ids = sort_node_ids(graph.nodes)
     
     print("\n" + "=" * 80)
     print("工作流节点分析")
     print("=" * 80)
     
-    # 收集所有节点信息
-    nodes_info = []
-    for node_id, node_data in workflow.items():
-        if isinstance(node_data, dict):
-            node_type = node_data.get("class_type", "Unknown")
-            meta = node_data.get("_meta", {})
-            title = meta.get("title", "")
-            inputs = node_data.get("inputs", {})
-            
-            nodes_info.append({
-                "id": node_id,
-                "type": node_type,
-                "title": title,
-                "inputs": inputs
-            })
-    
-    # 按节点ID排序
-    nodes_info.sort(key=lambda x: int(x["id"]) if x["id"].isdigit() else 0)
-    
-    print(f"\n总节点数: {len(nodes_info)}")
+    print(f"\n总节点数: {len(graph)}")
     print("\n所有节点列表:")
     print("-" * 80)
-    for node in nodes_info:
-        print(f"  Node {node['id']:>3}: {node['type']:<40} | {node['title']}")
+    for node_id in node_ids:
+        print(f"  Node {node_id:>3}: {graph.class_type(node_id):<40} | {graph.title(node_id)}")
     
     # 分析与图片尺寸/分辨率相关的节点
     print("\n" + "=" * 80)
     print("🔍 图片尺寸/分辨率相关节点分析")
     print("=" * 80)
     
-    # 关键词匹配
+    # 关键词匹配：按 class_type 和输入名索引查找，标题逐个比较
     size_keywords = ['width', 'height', 'size', 'resolution', 'scale', 'EmptyImage', 
                      'LoadImage', 'ImageScale', 'Upscale', 'Resize', 'Crop']
-    
-    relevant_nodes = []
-    for node in nodes_info:
-        node_str = json.dumps(node, ensure_ascii=False).lower()
-        if any(kw.lower() in node_str for kw in size_keywords):
-            relevant_nodes.append(node)
-    
-    print(f"\n找到 {len(relevant_nodes)} 个可能相关的节点:\n")
-    for node in relevant_nodes:
-        print(f"  📍 Node {node['id']}: {node['type']}")
-        print(f"     标题: {node['title']}")
+    keywords = [kw.lower() for kw in size_keywords]
+    
+    relevant = set()
+    for class_type in graph.class_types():
+        if any(kw in class_type.lower() for kw in keywords):
+            relevant.update(graph.nodes_of_class(class_type))
+    for name in graph.input_names():
+        if any(kw in name.lower() for kw in keywords):
+            relevant.update(graph.nodes_with_input(name))
+    relevant.update(node_id for node_id in node_ids
+                    if any(kw in graph.title(node_id).lower() for kw in keywords))
+    
+    print(f"\n找到 {len(relevant)} 个可能相关的节点:\n")
+    for node_id in sort_node_ids(relevant):
+        print(f"  📍 Node {node_id}: {graph.class_type(node_id)}")
+        print(f"     标题: {graph.title(node_id)}")
         print(f"     输入参数:")
-        for key, value in node['inputs'].items():
-            print(f"       - {key}: {value}")
+        print_inputs(graph, node_id, "       ")
         print()
     
     # 分析连接关系
@@ -86,37 +75,36 @@ def main():
     
     # 查找图像处理链
     image_nodes = []
-    for node in nodes_info:
-        if any(x in node['type'].lower() for x in ['image', 'vae', 'sample', 'decode']):
-            image_nodes.append(node)
+    for class_type in graph.class_types():
+        if any(x in class_type.lower() for x in ['image', 'vae', 'sample', 'decode']):
+            image_nodes.extend(graph.nodes_of_class(class_type))
     
     print(f"\n图像处理链节点 ({len(image_nodes)} 个):")
-    for node in image_nodes:
-        print(f"  Node {node['id']}: {node['type']} - {node['title']}")
+    for node_id in sort_node_ids(image_nodes):
+        print(f"  Node {node_id}: {graph.class_type(node_id)} - {graph.title(node_id)}")
     
     # 查找EmptyImage节点（通常用于设置输出尺寸）
     print("\n" + "=" * 80)
     print("🎯 关键节点详细分析")
     print("=" * 80)
     
-    for node in nodes_info:
-        if node['type'] in ['EmptyImage', 'EmptyLatentImage']:
-            print(f"\n📐 发现尺寸控制节点 (Node {node['id']}):")
-            print(f"   类型: {node['type']}")
-            print(f"   标题: {node['title']}")
-            print(f"   参数:")
-            for key, value in node['inputs'].items():
-                print(f"     - {key}: {value}")
+    for node_id in sort_node_ids(graph.nodes_of_class('EmptyImage') + graph.nodes_of_class('EmptyLatentImage')):
+        print(f"\n📐 发现尺寸控制节点 (Node {node_id}):")
+        print(f"   类型: {graph.class_type(node_id)}")
+        print(f"   标题: {graph.title(node_id)}")
+        print(f"   参数:")
+        print_inputs(graph, node_id, "     ")
+        load_images = graph.find_upstream(node_id, 'LoadImage')
+        if load_images:
+            print(f"   尺寸来源: LoadImage {', '.join(load_images)}")
     
     # 查找LoadImage节点
-    for node in nodes_info:
-        if node['type'] == 'LoadImage':
-            print(f"\n🖼️  发现图片输入节点 (Node {node['id']}):")
-            print(f"   类型: {node['type']}")
-            print(f"   标题: {node['title']}")
-            print(f"   参数:")
-            for key, value in node['inputs'].items():
-                print(f"     - {key}: {value}")
+    for node_id in graph.nodes_of_class('LoadImage'):
+        print(f"\n🖼️  发现图片输入节点 (Node {node_id}):")
+        print(f"   类型: {graph.class_type(node_id)}")
+        print(f"   标题: {graph.title(node_id)}")
+        print(f"   参数:")
+        print_inputs(graph, node_id, "     ")
 
 if __name__ == "__main__":
     main()
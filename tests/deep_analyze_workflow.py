@@ -3,6 +3,11 @@
 """
 import json
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workflow_graph import get_workflow_graph, parse_workflow
 
 def main():
     # 读取工作流JSON
@@ -10,14 +15,10 @@ def main():
     with open(workflow_path, 'r', encoding='utf-8') as f:
         workflow_data = json.load(f)
     
-    # 解析工作流
-    if "workflow" in workflow_data:
-        workflow = workflow_data["workflow"]
-    elif "prompt" in workflow_data:
-        workflow = json.loads(workflow_data["prompt"])
-    else:
-        workflow = workflow_data
-    
+    # 解析工作流并建立图索引
+    workflow = parse_workflow(workflow_data)
+    graph = get_workflow_graph(workflow)
+
     print("=" * 80)
     print("深度分析：改变动作工作流节点连接关系")
     print("=" * 80)
@@ -56,36 +57,25 @@ def main():
     print("🔍 尺寸控制链路追踪")
     print("=" * 80)
     
-    # Node 38 EmptyLatentImage
+    # Node 38 EmptyLatentImage：沿反向邻接表逐层追踪
     print("\n📐 Node 38 (EmptyLatentImage) 的输入:")
-    node_38 = workflow.get("38", {})
-    for input_name, input_value in node_38.get("inputs", {}).items():
-        if isinstance(input_value, list) and len(input_value) == 2:
-            ref_node_id, slot = input_value
-            print(f"  {input_name}: ← Node {ref_node_id}")
-            
-            # 追踪这个节点的输入
-            ref_node = workflow.get(str(ref_node_id), {})
-            print(f"    Node {ref_node_id} ({ref_node.get('class_type')}) 的输入:")
-            for ref_input_name, ref_input_value in ref_node.get("inputs", {}).items():
-                if isinstance(ref_input_value, list) and len(ref_input_value) == 2:
-                    ref_ref_id, ref_slot = ref_input_value
-                    print(f"      {ref_input_name}: ← Node {ref_ref_id}")
-                    
-                    # 继续追踪
-                    ref_ref_node = workflow.get(str(ref_ref_id), {})
-                    if ref_ref_node:
-                        print(f"        Node {ref_ref_id} ({ref_ref_node.get('class_type')}) 的输入:")
-                        for rr_name, rr_value in ref_ref_node.get("inputs", {}).items():
-                            if isinstance(rr_value, list) and len(rr_value) == 2:
-                                print(f"          {rr_name}: ← Node {rr_value[0]}")
-                            else:
-                                print(f"          {rr_name}: {rr_value}")
-                else:
-                    print(f"      {ref_input_name}: {ref_input_value}")
-        else:
-            print(f"  {input_name}: {input_value}")
-    
+
+    def trace(node_id, indent):
+        links = graph.inputs_of(node_id)
+        for input_name, input_value in graph.inputs(node_id).items():
+            if input_name not in links:
+                print(f"{indent}{input_name}: {input_value}")
+                continue
+            ref_node_id, slot = links[input_name]
+            print(f"{indent}{input_name}: ← Node {ref_node_id} [{slot}]")
+            if ref_node_id in graph and len(indent) < 10:
+                print(f"{indent}  Node {ref_node_id} ({graph.class_type(ref_node_id)}) 的输入:")
+                trace(ref_node_id, indent + "    ")
+
+    trace("38", "  ")
+    print(f"\n  为 Node 38 提供输入的 LoadImage: {graph.find_upstream('38', 'LoadImage')}")
+    print(f"  Node 25 的下游节点: {graph.descendants('25')}")
+
     # 分析Node 39 Get Image Size
     print("\n" + "=" * 80)
     print("🖼️  Node 39 (Get Image Size) 分析")
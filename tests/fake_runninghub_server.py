@@ -0,0 +1,276 @@
+"""
+本地 RunningHub API 模拟服务
+用于离线测试客户端，实现了创建任务、查询状态、获取输出、上传文件、账户信息等接口
+
+使用方法:
+    from fake_runninghub_server import FakeRunningHubServer
+
+    with FakeRunningHubServer(polls_until_done=2) as server:
+        client = RunningHubClient("test-key")
+        client.BASE_URL = server.base_url
+        client.run_workflow("123", interval=0)
+"""
+
+import gzip
+import itertools
+import json
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Any, List, Optional
+
+
+class FakeRunningHubServer:
+    """模拟 RunningHub API 的本地 HTTP 服务"""
+
+    def __init__(
+        self,
+        polls_until_done: int = 1,
+        final_status: str = "SUCCESS",
+        max_concurrent: int = 0,
+        webhook_sender: Optional[Callable[[str, Dict], None]] = None
+    ):
+        """
+        Args:
+            polls_until_done: 任务在第几次状态查询时结束
+            final_status: 任务结束时的状态（SUCCESS / FAILED）
+            max_concurrent: 未结束任务数上限，超出时创建任务返回421，0表示不限制
+            webhook_sender: 任务结束时发送回调的函数 (webhookUrl, payload)，默认以 HTTP POST 发送
+        """
+        self.polls_until_done = polls_until_done
+        self.final_status = final_status
+        self.max_concurrent = max_concurrent
+        self.peak_concurrent = 0
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.request_counts: Dict[str, int] = {}
+        self.uploads = []
+        self.upload_bodies = []
+        self.files: Dict[str, bytes] = {}     # GET 路径 -> 文件内容，未设置时返回占位内容
+        self.support_range = True             # 是否支持 Range 续传
+        self.gzip_files = False               # 是否忽略 Accept-Encoding 以 gzip 压缩发送文件（不支持 Range）
+        self.drop_after = None                # 每个文件首次下载时只发送这么多字节后断开
+        self.range_requests = []
+        self._dropped = set()
+        self.webhook_sender = webhook_sender or self._post_webhook
+        self.webhooks_sent = []
+        self.outputs_override: Dict[str, List] = {}  # 指定任务的输出列表（如空列表）
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def count(self, endpoint: str) -> int:
+        """某个接口被调用的次数"""
+        with self.lock:
+            return self.request_counts.get(endpoint, 0)
+
+    # --- 接口实现 ---
+
+    def _create(self, body: Dict) -> Dict:
+        with self.lock:
+            running = sum(1 for t in self.tasks.values() if t["polls"] < self.polls_until_done)
+            if self.max_concurrent and running >= self.max_concurrent:
+                return {"code": 421, "msg": "TASK_QUEUE_MAXED", "data": None}
+            self.peak_concurrent = max(self.peak_concurrent, running + 1)
+            task_id = str(next(self._ids))
+            self.tasks[task_id] = {
+                "workflowId": body.get("workflowId"),
+                "nodeInfoList": body.get("nodeInfoList"),
+                "webhookUrl": body.get("webhookUrl"),
+                "polls": 0,
+            }
+        return {"code": 0, "msg": "success", "data": {"taskId": task_id, "taskStatus": "QUEUED"}}
+
+    def _status(self, body: Dict) -> Dict:
+        task_id = body.get("taskId")
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return {"code": 807, "msg": "APIKEY_TASK_NOT_FOUND", "data": None}
+            task["polls"] += 1
+            status = self._current_status(task)
+            finished_now = task["polls"] == self.polls_until_done
+        if finished_now:
+            threading.Thread(target=self._send_webhook, args=(task_id,), daemon=True).start()
+        return {"code": 0, "msg": "success", "data": status}
+
+    def finish(self, task_id: str):
+        """立即结束任务（不再需要状态查询）并发送回调"""
+        with self.lock:
+            task = self.tasks[task_id]
+            already_done = task["polls"] >= self.polls_until_done
+            task["polls"] = max(task["polls"], self.polls_until_done)
+        if not already_done:
+            self._send_webhook(task_id)
+
+    def webhook_payload(self, task_id: str) -> Dict:
+        """RunningHub 任务结束回调的请求体，eventData 是 JSON 字符串"""
+        if self.final_status == "SUCCESS":
+            event_data = self._outputs({"taskId": task_id})
+        else:
+            event_data = {"code": 805, "msg": "APIKEY_TASK_STATUS_ERROR", "data": {"failedReason": "fake failure"}}
+        return {"event": "TASK_END", "taskId": task_id, "eventData": json.dumps(event_data)}
+
+    def _send_webhook(self, task_id: str):
+        with self.lock:
+            url = self.tasks[task_id].get("webhookUrl")
+        if not url:
+            return
+        payload = self.webhook_payload(task_id)
+        self.webhook_sender(url, payload)
+        with self.lock:
+            self.webhooks_sent.append((url, payload))
+
+    @staticmethod
+    def _post_webhook(url: str, payload: Dict):
+        req = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+        try:
+            urllib.request.urlopen(req, timeout=10).close()
+        except OSError:
+            pass
+
+    def _current_status(self, task: Dict) -> str:
+        if task["polls"] >= self.polls_until_done:
+            return self.final_status
+        return "QUEUED" if task["polls"] <= 1 else "RUNNING"
+
+    def _outputs(self, body: Dict) -> Dict:
+        task_id = body.get("taskId")
+        with self.lock:
+            if task_id not in self.tasks:
+                return {"code": 807, "msg": "APIKEY_TASK_NOT_FOUND", "data": None}
+            override = self.outputs_override.get(task_id)
+        if override is not None:
+            return {"code": 0, "msg": "success", "data": override}
+        return {"code": 0, "msg": "success", "data": [
+            {"fileUrl": f"{self.base_url}/files/{task_id}.png", "fileType": "png"}
+        ]}
+
+    def _upload(self, raw: bytes) -> Dict:
+        with self.lock:
+            self.uploads.append(len(raw))
+            self.upload_bodies.append(raw)
+            name = f"api/upload_{len(self.uploads)}.bin"
+        return {"code": 0, "msg": "success", "data": {"fileName": name, "fileType": "input"}}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send_json(self, result: Dict):
+                body = json.dumps(result).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_body(self) -> bytes:
+                if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                    body = bytearray()
+                    while True:
+                        size = int(self.rfile.readline().split(b";")[0], 16)
+                        if size == 0:
+                            self.rfile.readline()
+                            return bytes(body)
+                        body += self.rfile.read(size)
+                        self.rfile.readline()
+                length = int(self.headers.get("Content-Length", 0))
+                return self.rfile.read(length) if length else b""
+
+            def do_POST(self):
+                raw = self._read_body()
+                with server.lock:
+                    server.request_counts[self.path] = server.request_counts.get(self.path, 0) + 1
+
+                if self.path.endswith("/upload"):
+                    self._send_json(server._upload(raw))
+                    return
+
+                body = json.loads(raw or b"{}")
+                routes = {
+                    "/task/openapi/create": server._create,
+                    "/task/openapi/status": server._status,
+                    "/task/openapi/outputs": server._outputs,
+                    "/task/openapi/cancel": lambda b: {"code": 0, "msg": "success", "data": None},
+                    "/uc/openapi/accountStatus": lambda b: {
+                        "code": 0, "msg": "success", "data": {"currentTaskCounts": "0", "remainCoins": "100"}
+                    },
+                    "/api/openapi/getJsonApiFormat": lambda b: {
+                        "code": 0, "msg": "success", "data": {"prompt": json.dumps({
+                            "1": {"class_type": "LoadImage", "inputs": {"image": "a.png"}}
+                        })}
+                    },
+                }
+                handler = routes.get(self.path)
+                if handler is None:
+                    self.send_error(404)
+                    return
+                self._send_json(handler(body))
+
+            def do_GET(self):
+                with server.lock:
+                    server.request_counts[self.path] = server.request_counts.get(self.path, 0) + 1
+                body = server.files.get(self.path, b"fake-file-content:" + self.path.encode("utf-8"))
+
+                start = 0
+                range_header = self.headers.get("Range")
+                if server.gzip_files:
+                    body = gzip.compress(body)
+                    self.send_response(200)
+                    self.send_header("Content-Encoding", "gzip")
+                elif range_header and server.support_range:
+                    start = int(range_header.split("=")[1].split("-")[0])
+                    with server.lock:
+                        server.range_requests.append((self.path, start))
+                    if start >= len(body):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(body)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(body) - start))
+                self.end_headers()
+
+                with server.lock:
+                    drop = server.drop_after is not None and self.path not in server._dropped
+                    if drop:
+                        server._dropped.add(self.path)
+                if drop:
+                    self.wfile.write(body[start:start + server.drop_after])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(body[start:])
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,220 @@
+"""
+测试并发准入调度器
+
+运行方式:
+    python tests/test_admission.py
+
+功能:
+1. 测试多进程共享并发额度
+2. 测试先来先到与优先级顺序
+3. 测试远程计数周期性校准
+4. 测试崩溃进程遗留槽位的回收
+5. 测试网页服务默认不在本地限流，配置上限后任务被监视器放弃时也会释放槽位
+"""
+
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admission import AdmissionScheduler
+
+
+def _worker(state_dir, counter_path, lock_path, results):
+    """子进程：获取槽位后记录当前并发数"""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from admission import AdmissionScheduler, _FileLock
+
+    scheduler = AdmissionScheduler("key", state_dir=state_dir, poll_interval=0.01)
+    counter_lock = _FileLock(lock_path)
+    with scheduler.acquire(limit=2, timeout=30):
+        with counter_lock:
+            with open(counter_path) as f:
+                current = int(f.read() or 0) + 1
+            with open(counter_path, "w") as f:
+                f.write(str(current))
+        results.put(current)
+        time.sleep(0.1)
+        with counter_lock:
+            with open(counter_path) as f:
+                current = int(f.read()) - 1
+            with open(counter_path, "w") as f:
+                f.write(str(current))
+
+
+class TestAdmission(unittest.TestCase):
+    """测试准入调度"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _scheduler(self, **kwargs):
+        kwargs.setdefault("poll_interval", 0.01)
+        return AdmissionScheduler("key", state_dir=self.dir, **kwargs)
+
+    def test_cross_process_limit(self):
+        """测试多个进程同时运行时不超过并发上限"""
+        counter_path = os.path.join(self.dir, "counter")
+        with open(counter_path, "w") as f:
+            f.write("0")
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        procs = [
+            ctx.Process(target=_worker, args=(self.dir, counter_path, os.path.join(self.dir, "counter.lock"), results))
+            for _ in range(6)
+        ]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(60)
+            self.assertEqual(p.exitcode, 0)
+        peaks = [results.get(timeout=5) for _ in procs]
+        self.assertLessEqual(max(peaks), 2)
+        self.assertEqual(self._scheduler().stats()["held"], 0)
+
+    def test_fifo_and_priority(self):
+        """测试先来先到，高优先级可排到前面"""
+        scheduler = self._scheduler()
+        first = scheduler.acquire(limit=1)
+        order = []
+
+        def waiter(name, priority):
+            with scheduler.acquire(limit=1, priority=priority, timeout=10):
+                order.append(name)
+                time.sleep(0.02)
+
+        threads = []
+        for name, priority in [("a", 0), ("b", 0), ("urgent", 5)]:
+            t = threading.Thread(target=waiter, args=(name, priority))
+            t.start()
+            threads.append(t)
+            time.sleep(0.05)  # 保证入队顺序
+
+        first.release()
+        for t in threads:
+            t.join(10)
+        self.assertEqual(order, ["urgent", "a", "b"])
+
+    def test_timeout(self):
+        """测试等待超时后退出队列"""
+        scheduler = self._scheduler()
+        with scheduler.acquire(limit=1):
+            with self.assertRaises(TimeoutError):
+                scheduler.acquire(limit=1, timeout=0.1)
+            self.assertEqual(scheduler.stats()["waiting"], 0)
+
+    def test_remote_reconcile(self):
+        """测试远程计数只做周期性校准，且会计入外部任务"""
+        calls = []
+        remote = {"count": 1}
+
+        def fetch():
+            calls.append(time.time())
+            return remote["count"]
+
+        scheduler = self._scheduler(reconcile_interval=0.3)
+        with self.assertRaises(TimeoutError):
+            scheduler.acquire(limit=1, timeout=0.5, fetch_remote_count=fetch)
+        self.assertLessEqual(len(calls), 3)
+
+        remote["count"] = 0
+        slot = scheduler.acquire(limit=1, timeout=2, fetch_remote_count=fetch)
+        self.assertEqual(scheduler.stats()["held"], 1)
+        slot.release()
+
+    def test_reclaim_dead_holder(self):
+        """测试回收已退出进程持有的槽位"""
+        scheduler = self._scheduler()
+        with open(scheduler.state_path, "w") as f:
+            json.dump({"slots": {"dead": {"pid": 2 ** 22 + 1, "acquired_at": 0, "expires_at": time.time() + 100}},
+                       "waiters": [], "remote_count": 1}, f)
+        slot = scheduler.acquire(limit=1, timeout=1)
+        slot.release()
+
+    def test_fetch_per_call(self):
+        """测试同一账户的调度器复用，但远程计数函数取自每次调用"""
+        from admission import get_admission_scheduler
+        key = f"shared-{time.time()}"
+        self.assertIs(get_admission_scheduler(key, state_dir=self.dir), get_admission_scheduler(key))
+
+        scheduler = get_admission_scheduler(key)
+        scheduler.reconcile_interval = 0.05
+        used = []
+        for name in ("first", "second"):
+            time.sleep(0.1)  # 超过校准间隔，本次调用会刷新远程计数
+            slot = scheduler.acquire(limit=5, timeout=2, fetch_remote_count=lambda name=name: used.append(name) or 0)
+            slot.release()
+        self.assertEqual(used, ["first", "second"])
+
+
+class TestAppAdmission(unittest.TestCase):
+    """测试网页服务的创建任务准入"""
+
+    def setUp(self):
+        os.environ.setdefault("RH_ADMISSION_DIR", tempfile.mkdtemp())
+        os.environ.setdefault("RH_TASK_DB", os.path.join(tempfile.mkdtemp(), "tasks.db"))
+        os.environ.setdefault("RH_UPLOAD_CACHE", os.path.join(tempfile.mkdtemp(), "uploads.db"))
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import app
+        from fake_runninghub_server import FakeRunningHubServer
+        from runninghub_client import RunningHubClient
+        from task_watcher import TaskWatcher, WatcherConfig
+
+        self.app = app
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = FakeRunningHubServer(polls_until_done=1000).start()
+        client = RunningHubClient("test-key")
+        client.BASE_URL = self.server.base_url
+        self._saved = {name: getattr(app, name) for name in (
+            "BASE_URL", "task_watcher", "admission", "fetch_remote_task_count", "CONCURRENCY_LIMIT"
+        )}
+        app.BASE_URL = self.server.base_url
+        app.task_watcher = TaskWatcher(client.query_task_status, WatcherConfig(min_interval=0.02, max_interval=0.02))
+        app.admission = AdmissionScheduler("app-test", state_dir=self.tmp.name, poll_interval=0.01)
+        app.fetch_remote_task_count = lambda: 0
+
+    def tearDown(self):
+        self.app.task_watcher.stop()
+        for name, value in self._saved.items():
+            setattr(self.app, name, value)
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def submit(self):
+        return self.app.submit_task({"apiKey": "test-key", "workflowId": "wf", "nodeInfoList": []}, "wf")
+
+    def test_no_local_limit_by_default(self):
+        """测试默认不申请槽位，多个任务可同时创建"""
+        self.app.CONCURRENCY_LIMIT = None
+        self.assertEqual([self.submit()["code"] for _ in range(3)], [0, 0, 0])
+        self.assertEqual(self.app.admission.stats()["held"], 0)
+
+    def test_released_when_given_up(self):
+        """测试任务在 RunningHub 上消失、监视器放弃后槽位被释放"""
+        self.app.CONCURRENCY_LIMIT = 1
+        self.app.task_watcher.config.give_up_errors = 2
+        task_id = self.submit()["data"]["taskId"]
+        self.assertEqual(self.app.admission.stats()["held"], 1)
+
+        with self.server.lock:
+            del self.server.tasks[task_id]
+        self.assertEqual(self.app.task_watcher.wait(task_id, 5)["status"], "ERROR")
+        deadline = time.time() + 2
+        while self.app.admission.stats()["held"] and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.app.admission.stats()["held"], 0)
+        self.assertEqual(self.submit()["code"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
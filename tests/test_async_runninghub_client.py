@@ -0,0 +1,153 @@
+"""
+测试 RunningHub 异步客户端
+
+运行方式:
+    python tests/test_async_runninghub_client.py
+
+功能:
+1. 测试异步客户端与同步客户端的请求/响应一致
+2. 测试单个事件循环并发运行大量工作流
+3. 测试网络异常时返回统一的错误结构
+4. 测试上传时文件读写不阻塞事件循环
+"""
+
+import asyncio
+import builtins
+import io
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("RH_UPLOAD_CACHE", os.path.join(tempfile.mkdtemp(), "uploads.db"))
+
+from async_runninghub_client import AsyncRunningHubClient
+from runninghub_client import RunningHubClient
+from fake_runninghub_server import FakeRunningHubServer
+
+
+class TestAsyncClient(unittest.TestCase):
+    """测试异步客户端"""
+
+    def setUp(self):
+        self.server = FakeRunningHubServer(polls_until_done=2).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _client(self):
+        client = AsyncRunningHubClient("test-key")
+        client.BASE_URL = self.server.base_url
+        return client
+
+    def test_matches_sync_client(self):
+        """测试异步与同步客户端结果一致"""
+        sync_client = RunningHubClient("test-key")
+        sync_client.BASE_URL = self.server.base_url
+
+        async def run():
+            async with self._client() as client:
+                return await client.get_account_status(), await client.create_task("1", webhook_url="http://x")
+
+        async_account, async_created = asyncio.run(run())
+        self.assertEqual(async_account, sync_client.get_account_status())
+        self.assertEqual(async_created["code"], 0)
+        self.assertEqual(self.server.tasks[async_created["data"]["taskId"]]["webhookUrl"], "http://x")
+
+    def test_concurrent_run_workflow(self):
+        """测试单个事件循环并发运行多个工作流"""
+        async def run():
+            async with self._client() as client:
+                return await asyncio.gather(*[
+                    client.run_workflow("1", interval=0.01)
+                    for _ in range(50)
+                ])
+
+        results = asyncio.run(run())
+        self.assertEqual(len(results), 50)
+        self.assertTrue(all(r and r["code"] == 0 for r in results))
+        self.assertEqual(self.server.count("/task/openapi/create"), 50)
+
+    def test_upload(self):
+        """测试文件上传"""
+        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as f:
+            f.write(b"\x89PNG" + b"0" * 1000)
+            path = f.name
+        try:
+            async def run():
+                async with self._client() as client:
+                    return await client.upload_image(path), await client.upload_image(path + ".missing")
+
+            ok, missing = asyncio.run(run())
+            self.assertEqual(ok["code"], 0)
+            self.assertEqual(missing["code"], -1)
+        finally:
+            os.remove(path)
+
+    def test_upload_off_loop(self):
+        """测试上传时文件的打开和读取都不在事件循环线程中进行"""
+        with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as f:
+            f.write(os.urandom(300 * 1024))
+            path = f.name
+        loop_thread = []
+        io_threads = []
+        real_open = builtins.open
+
+        class TrackingReader(io.BufferedReader):
+            def read(self, *args):
+                io_threads.append(threading.get_ident())
+                return super().read(*args)
+
+        def tracking_open(file, mode="r", *args, **kwargs):
+            if file != path:
+                return real_open(file, mode, *args, **kwargs)
+            io_threads.append(threading.get_ident())
+            return TrackingReader(io.FileIO(file, "rb"))
+
+        try:
+            async def run():
+                loop_thread.append(threading.get_ident())
+                async with self._client() as client:
+                    return await client.upload_video(path)
+
+            with mock.patch("builtins.open", tracking_open):
+                result = asyncio.run(run())
+            self.assertEqual(result["code"], 0)
+            self.assertTrue(io_threads)
+            self.assertNotIn(loop_thread[0], io_threads)
+        finally:
+            os.remove(path)
+
+    def test_failed_task(self):
+        """测试任务失败时返回None"""
+        self.server.final_status = "FAILED"
+
+        async def run():
+            async with self._client() as client:
+                return await client.run_workflow("1", interval=0.01)
+
+        self.assertIsNone(asyncio.run(run()))
+
+
+class TestAsyncClientErrors(unittest.TestCase):
+    """测试异常处理"""
+
+    def test_connection_error(self):
+        """测试连接失败返回统一错误结构"""
+        async def run():
+            async with AsyncRunningHubClient("test-key", connect_timeout=0.5) as client:
+                client.BASE_URL = "http://127.0.0.1:1"
+                return await client.query_task_status("1")
+
+        result = asyncio.run(run())
+        self.assertEqual(result["code"], -1)
+        self.assertIsNone(result["data"])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,160 @@
+"""
+测试输出文件下载管理
+
+运行方式:
+    python tests/test_download_manager.py
+
+功能:
+1. 测试流式下载与并行下载
+2. 测试断线后通过 Range 续传，服务端压缩时从头下载，416 时按 Content-Range 校验已下载部分
+3. 测试 /api/get_outputs 同步与后台模式，按任务的锁不会累积
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("RH_ADMISSION_DIR", tempfile.mkdtemp())
+os.environ.setdefault("RH_TASK_DB", os.path.join(tempfile.mkdtemp(), "tasks.db"))
+os.environ.setdefault("RH_UPLOAD_CACHE", os.path.join(tempfile.mkdtemp(), "uploads.db"))
+
+from download_manager import DownloadManager
+from http_pool import ConnectionPool
+from fake_runninghub_server import FakeRunningHubServer
+
+
+class TestDownloadManager(unittest.TestCase):
+    """测试下载管理器"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = FakeRunningHubServer().start()
+        self.content = os.urandom(512 * 1024)
+        self.server.files["/files/a.mp4"] = self.content
+        self.manager = DownloadManager(self.tmp.name, pool=ConnectionPool(), chunk_size=4096, retry_delay=0.01)
+
+    def tearDown(self):
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def _read(self, name):
+        with open(os.path.join(self.tmp.name, name), "rb") as f:
+            return f.read()
+
+    def test_download(self):
+        """测试下载内容完整且不留下临时文件"""
+        path = self.manager.submit(f"{self.server.base_url}/files/a.mp4", "a.mp4").result(10)
+        self.assertEqual(self._read("a.mp4"), self.content)
+        self.assertFalse(os.path.exists(path + ".part"))
+        self.assertEqual(self.manager.status("a.mp4"), "done")
+
+    def test_resume_with_range(self):
+        """测试断线后从已下载位置续传"""
+        self.server.drop_after = 100 * 1024
+        self.manager.submit(f"{self.server.base_url}/files/a.mp4", "a.mp4").result(10)
+        self.assertEqual(self._read("a.mp4"), self.content)
+        self.assertEqual(self.server.range_requests, [("/files/a.mp4", 100 * 1024)])
+
+    def test_restart_without_range(self):
+        """测试服务器不支持 Range 时从头下载"""
+        self.server.drop_after = 100 * 1024
+        self.server.support_range = False
+        self.manager.submit(f"{self.server.base_url}/files/a.mp4", "a.mp4").result(10)
+        self.assertEqual(self._read("a.mp4"), self.content)
+
+    def test_already_complete(self):
+        """测试 .part 已是完整文件时（416 且大小一致）直接完成"""
+        with open(os.path.join(self.tmp.name, "a.mp4.part"), "wb") as f:
+            f.write(self.content)
+        self.manager.submit(f"{self.server.base_url}/files/a.mp4", "a.mp4").result(10)
+        self.assertEqual(self._read("a.mp4"), self.content)
+        self.assertEqual(self.server.count("/files/a.mp4"), 1)
+
+    def test_stale_part(self):
+        """测试 .part 比服务器文件大时（416 且大小不一致）丢弃后重新下载"""
+        with open(os.path.join(self.tmp.name, "a.mp4.part"), "wb") as f:
+            f.write(os.urandom(len(self.content) + 100))
+        self.manager.submit(f"{self.server.base_url}/files/a.mp4", "a.mp4").result(10)
+        self.assertEqual(self._read("a.mp4"), self.content)
+        self.assertEqual(self.server.count("/files/a.mp4"), 2)
+
+    def test_content_encoding(self):
+        """测试服务端 gzip 压缩时不按 Content-Length 校验，中断后从头下载而不是续传"""
+        self.server.gzip_files = True
+        self.server.drop_after = 100 * 1024
+        self.manager.submit(f"{self.server.base_url}/files/a.mp4", "a.mp4").result(10)
+        self.assertEqual(self._read("a.mp4"), self.content)
+        self.assertEqual(self.server.count("/files/a.mp4"), 2)
+
+    def test_parallel_and_dedupe(self):
+        """测试多个文件并行下载，同一文件只下载一次"""
+        for i in range(6):
+            self.server.files[f"/files/{i}.png"] = os.urandom(1000)
+        futures = [self.manager.submit(f"{self.server.base_url}/files/{i}.png", f"{i}.png") for i in range(6)]
+        again = self.manager.submit(f"{self.server.base_url}/files/0.png", "0.png")
+        for f in futures + [again]:
+            f.result(10)
+        self.assertEqual(self.server.count("/files/0.png"), 1)
+
+        # 文件已存在时不再下载
+        DownloadManager(self.tmp.name).submit(f"{self.server.base_url}/files/0.png", "0.png").result(10)
+        self.assertEqual(self.server.count("/files/0.png"), 1)
+
+    def test_failure(self):
+        """测试多次失败后报错"""
+        manager = DownloadManager(self.tmp.name, max_attempts=2, retry_delay=0.01)
+        future = manager.submit("http://127.0.0.1:1/x.png", "x.png")
+        with self.assertRaises(IOError):
+            future.result(10)
+        self.assertEqual(manager.status("x.png"), "failed")
+
+
+class TestGetOutputsEndpoint(unittest.TestCase):
+    """测试 /api/get_outputs"""
+
+    def setUp(self):
+        import app
+        self.app = app
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = FakeRunningHubServer().start()
+        self._base_url, self._downloader = app.BASE_URL, app.downloader
+        app.BASE_URL = self.server.base_url
+        app.downloader = DownloadManager(self.tmp.name)
+        self.client = app.app.test_client()
+        self.task_id = self.server._create({})["data"]["taskId"]
+
+    def tearDown(self):
+        self.app.BASE_URL, self.app.downloader = self._base_url, self._downloader
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def test_sync(self):
+        """测试默认等待下载完成"""
+        item = self.client.post("/api/get_outputs", json={"taskId": self.task_id}).json["data"][0]
+        self.assertEqual(item["downloadStatus"], "done")
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, f"{self.task_id}.png")))
+
+    def test_background(self):
+        """测试后台模式立即返回 localUrl"""
+        item = self.client.post("/api/get_outputs", json={"taskId": self.task_id, "background": True}).json["data"][0]
+        self.assertEqual(item["localUrl"], f"/output/{self.task_id}.png")
+        self.app.downloader.submit(item["fileUrl"], f"{self.task_id}.png").result(10)
+        self.assertEqual(self.app.downloader.status(f"{self.task_id}.png"), "done")
+
+    def test_no_lock_leak(self):
+        """测试命中缓存、请求失败或异常后都不残留按任务的锁"""
+        self.app.fetch_outputs(self.task_id)
+        self.app.fetch_outputs(self.task_id)
+        self.app.fetch_outputs("missing-task")
+        self.app.BASE_URL = "http://127.0.0.1:1"
+        with self.assertRaises(Exception):
+            self.app.fetch_outputs("unreachable-task")
+        self.assertEqual(self.app.task_outputs_fetching, {})
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
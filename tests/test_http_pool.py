@@ -0,0 +1,125 @@
+"""
+测试HTTP连接池
+
+运行方式:
+    python tests/test_http_pool.py
+
+功能:
+1. 测试超时参数解析（连接/读取分开设置）
+2. 测试长连接复用与统计信息
+3. 测试客户端默认使用共享连接池
+"""
+
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_pool import ConnectionPool, PoolConfig, get_shared_pool
+from runninghub_client import RunningHubClient
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    """本地长连接测试服务"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        body = b'{"code": 0, "msg": "success", "data": "RUNNING"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestTimeout(unittest.TestCase):
+    """测试超时参数"""
+
+    def setUp(self):
+        self.pool = ConnectionPool(PoolConfig(connect_timeout=3, read_timeout=20))
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_default_timeout(self):
+        """测试默认超时"""
+        self.assertEqual(self.pool._resolve_timeout(None), (3, 20))
+
+    def test_read_timeout_override(self):
+        """测试单个数字只覆盖读取超时"""
+        self.assertEqual(self.pool._resolve_timeout(120), (3, 120))
+
+    def test_tuple_timeout(self):
+        """测试元组原样透传"""
+        self.assertEqual(self.pool._resolve_timeout((1, 2)), (1, 2))
+
+
+class TestConnectionReuse(unittest.TestCase):
+    """测试连接复用"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/task/openapi/status"
+        self.pool = ConnectionPool()
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_sequential_requests_reuse_connection(self):
+        """测试顺序请求复用同一连接"""
+        for _ in range(10):
+            resp = self.pool.post(self.url, json={"taskId": "1"})
+            self.assertEqual(resp.json()["code"], 0)
+
+        stats = self.pool.stats()
+        self.assertEqual(stats["requests"], 10)
+        self.assertEqual(stats["connections_created"], 1)
+        self.assertEqual(stats["idle_connections"], 1)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertAlmostEqual(stats["reuse_ratio"], 0.9)
+
+    def test_client_uses_pool(self):
+        """测试客户端请求走连接池"""
+        client = RunningHubClient("test-key", pool=self.pool)
+        client.BASE_URL = self.url.rsplit("/task/", 1)[0]
+        for _ in range(3):
+            result = client.query_task_status("1")
+            self.assertEqual(result["data"], "RUNNING")
+        self.assertEqual(self.pool.stats()["connections_created"], 1)
+
+    def test_failed_request_counted(self):
+        """测试失败请求计数"""
+        bad_pool = ConnectionPool(PoolConfig(connect_timeout=0.5))
+        try:
+            with self.assertRaises(Exception):
+                bad_pool.post("http://127.0.0.1:1/", json={})
+            self.assertEqual(bad_pool.stats()["failed_requests"], 1)
+        finally:
+            bad_pool.close()
+
+
+class TestSharedPool(unittest.TestCase):
+    """测试共享连接池"""
+
+    def test_client_default_pool(self):
+        """测试客户端默认使用共享连接池"""
+        a = RunningHubClient("key-a")
+        b = RunningHubClient("key-b")
+        self.assertIs(a.pool, get_shared_pool())
+        self.assertIs(a.pool, b.pool)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
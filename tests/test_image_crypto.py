@@ -0,0 +1,220 @@
+"""
+测试图片加密/解密节点
+
+运行方式:
+    python tests/test_image_crypto.py
+
+功能:
+1. 测试三种模式加密后可精确还原 8 位图片，错误密码无法还原
+2. 测试每张图片的结果只取决于密码和序号，与批大小、线程数无关
+3. 测试置换/密钥缓存的命中、内存上限与淘汰
+4. 测试 torch 实现与 numpy 参考实现逐位一致，并保持输入的 dtype
+5. 测试 torch 实现批内并行与串行结果一致
+6. 测试分块模式和逐帧生成器与整帧处理结果一致
+7. 测试节点接口输入输出的形状与类型
+需要 torch、numpy（ComfyUI 环境），未安装 torch 时跳过
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "comfyui_nodes"))
+
+# 节点模块本身依赖 torch，不在 ComfyUI 环境中时整个文件跳过，不影响其余测试的收集
+try:
+    import torch
+    from image_crypto_nodes import (ENCRYPT_MODES, CryptoCache, ImageDecryptNode, ImageEncryptNode,
+                                    decrypt_batch, decrypt_frames, decrypt_tensor, encrypt_batch, encrypt_frames,
+                                    encrypt_tensor, invert_permutation, make_keystream, make_permutation)
+except ImportError:
+    torch = None
+
+requires_torch = unittest.skipUnless(torch is not None, "需要 torch（ComfyUI 环境）")
+
+
+def make_batch(batch=3, height=37, width=53, channels=3, seed=0):
+    """生成 8 位精度的测试批"""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(batch, height, width, channels)).astype(np.float32) / 255.0
+
+
+@requires_torch
+class TestImageCrypto(unittest.TestCase):
+    """测试加解密算法"""
+
+    def test_roundtrip(self):
+        """测试各模式加密后精确还原"""
+        batch = make_batch()
+        for mode in ENCRYPT_MODES:
+            with self.subTest(mode=mode):
+                encrypted = encrypt_batch(batch, "secret", mode)
+                self.assertEqual(encrypted.dtype, np.float32)
+                self.assertFalse(np.array_equal(encrypted, batch))
+                np.testing.assert_array_equal(decrypt_batch(encrypted, "secret", mode), batch)
+
+    def test_wrong_password(self):
+        """测试错误密码无法还原"""
+        batch = make_batch()
+        encrypted = encrypt_batch(batch, "secret", "COMBINE")
+        self.assertFalse(np.allclose(decrypt_batch(encrypted, "wrong", "COMBINE"), batch))
+
+    def test_independent_of_batch_and_workers(self):
+        """测试单张结果不受批大小和并行线程数影响"""
+        batch = make_batch(batch=4)
+        serial = encrypt_batch(batch, "secret", "COMBINE", workers=1)
+        parallel = encrypt_batch(batch, "secret", "COMBINE", workers=4)
+        np.testing.assert_array_equal(serial, parallel)
+        np.testing.assert_array_equal(encrypt_batch(batch[:2], "secret", "COMBINE"), serial[:2])
+
+    def test_noise_is_deterministic(self):
+        """测试噪声同样由密码决定"""
+        batch = make_batch(batch=2)
+        first = encrypt_batch(batch, "secret", "XOR", noise_strength=0.1)
+        np.testing.assert_array_equal(first, encrypt_batch(batch, "secret", "XOR", noise_strength=0.1))
+        self.assertTrue(((first >= 0) & (first <= 1)).all())
+
+    def test_permutation(self):
+        """测试置换与逆置换"""
+        perm = make_permutation(7, 0, 1000)
+        self.assertEqual(perm.dtype, np.int32)
+        np.testing.assert_array_equal(np.sort(perm), np.arange(1000))
+        np.testing.assert_array_equal(perm[invert_permutation(perm)], np.arange(1000))
+
+
+@requires_torch
+class TestCryptoCache(unittest.TestCase):
+    """测试置换/密钥缓存"""
+
+    def test_hits(self):
+        """测试加密后解密复用同一批置换与密钥"""
+        cache = CryptoCache(max_bytes=64 * 1024 * 1024)
+        batch = make_batch(batch=2)
+        encrypted = encrypt_batch(batch, "secret", "COMBINE", cache=cache)
+        self.assertEqual(cache.stats()["misses"], 4)  # 2 张图 x (密钥 + 置换)
+        decrypted = decrypt_batch(encrypted, "secret", "COMBINE", cache=cache)
+        np.testing.assert_array_equal(decrypted, batch)
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 4)  # 密钥 + 求逆时的置换
+        self.assertEqual(stats["misses"], 6)  # + 2 个逆置换
+
+        np.testing.assert_array_equal(encrypt_batch(batch, "secret", "COMBINE", cache=cache), encrypted)
+        np.testing.assert_array_equal(cache.keystream(42, 0, (10, 3)), make_keystream(42, 0, (10, 3)))
+        self.assertFalse(cache.permutation(42, 0, 10).flags.writeable)
+
+    def test_budget(self):
+        """测试超过内存上限时淘汰最久未使用的条目"""
+        pixels = 1000
+        cache = CryptoCache(max_bytes=2 * pixels * 4)  # 正好两个 int32 置换
+        cache.permutation(1, 0, pixels)
+        cache.permutation(1, 1, pixels)
+        cache.permutation(1, 0, pixels)  # 刷新 0
+        cache.permutation(1, 2, pixels)  # 淘汰 1
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["bytes"], stats["evictions"]), (2, 2 * pixels * 4, 1))
+        cache.permutation(1, 0, pixels)
+        self.assertEqual(cache.stats()["hits"], 2)
+
+        disabled = CryptoCache(max_bytes=0)
+        disabled.keystream(1, 0, (4, 3))
+        self.assertEqual(disabled.stats()["entries"], 0)
+
+
+@requires_torch
+class TestTorchCrypto(unittest.TestCase):
+    """测试 torch 实现"""
+
+    def test_matches_numpy_reference(self):
+        """测试 float32 输入时与 numpy 实现逐位一致"""
+        batch = make_batch()
+        batch[0, 0, 0] = [0.3, 0.7001, 1.2]  # 非 8 位精度和越界值
+        image = torch.from_numpy(batch)
+        for mode in ENCRYPT_MODES:
+            for noise in (0.0, 0.2):
+                with self.subTest(mode=mode, noise=noise):
+                    expected = encrypt_batch(batch, "secret", mode, noise)
+                    encrypted = encrypt_tensor(image, "secret", mode, noise)
+                    np.testing.assert_array_equal(encrypted.numpy(), expected)
+                    np.testing.assert_array_equal(decrypt_tensor(encrypted, "secret", mode).numpy(),
+                                                  decrypt_batch(expected, "secret", mode))
+
+    def test_parallel_frames(self):
+        """测试批内并行处理与串行结果一致，缓存未命中时各帧的置换/密钥并行生成"""
+        batch = make_batch(batch=6)
+        image = torch.from_numpy(batch)
+        serial = encrypt_tensor(image, "secret", "COMBINE", 0.1, cache=CryptoCache(), workers=1)
+        cache = CryptoCache()
+        parallel = encrypt_tensor(image, "secret", "COMBINE", 0.1, cache=cache, workers=4)
+        np.testing.assert_array_equal(parallel.numpy(), serial.numpy())
+        self.assertEqual(cache.stats()["misses"], 12)
+        np.testing.assert_array_equal(decrypt_tensor(parallel, "secret", "COMBINE", workers=4).numpy(),
+                                      decrypt_tensor(parallel, "secret", "COMBINE", workers=1).numpy())
+
+    def test_keeps_dtype(self):
+        """测试半精度输入输出仍为半精度，并可还原"""
+        image = torch.from_numpy(make_batch(batch=2)).to(torch.float16)
+        encrypted = encrypt_tensor(image, "secret", "COMBINE")
+        self.assertEqual(encrypted.dtype, torch.float16)
+        decrypted = decrypt_tensor(encrypted, "secret", "COMBINE")
+        self.assertEqual(decrypted.dtype, torch.float16)
+        self.assertTrue(torch.equal(decrypted, image))
+
+    def test_non_contiguous_input(self):
+        """测试非连续输入"""
+        batch = make_batch(batch=2)
+        image = torch.from_numpy(np.ascontiguousarray(batch.transpose(0, 2, 1, 3))).transpose(1, 2)
+        np.testing.assert_array_equal(encrypt_tensor(image, "secret", "COMBINE").numpy(),
+                                      encrypt_batch(batch, "secret", "COMBINE"))
+
+
+@requires_torch
+class TestTiledCrypto(unittest.TestCase):
+    """测试分块模式"""
+
+    def test_matches_whole_frame(self):
+        """测试不同内存预算（含每块一行）下结果与整帧处理一致"""
+        batch = make_batch(height=41, width=29)
+        image = torch.from_numpy(batch)
+        row_bytes = 29 * (3 * 16 + 8)
+        for mode in ENCRYPT_MODES:
+            expected = encrypt_batch(batch, "secret", mode, 0.1)
+            for budget in (1, row_bytes * 5, 1 << 30):
+                with self.subTest(mode=mode, budget=budget):
+                    encrypted = encrypt_tensor(image, "secret", mode, 0.1, memory_budget=budget)
+                    np.testing.assert_array_equal(encrypted.numpy(), expected)
+                    decrypted = decrypt_tensor(torch.from_numpy(expected), "secret", mode, memory_budget=budget)
+                    np.testing.assert_array_equal(decrypted.numpy(), decrypt_batch(expected, "secret", mode))
+
+    def test_frame_generator(self):
+        """测试逐帧生成器与整批结果一致，start_index 可接续"""
+        batch = make_batch(batch=4)
+        expected = encrypt_batch(batch, "secret", "COMBINE")
+        frames = (torch.from_numpy(frame) for frame in batch[2:])
+        encrypted = list(encrypt_frames(frames, "secret", "COMBINE", memory_budget=4096, start_index=2))
+        self.assertEqual(len(encrypted), 2)
+        for offset, frame in enumerate(encrypted):
+            np.testing.assert_array_equal(frame.numpy(), expected[2 + offset])
+
+        decrypted = decrypt_frames((torch.from_numpy(frame) for frame in expected), "secret", "COMBINE",
+                                   memory_budget=4096)
+        for b, frame in enumerate(decrypted):
+            np.testing.assert_array_equal(frame.numpy(), batch[b])
+
+
+@requires_torch
+class TestCryptoNodes(unittest.TestCase):
+    """测试节点接口"""
+
+    def test_nodes(self):
+        image = torch.from_numpy(make_batch(batch=2, height=16, width=24, channels=4))
+        (encrypted,) = ImageEncryptNode().encrypt_image(image, "pw", "COMBINE", 0.0)
+        self.assertEqual(encrypted.shape, image.shape)
+        self.assertEqual(encrypted.dtype, torch.float32)
+        (decrypted,) = ImageDecryptNode().decrypt_image(encrypted, "pw", "COMBINE")
+        self.assertTrue(torch.equal(decrypted, image))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
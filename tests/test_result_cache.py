@@ -0,0 +1,200 @@
+"""
+测试工作流结果缓存
+
+运行方式:
+    python tests/test_result_cache.py
+
+功能:
+1. 测试缓存键的规范化（参数顺序、nodeId 类型、上传文件按内容哈希）
+2. 测试命中、过期与数量上限淘汰
+3. 测试 run_workflow 相同输入不再创建任务，use_cache=False 时强制重新运行
+4. 测试网页创建任务命中缓存时直接返回已成功的任务和输出
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("RH_ADMISSION_DIR", tempfile.mkdtemp())
+os.environ.setdefault("RH_TASK_DB", os.path.join(tempfile.mkdtemp(), "tasks.db"))
+os.environ.setdefault("RH_UPLOAD_CACHE", os.path.join(tempfile.mkdtemp(), "uploads.db"))
+
+from result_cache import ResultCache, result_key
+from upload_cache import UploadCache
+from runninghub_client import RunningHubClient
+from fake_runninghub_server import FakeRunningHubServer
+
+
+class TestResultKey(unittest.TestCase):
+    """测试缓存键"""
+
+    def test_normalization(self):
+        """测试节点参数顺序和 nodeId 类型不影响缓存键"""
+        a = [{"nodeId": 1, "fieldName": "text", "fieldValue": "cat"},
+             {"nodeId": "2", "fieldName": "seed", "fieldValue": 7}]
+        b = [{"nodeId": "2", "fieldName": "seed", "fieldValue": 7},
+             {"nodeId": "1", "fieldName": "text", "fieldValue": "cat"}]
+        self.assertEqual(result_key("wf", a), result_key("wf", b))
+        self.assertNotEqual(result_key("wf", a), result_key("wf2", a))
+        self.assertNotEqual(result_key("wf", a), result_key("wf", a[:1]))
+
+    def test_resolve_uploaded_files(self):
+        """测试同一内容重新上传得到不同 fileName 时缓存键不变"""
+        digests = {"api/a.png": "d1", "api/b.png": "d1", "api/c.png": "d2"}
+        key = lambda name: result_key("wf", [{"nodeId": "1", "fieldName": "image", "fieldValue": name}],
+                                      resolve=digests.get)
+        self.assertEqual(key("api/a.png"), key("api/b.png"))
+        self.assertNotEqual(key("api/a.png"), key("api/c.png"))
+
+
+class TestResultCache(unittest.TestCase):
+    """测试缓存存储"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, "results.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_get_put(self):
+        """测试命中、持久化与过期"""
+        outputs = [{"fileUrl": "http://x/1.png", "fileType": "png"}]
+        cache = ResultCache(self.db)
+        self.assertIsNone(cache.get("k"))
+        cache.put("k", "wf", "42", outputs)
+        self.assertEqual(cache.get("k"), {"taskId": "42", "outputs": outputs, "createdAt": mock.ANY})
+        cache.put("empty", "wf", "43", [])
+        self.assertIsNone(cache.get("empty"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        cache.close()
+
+        expired = ResultCache(self.db, ttl=0)
+        try:
+            time.sleep(0.01)
+            self.assertIsNone(expired.get("k"))
+            self.assertEqual(expired.stats()["entries"], 0)
+        finally:
+            expired.close()
+
+    def test_evict_least_recently_used(self):
+        """测试超过数量上限时淘汰最久未使用的条目"""
+        cache = ResultCache(":memory:", max_entries=2)
+        outputs = [{"fileUrl": "http://x/1.png", "fileType": "png"}]
+        cache.put("a", "wf", "1", outputs)
+        time.sleep(0.01)
+        cache.put("b", "wf", "2", outputs)
+        time.sleep(0.01)
+        cache.get("a")
+        time.sleep(0.01)
+        cache.put("c", "wf", "3", outputs)
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+
+class TestClientResultCache(unittest.TestCase):
+    """测试客户端结果缓存"""
+
+    def test_run_workflow(self):
+        """测试相同输入只创建一次任务"""
+        with tempfile.TemporaryDirectory() as tmp, FakeRunningHubServer() as server:
+            client = RunningHubClient("test-key", upload_cache=UploadCache(os.path.join(tmp, "u.db")),
+                                      result_cache=ResultCache(os.path.join(tmp, "r.db")))
+            client.BASE_URL = server.base_url
+            node_info = [{"nodeId": "1", "fieldName": "text", "fieldValue": "cat"}]
+
+            first = client.run_workflow("wf", node_info, interval=0.01)
+            second = client.run_workflow("wf", node_info, interval=0.01)
+            self.assertEqual(server.count("/task/openapi/create"), 1)
+            self.assertTrue(second["cached"])
+            self.assertEqual(second["data"], first["data"])
+
+            client.run_workflow("wf", node_info, interval=0.01, use_cache=False)
+            self.assertEqual(server.count("/task/openapi/create"), 2)
+
+    def test_disabled_by_default(self):
+        """测试未设置结果缓存时每次都创建任务"""
+        with FakeRunningHubServer() as server:
+            client = RunningHubClient("test-key")
+            client.BASE_URL = server.base_url
+            client.run_workflow("wf", [], interval=0.01)
+            client.run_workflow("wf", [], interval=0.01)
+            self.assertEqual(server.count("/task/openapi/create"), 2)
+
+
+class TestAppResultCache(unittest.TestCase):
+    """测试网页创建任务的结果缓存"""
+
+    def setUp(self):
+        import app
+        from admission import AdmissionScheduler
+        from download_manager import DownloadManager
+        from task_watcher import TaskWatcher, WatcherConfig
+
+        self.app = app
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = FakeRunningHubServer().start()
+        client = RunningHubClient("test-key")
+        client.BASE_URL = self.server.base_url
+        self._saved = {name: getattr(app, name) for name in (
+            "BASE_URL", "task_watcher", "downloader", "admission", "fetch_remote_task_count",
+            "result_cache", "upload_cache"
+        )}
+        app.BASE_URL = self.server.base_url
+        app.task_watcher = TaskWatcher(client.query_task_status, WatcherConfig(min_interval=0.05))
+        app.downloader = DownloadManager(self.tmp.name)
+        app.admission = AdmissionScheduler("result-cache-test", state_dir=self.tmp.name)
+        app.fetch_remote_task_count = lambda: 0
+        app.result_cache = ResultCache(os.path.join(self.tmp.name, "r.db"))
+        app.upload_cache = UploadCache(os.path.join(self.tmp.name, "u.db"))
+        app.task_outputs.clear()
+        self.flask = app.app.test_client()
+
+    def tearDown(self):
+        self.app.task_watcher.stop()
+        self.app.downloader.close()
+        for name, value in self._saved.items():
+            setattr(self.app, name, value)
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def create(self, **extra):
+        return self.flask.post("/api/create_task", json=dict({"fileName": "api/v.mp4", "type": "video"}, **extra)).json
+
+    def test_cached_task(self):
+        """测试第二次提交相同输入时直接返回已成功的任务"""
+        first = self.create()
+        task_id = first["data"]["taskId"]
+        self.assertEqual(self.app.task_watcher.future(task_id).result(5)["status"], "SUCCESS")
+        outputs = self.flask.post("/api/get_outputs", json={"taskId": task_id}).json
+        self.assertEqual(outputs["code"], 0)
+
+        self.app.task_outputs.clear()
+        second = self.create()
+        self.assertEqual(second["data"], {"taskId": task_id, "taskStatus": "SUCCESS", "cached": True})
+        self.assertEqual(self.server.count("/task/openapi/create"), 1)
+
+        # 状态与输出都来自缓存，不再访问 API
+        outputs_calls = self.server.count("/task/openapi/outputs")
+        status = self.flask.post("/api/query_status", json={"taskId": task_id}).json
+        self.assertEqual(status["data"], "SUCCESS")
+        again = self.flask.post("/api/get_outputs", json={"taskId": task_id}).json
+        self.assertEqual([o["fileUrl"] for o in again["data"]], [o["fileUrl"] for o in outputs["data"]])
+        self.assertEqual(self.server.count("/task/openapi/outputs"), outputs_calls)
+
+        third = self.create(noCache=True)
+        self.assertNotEqual(third["data"]["taskId"], task_id)
+        self.assertEqual(self.server.count("/task/openapi/create"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,102 @@
+"""
+测试批量运行工作流
+
+运行方式:
+    python tests/test_run_workflow_batch.py
+
+功能:
+1. 测试上传 → 创建 → 等待 → 下载 流水线
+2. 测试并发上限(421)时退避重试
+3. 测试结果按完成顺序逐个返回
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("RH_UPLOAD_CACHE", os.path.join(tempfile.mkdtemp(), "uploads.db"))
+
+from runninghub_client import RunningHubClient
+from task_watcher import TaskWatcher, WatcherConfig
+from fake_runninghub_server import FakeRunningHubServer
+
+FAST = WatcherConfig(min_interval=0.01, max_interval=0.05, warmup=0.05)
+
+
+class TestRunWorkflowBatch(unittest.TestCase):
+    """测试 run_workflow_batch"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _client(self, server):
+        client = RunningHubClient("test-key")
+        client.BASE_URL = server.base_url
+        client.watcher = TaskWatcher(client.query_task_status, FAST)
+        self.addCleanup(client.watcher.stop)
+        return client
+
+    def _inputs(self, count):
+        inputs = []
+        for i in range(count):
+            path = os.path.join(self.tmp.name, f"video_{i}.mp4")
+            with open(path, "wb") as f:
+                f.write(str(i).encode() * 100)
+            inputs.append([{"nodeId": "1", "fieldName": "video", "localFile": path}])
+        return inputs
+
+    def test_pipeline(self):
+        """测试完整流水线并下载结果"""
+        with FakeRunningHubServer(polls_until_done=2) as server:
+            client = self._client(server)
+            out_dir = os.path.join(self.tmp.name, "out")
+            names = [f"v{i}" for i in range(6)]
+            results = list(client.run_workflow_batch(
+                "wf", self._inputs(6), max_in_flight=3, output_dir=out_dir, output_names=names
+            ))
+
+            self.assertEqual(sorted(r["index"] for r in results), list(range(6)))
+            self.assertTrue(all(r["status"] == "SUCCESS" for r in results))
+            self.assertEqual(len(server.uploads), 6)
+            for r in results:
+                self.assertEqual(r["files"], [os.path.join(out_dir, f"v{r['index']}_1.png")])
+                self.assertTrue(os.path.exists(r["files"][0]))
+            # localFile 替换为上传后的 fileName
+            node_info = server.tasks["1"]["nodeInfoList"][0]
+            self.assertNotIn("localFile", node_info)
+            self.assertTrue(node_info["fieldValue"].startswith("api/upload_"))
+
+    def test_quota_backoff(self):
+        """测试并发上限时等待后重试"""
+        with FakeRunningHubServer(polls_until_done=3, max_concurrent=2) as server:
+            client = self._client(server)
+            inputs = [[{"nodeId": "1", "fieldName": "text", "fieldValue": str(i)}] for i in range(6)]
+            results = list(client.run_workflow_batch(
+                "wf", inputs, max_in_flight=4, quota_backoff=0.02, max_quota_backoff=0.1
+            ))
+
+            self.assertTrue(all(r["status"] == "SUCCESS" for r in results))
+            self.assertLessEqual(server.peak_concurrent, 2)
+            self.assertGreater(server.count("/task/openapi/create"), 6)
+
+    def test_streams_and_reports_failures(self):
+        """测试失败的输入也会逐个返回"""
+        with FakeRunningHubServer(polls_until_done=1, final_status="FAILED") as server:
+            client = self._client(server)
+            inputs = [[{"nodeId": "1", "fieldName": "video", "localFile": "missing.mp4"}], []]
+            results = {r["index"]: r for r in client.run_workflow_batch("wf", inputs)}
+
+            self.assertEqual(results[0]["status"], "ERROR")
+            self.assertIn("上传失败", results[0]["msg"])
+            self.assertEqual(results[1]["status"], "FAILED")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,151 @@
+"""
+测试 multipart 上传流式转发
+
+运行方式:
+    python tests/test_streaming_upload.py
+
+功能:
+1. 测试增量解析 multipart 请求体（字段在文件前后均可）
+2. 测试按需读取输入流（背压）
+3. 测试 /api/upload 转发到 RunningHub 的内容完整
+"""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("RH_ADMISSION_DIR", tempfile.mkdtemp())
+os.environ.setdefault("RH_TASK_DB", os.path.join(tempfile.mkdtemp(), "tasks.db"))
+os.environ.setdefault("RH_UPLOAD_CACHE", os.path.join(tempfile.mkdtemp(), "uploads.db"))
+
+from streaming_upload import StreamingUpload, build_multipart_body
+from fake_runninghub_server import FakeRunningHubServer
+
+
+def encode(parts, boundary="XyZ"):
+    """构造 multipart 请求体，parts 为 (name, value, filename) 列表"""
+    body = bytearray()
+    for name, value, filename in parts:
+        body += f"--{boundary}\r\n".encode()
+        if filename:
+            body += f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'.encode()
+            body += b"Content-Type: application/octet-stream\r\n\r\n"
+        else:
+            body += f'Content-Disposition: form-data; name="{name}"\r\n\r\n'.encode()
+        body += value + b"\r\n"
+    body += f"--{boundary}--\r\n".encode()
+    return bytes(body)
+
+
+class TrackingStream(io.BytesIO):
+    """记录读取情况的输入流"""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.max_read = 0
+        self.reads = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.reads += 1
+        self.max_read = max(self.max_read, len(data))
+        return data
+
+
+class TestStreamingUpload(unittest.TestCase):
+    """测试增量解析"""
+
+    def setUp(self):
+        self.payload = os.urandom(200 * 1024) + b"\r\n--XyZ-not-boundary" + os.urandom(1000)
+
+    def test_roundtrip(self):
+        """测试文件内容与前后字段完整解析"""
+        body = encode([("type", b"video", None), ("file", self.payload, "a.mp4"), ("note", b"tail", None)])
+        upload = StreamingUpload(TrackingStream(body), "XyZ", chunk_size=777)
+        part = upload.read_until_file()
+
+        self.assertEqual(part.filename, "a.mp4")
+        self.assertEqual(upload.fields, {"type": "video"})
+        self.assertEqual(b"".join(upload.iter_file()), self.payload)
+        self.assertEqual(upload.fields["note"], "tail")
+
+    def test_backpressure(self):
+        """测试只在消费者需要时才读取输入流"""
+        stream = TrackingStream(encode([("file", self.payload, "a.mp4")]))
+        upload = StreamingUpload(stream, "XyZ", chunk_size=4096)
+        upload.read_until_file()
+        chunks = upload.iter_file()
+        next(chunks)
+
+        self.assertLessEqual(stream.max_read, 4096)
+        self.assertLess(stream.tell(), 3 * 4096)
+        self.assertGreater(sum(1 for _ in chunks), 0)
+
+    def test_no_file(self):
+        """测试请求中没有文件"""
+        upload = StreamingUpload(io.BytesIO(encode([("type", b"video", None)])), "XyZ")
+        self.assertIsNone(upload.read_until_file())
+
+    def test_build_body(self):
+        """测试生成的请求体可被再次解析"""
+        content_type, body = build_multipart_body(
+            {"apiKey": "k", "fileType": "input"}, "file", "a.mp4", "video/mp4", iter([self.payload[:10], self.payload[10:]])
+        )
+        boundary = content_type.split("boundary=")[1]
+        upload = StreamingUpload(io.BytesIO(b"".join(body)), boundary)
+        self.assertEqual(upload.read_until_file().filename, "a.mp4")
+        self.assertEqual(upload.fields, {"apiKey": "k", "fileType": "input"})
+        self.assertEqual(b"".join(upload.iter_file()), self.payload)
+
+
+class TestUploadEndpoint(unittest.TestCase):
+    """测试 /api/upload 转发"""
+
+    def setUp(self):
+        import app
+        self.app = app
+        self.server = FakeRunningHubServer().start()
+        self._base_url = app.BASE_URL
+        app.BASE_URL = self.server.base_url
+        self.client = app.app.test_client()
+
+    def tearDown(self):
+        self.app.BASE_URL = self._base_url
+        self.server.stop()
+
+    def _post(self, parts):
+        return self.client.post(
+            "/api/upload", data=encode(parts), content_type="multipart/form-data; boundary=XyZ"
+        )
+
+    def test_forward(self):
+        """测试文件原样转发到 RunningHub"""
+        payload = os.urandom(3 * 1024 * 1024)
+        resp = self._post([("type", b"video", None), ("file", payload, "clip.mp4")])
+
+        self.assertEqual(resp.json["code"], 0)
+        forwarded = self.server.upload_bodies[0]
+        self.assertIn(payload, forwarded)
+        self.assertIn(b'name="fileType"\r\n\r\ninput', forwarded)
+        self.assertIn(b'filename="clip.mp4"\r\nContent-Type: video/mp4', forwarded)
+
+    def test_type_after_file(self):
+        """测试 type 字段在文件之后时按扩展名推断"""
+        resp = self._post([("file", b"png-bytes", "a.png"), ("type", b"image", None)])
+        self.assertEqual(resp.json["code"], 0)
+        self.assertIn(b"Content-Type: image/png", self.server.upload_bodies[0])
+
+    def test_rejects(self):
+        """测试文件类型校验在转发前完成"""
+        self.assertEqual(self._post([("type", b"video", None), ("file", b"x", "a.exe")]).status_code, 400)
+        self.assertEqual(self._post([("type", b"video", None)]).status_code, 400)
+        self.assertEqual(self.server.count("/task/openapi/upload"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,143 @@
+"""
+测试任务状态推送接口 /api/tasks/<id>/events
+
+运行方式:
+    python tests/test_task_events.py
+
+功能:
+1. 测试 SSE 推送状态变化及成功后的输出列表
+2. 测试多个订阅者共用同一次轮询
+3. 测试任务失败时的推送
+4. 测试未知任务ID不会被监视
+5. 测试监视器放弃任务（持续查询失败）时推送 error 事件并结束
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("RH_ADMISSION_DIR", tempfile.mkdtemp())
+os.environ.setdefault("RH_TASK_DB", os.path.join(tempfile.mkdtemp(), "tasks.db"))
+os.environ.setdefault("RH_UPLOAD_CACHE", os.path.join(tempfile.mkdtemp(), "uploads.db"))
+
+import app
+from download_manager import DownloadManager
+from runninghub_client import RunningHubClient
+from task_watcher import TaskWatcher, WatcherConfig
+from fake_runninghub_server import FakeRunningHubServer
+
+
+def parse_events(body):
+    """把 SSE 响应体解析为 (event, data) 列表，忽略心跳注释"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = "message", None
+        for line in block.split("\n"):
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                data = json.loads(line[6:])
+        if data is not None:
+            events.append((event, data))
+    return events
+
+
+class TestTaskEvents(unittest.TestCase):
+    """测试任务状态推送"""
+
+    def start(self, **server_kwargs):
+        self.server = FakeRunningHubServer(**server_kwargs).start()
+        self.tmp = tempfile.TemporaryDirectory()
+        client = RunningHubClient("test-key")
+        client.BASE_URL = self.server.base_url
+        watcher = TaskWatcher(client.query_task_status, WatcherConfig(min_interval=0.05, max_interval=0.05))
+
+        self._saved = (app.BASE_URL, app.task_watcher, app.downloader)
+        app.BASE_URL = self.server.base_url
+        app.task_watcher = watcher
+        app.downloader = DownloadManager(self.tmp.name)
+        app.task_outputs.clear()
+        self.client = app.app.test_client()
+        task_id = self.server._create({})["data"]["taskId"]
+        app.task_store.record_created(task_id, "wf", [])  # 视为本应用创建的任务
+        return task_id
+
+    def tearDown(self):
+        app.task_watcher.stop()
+        app.downloader.close()
+        app.BASE_URL, app.task_watcher, app.downloader = self._saved
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def get_events(self, task_id):
+        resp = self.client.get(f"/api/tasks/{task_id}/events")
+        self.assertEqual(resp.mimetype, "text/event-stream")
+        return parse_events(resp.get_data(as_text=True))
+
+    def test_success(self):
+        """测试推送状态直到成功，并带上输出列表"""
+        task_id = self.start(polls_until_done=3)
+        events = self.get_events(task_id)
+
+        statuses = [data["status"] for _, data in events]
+        self.assertEqual(statuses[-1], "SUCCESS")
+        self.assertEqual(len(statuses), len(set(statuses)))
+        outputs = events[-1][1]["outputs"]
+        self.assertEqual(outputs[0]["fileUrl"], f"{self.server.base_url}/files/{task_id}.png")
+
+    def test_shared_polling(self):
+        """测试多个页面同时订阅时每次状态只查询一次"""
+        task_id = self.start(polls_until_done=3)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.get_events(task_id))) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(10)
+
+        self.assertEqual(len(results), 4)
+        for events in results:
+            self.assertEqual(events[-1][1]["status"], "SUCCESS")
+        self.assertEqual(self.server.count("/task/openapi/status"), 3)
+        self.assertEqual(self.server.count("/task/openapi/outputs"), 1)
+
+    def test_failed(self):
+        """测试任务失败"""
+        task_id = self.start(final_status="FAILED")
+        events = self.get_events(task_id)
+        self.assertEqual(events[-1][1]["status"], "FAILED")
+        self.assertTrue(events[-1][1]["done"])
+        self.assertNotIn("outputs", events[-1][1])
+
+    def test_given_up(self):
+        """测试 RunningHub 上已不存在的任务：持续查询失败后以 error 事件结束，而不是一直推送告警"""
+        self.start()
+        app.task_watcher.config.max_errors = 1
+        app.task_watcher.config.give_up_errors = 3
+        app.task_store.record_created("deleted-task", "wf", [])
+        events = self.get_events("deleted-task")
+        self.assertEqual(events[-1][0], "error")
+        self.assertIn("NOT_FOUND", events[-1][1]["msg"])
+        self.assertEqual(app.task_watcher.snapshot("deleted-task")["status"], "ERROR")
+        resp = self.client.post("/api/query_status", json={"taskId": "deleted-task"})
+        self.assertEqual(resp.json["code"], -1)
+
+    def test_unknown_task(self):
+        """测试不会为未知的任务ID开始轮询"""
+        self.start()
+        resp = self.client.get("/api/tasks/not-created-here/events")
+        self.assertEqual(resp.status_code, 404)
+        resp = self.client.post("/api/query_status", json={"taskId": "not-created-here"})
+        self.assertEqual(resp.status_code, 404)
+        self.assertIsNone(app.task_watcher.snapshot("not-created-here"))
+        self.assertEqual(self.server.count("/task/openapi/status"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,182 @@
+"""
+测试任务状态持久化
+
+运行方式:
+    python tests/test_task_store.py
+
+功能:
+1. 测试任务记录、状态历史、输出与本地文件
+2. 测试未结束任务查询与相同参数提交的识别
+3. 测试客户端写入存储、Flask 服务重启后恢复跟踪
+4. 测试启动恢复只跳过调试重载器的父进程
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("RH_ADMISSION_DIR", tempfile.mkdtemp())
+os.environ.setdefault("RH_TASK_DB", os.path.join(tempfile.mkdtemp(), "tasks.db"))
+os.environ.setdefault("RH_UPLOAD_CACHE", os.path.join(tempfile.mkdtemp(), "uploads.db"))
+
+from task_store import TaskStore, account_id
+from task_watcher import TaskWatcher, WatcherConfig
+from runninghub_client import RunningHubClient
+from fake_runninghub_server import FakeRunningHubServer
+
+NODES = [{"nodeId": "1", "fieldName": "image", "fieldValue": "a.png"}]
+
+
+class TestTaskStore(unittest.TestCase):
+    """测试任务存储"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "tasks.db")
+        self.store = TaskStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_lifecycle(self):
+        """测试状态只在变化时记录，结束后不再改变"""
+        self.store.record_created("t1", "wf", NODES, account="acc", source="test")
+        self.assertTrue(self.store.record_status("t1", "RUNNING"))
+        self.assertFalse(self.store.record_status("t1", "RUNNING"))
+        self.assertTrue(self.store.record_status("t1", "SUCCESS"))
+        self.assertFalse(self.store.record_status("t1", "RUNNING"))
+        self.assertFalse(self.store.record_status("unknown", "RUNNING"))
+
+        self.store.record_outputs("t1", [{"fileUrl": "http://x/1.png", "fileType": "png"}])
+        self.store.add_local_file("t1", "Output/1.png")
+        self.store.add_local_file("t1", "Output/1.png")
+
+        task = self.store.get("t1")
+        self.assertEqual(task["status"], "SUCCESS")
+        self.assertEqual(task["nodeInfoList"], NODES)
+        self.assertEqual(task["outputs"][0]["fileUrl"], "http://x/1.png")
+        self.assertEqual(task["localFiles"], ["Output/1.png"])
+        self.assertIsNotNone(task["runSeconds"])
+        self.assertEqual([e["status"] for e in self.store.history("t1")], ["QUEUED", "RUNNING", "SUCCESS"])
+
+    def test_unfinished_and_filters(self):
+        """测试未结束任务查询、相同参数识别和筛选"""
+        self.store.record_created("t1", "wf", NODES, account="a")
+        self.store.record_created("t2", "wf", NODES, account="a")
+        self.store.record_created("t3", "other", [], account="b")
+        self.store.record_status("t2", "FAILED")
+        self.store.record_status("t3", "ERROR")
+
+        self.assertEqual([t["taskId"] for t in self.store.unfinished(account="a")], ["t1"])
+        self.assertEqual([t["taskId"] for t in self.store.unfinished()], ["t1", "t3"])
+        self.assertEqual(self.store.find_unfinished("wf", list(NODES), account="a")["taskId"], "t1")
+        self.assertIsNone(self.store.find_unfinished("wf", [], account="a"))
+        self.assertEqual(len(self.store.list(workflow_id="wf")), 2)
+        self.assertEqual([t["taskId"] for t in self.store.list(status="FAILED")], ["t2"])
+
+    def test_survives_reopen_and_threads(self):
+        """测试多线程写入及重新打开数据库后数据仍在"""
+        def worker(n):
+            for i in range(20):
+                self.store.record_created(f"{n}-{i}", "wf", [])
+                self.store.record_status(f"{n}-{i}", "RUNNING")
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        other = TaskStore(self.path)
+        try:
+            self.assertEqual(len(other.list(status="RUNNING", limit=1000)), 80)
+        finally:
+            other.close()
+
+
+class TestClientAndRecovery(unittest.TestCase):
+    """测试客户端写入存储以及服务重启后的恢复"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = TaskStore(os.path.join(self.tmp.name, "tasks.db"))
+        self.server = FakeRunningHubServer(polls_until_done=2).start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_client_records(self):
+        """测试 run_workflow 记录任务的完整过程"""
+        client = RunningHubClient("test-key", store=self.store)
+        client.BASE_URL = self.server.base_url
+        result = client.run_workflow("wf", NODES, interval=0)
+        self.assertEqual(result["code"], 0)
+
+        task = self.store.list()[0]
+        self.assertEqual(task["account"], account_id("test-key"))
+        self.assertEqual(task["status"], "SUCCESS")
+        self.assertEqual(len(task["outputs"]), 1)
+
+    def test_app_recovery(self):
+        """测试服务重启后恢复跟踪未结束的任务，不重新提交"""
+        import app
+        from download_manager import DownloadManager
+
+        task_id = self.server._create({"workflowId": "wf"})["data"]["taskId"]
+        self.store.record_created(task_id, "wf", [], account=account_id(app.API_KEY), source="app")
+
+        client = RunningHubClient("test-key")
+        client.BASE_URL = self.server.base_url
+        saved = (app.BASE_URL, app.task_watcher, app.task_store, app.downloader)
+        app.BASE_URL = self.server.base_url
+        app.task_watcher = TaskWatcher(client.query_task_status, WatcherConfig(min_interval=0.05))
+        app.task_store = self.store
+        app.downloader = DownloadManager(self.tmp.name)
+        app.task_outputs.clear()
+        try:
+            self.assertEqual(app.recover_tasks(), [task_id])
+            self.assertEqual(app.task_watcher.wait(task_id, 5)["status"], "SUCCESS")
+
+            deadline = time.time() + 5
+            while not self.store.get(task_id)["localFiles"] and time.time() < deadline:
+                time.sleep(0.05)
+            task = self.store.get(task_id)
+            self.assertEqual(task["status"], "SUCCESS")
+            self.assertEqual(task["localFiles"], [os.path.join(self.tmp.name, f"{task_id}.png")])
+            self.assertEqual(self.server.count("/task/openapi/create"), 0)
+        finally:
+            app.task_watcher.stop()
+            app.BASE_URL, app.task_watcher, app.task_store, app.downloader = saved
+
+    def test_reloader_parent(self):
+        """测试只有重载器的父进程跳过恢复，flask run 不带重载器或 WSGI 服务器都会恢复"""
+        import app
+        cases = [
+            ({"WERKZEUG_RUN_MAIN": "true"}, ["app.py"], False),                       # 重载器子进程
+            ({}, ["gunicorn", "app:app"], False),                                      # WSGI 服务器
+            ({"FLASK_RUN_FROM_CLI": "true"}, ["flask", "run"], False),                 # flask run
+            ({"FLASK_RUN_FROM_CLI": "true", "FLASK_DEBUG": "1"}, ["flask", "run"], True),
+            ({"FLASK_RUN_FROM_CLI": "true", "FLASK_DEBUG": "1"}, ["flask", "run", "--no-reload"], False),
+            ({"FLASK_RUN_FROM_CLI": "true"}, ["flask", "run", "--reload"], True),
+        ]
+        for env, argv, expected in cases:
+            with self.subTest(env=env, argv=argv):
+                clean = {k: v for k, v in os.environ.items()
+                         if k not in ("WERKZEUG_RUN_MAIN", "FLASK_RUN_FROM_CLI", "FLASK_DEBUG")}
+                with mock.patch.dict(os.environ, dict(clean, **env), clear=True), \
+                        mock.patch.object(sys, "argv", argv):
+                    self.assertEqual(app.is_reloader_parent(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
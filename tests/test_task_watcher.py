@@ -0,0 +1,238 @@
+"""
+测试任务监视器
+
+运行方式:
+    python tests/test_task_watcher.py
+
+功能:
+1. 测试单个调度循环监视大量任务
+2. 测试回调、Future、队列三种订阅方式
+3. 测试自适应轮询间隔
+4. 测试客户端通过监视器等待任务
+5. 测试查询失败时只告警、不结束任务；持续失败或超龄时以 ERROR 结束
+6. 测试 wait 超时、最后一个订阅者离开后停止监视
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from task_watcher import TaskWatcher, TaskState, WatcherConfig
+from runninghub_client import RunningHubClient
+from fake_runninghub_server import FakeRunningHubServer
+
+FAST = WatcherConfig(min_interval=0.01, max_interval=0.05, warmup=0.05, max_errors=2)
+
+
+class ScriptedStatus:
+    """按查询次数返回预设状态的查询函数"""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.calls = {}
+        self.threads = set()
+        self.lock = threading.Lock()
+
+    def __call__(self, task_id):
+        with self.lock:
+            n = self.calls.get(task_id, 0)
+            self.calls[task_id] = n + 1
+            self.threads.add(threading.current_thread().name)
+        status = self.statuses[min(n, len(self.statuses) - 1)]
+        if status is None:
+            return {"code": -1, "msg": "network error", "data": None}
+        return {"code": 0, "msg": "success", "data": status}
+
+
+class TestTaskWatcher(unittest.TestCase):
+    """测试监视器核心功能"""
+
+    def setUp(self):
+        self.query = ScriptedStatus(["QUEUED", "RUNNING", "RUNNING", "SUCCESS"])
+        self.watcher = TaskWatcher(self.query, FAST)
+
+    def tearDown(self):
+        self.watcher.stop()
+
+    def test_many_tasks_single_loop(self):
+        """测试500个任务共用一个调度循环"""
+        threads_before = threading.active_count()
+        futures = [self.watcher.future(str(i)) for i in range(500)]
+        results = [f.result(timeout=30) for f in futures]
+
+        self.assertTrue(all(r["status"] == "SUCCESS" for r in results))
+        # 1 个调度线程 + 最多 max_concurrent_polls 个查询线程
+        self.assertLessEqual(threading.active_count() - threads_before, 1 + FAST.max_concurrent_polls)
+        self.assertLessEqual(len(self.query.threads), FAST.max_concurrent_polls)
+        self.assertEqual(self.watcher.stats()["active"], 0)
+
+    def test_subscribers(self):
+        """测试回调与队列收到完整的状态序列"""
+        seen = []
+        self.watcher.subscribe("t1", lambda snap: seen.append(snap["status"]))
+        q = self.watcher.subscribe_queue("t1")
+        final = self.watcher.wait("t1", timeout=5)
+
+        statuses = []
+        while True:
+            snap = q.get(timeout=5)
+            statuses.append(snap["status"])
+            if snap["done"]:
+                break
+
+        self.assertEqual(final["status"], "SUCCESS")
+        self.assertEqual(statuses, ["QUEUED", "RUNNING", "SUCCESS"])
+        self.assertEqual(seen, statuses)
+
+    def test_future_after_finish(self):
+        """测试任务结束后获取的 Future 立即完成"""
+        self.watcher.wait("t1", timeout=5)
+        self.assertTrue(self.watcher.future("t1").done())
+
+    def test_external_update(self):
+        """测试外部推送状态立即唤醒等待者"""
+        watcher = TaskWatcher(ScriptedStatus(["RUNNING"]), WatcherConfig(min_interval=60, warmup=0))
+        try:
+            future = watcher.future("t1")
+            watcher.update("t1", "SUCCESS")
+            self.assertEqual(future.result(timeout=1)["status"], "SUCCESS")
+        finally:
+            watcher.stop()
+
+    def test_errors(self):
+        """测试连续查询失败只告警并继续轮询，恢复后正常结束"""
+        watcher = TaskWatcher(ScriptedStatus(["RUNNING", None, None, None, "RUNNING", "SUCCESS"]), FAST)
+        try:
+            seen = []
+            watcher.subscribe("t1", lambda snap: seen.append((snap["status"], snap["errors"], snap["lastError"])))
+            final = watcher.wait("t1", timeout=5)
+            self.assertEqual(final["status"], "SUCCESS")
+            self.assertEqual(final["errors"], 0)
+            self.assertEqual(seen, [("RUNNING", 0, None), ("RUNNING", 2, "network error"),
+                                    ("RUNNING", 0, None), ("SUCCESS", 0, None)])
+        finally:
+            watcher.stop()
+
+    def test_give_up(self):
+        """测试持续查询失败（如任务已被删除）时以 ERROR 结束，等待者与订阅者都被释放"""
+        config = WatcherConfig(min_interval=0.01, max_interval=0.02, warmup=0.05, max_errors=2, give_up_errors=4)
+        watcher = TaskWatcher(ScriptedStatus(["RUNNING", None]), config)
+        try:
+            seen = []
+            watcher.subscribe("t1", lambda snap: seen.append(snap["status"]))
+            final = watcher.wait("t1", timeout=5)
+            self.assertEqual(final["status"], "ERROR")
+            self.assertTrue(final["done"])
+            self.assertEqual(final["lastError"], "network error")
+            self.assertEqual(seen[-1], "ERROR")
+        finally:
+            watcher.stop()
+
+    def test_max_age(self):
+        """测试监视超过 max_age 仍未结束时以 ERROR 结束"""
+        config = WatcherConfig(min_interval=0.01, max_interval=0.02, warmup=0.05, max_age=0.1)
+        watcher = TaskWatcher(ScriptedStatus(["RUNNING"]), config)
+        try:
+            final = watcher.wait("t1", timeout=5)
+            self.assertEqual(final["status"], "ERROR")
+            self.assertIn("监视超过", final["lastError"])
+        finally:
+            watcher.stop()
+
+    def test_forget_abandoned(self):
+        """测试 wait 超时移除 Future，没有订阅者时停止监视；最后一个订阅者离开时同样停止"""
+        query = ScriptedStatus(["RUNNING"])
+        watcher = TaskWatcher(query, FAST)
+        try:
+            self.assertIsNone(watcher.wait("t1", timeout=0.1))
+            self.assertIsNone(watcher.snapshot("t1"))
+            polls = query.calls["t1"]
+            time.sleep(0.2)
+            self.assertEqual(query.calls["t1"], polls)
+
+            first = watcher.subscribe("t2", lambda snap: None)
+            second = watcher.subscribe_queue("t2")
+            self.assertIsNone(watcher.wait("t2", timeout=0.05))
+            watcher.unsubscribe("t2", first)
+            self.assertIsNotNone(watcher.snapshot("t2"))
+            watcher.unsubscribe("t2", second)
+            self.assertIsNone(watcher.snapshot("t2"))
+            self.assertEqual(watcher.stats()["tracked"], 0)
+        finally:
+            watcher.stop()
+
+
+class TestAdaptiveInterval(unittest.TestCase):
+    """测试自适应轮询间隔"""
+
+    def setUp(self):
+        self.config = WatcherConfig(min_interval=2, max_interval=30, warmup=20)
+        self.watcher = TaskWatcher(lambda task_id: {}, self.config)
+        self.now = 10000.0
+
+    def _state(self, age, status="RUNNING", running_for=None):
+        state = TaskState(task_id="t", workflow_id="wf", status=status, created_at=self.now - age)
+        if running_for is not None:
+            state.running_since = self.now - running_for
+        return state
+
+    def test_fast_at_start(self):
+        """测试刚提交时快速轮询"""
+        self.assertEqual(self.watcher._next_interval(self._state(5), self.now), 2)
+
+    def test_slows_down_without_estimate(self):
+        """测试无耗时估计时逐渐放慢"""
+        self.assertEqual(self.watcher._next_interval(self._state(100), self.now), 10)
+        self.assertEqual(self.watcher._next_interval(self._state(1000), self.now), 30)
+
+    def test_speeds_up_near_expected_finish(self):
+        """测试接近预计完成时间时加快"""
+        self.watcher._expected["wf"] = 300
+        far = self.watcher._next_interval(self._state(130, running_for=100), self.now)
+        near = self.watcher._next_interval(self._state(310, running_for=280), self.now)
+        self.assertEqual(far, 30)
+        self.assertEqual(near, 2)
+
+    def test_push_fallback(self):
+        """测试有 webhook 推送的任务只做低频兜底轮询"""
+        state = self._state(5)
+        state.push = True
+        self.assertEqual(self.watcher._next_interval(state, self.now), self.config.push_interval)
+
+    def test_ewma(self):
+        """测试工作流耗时估计"""
+        self.watcher._record_duration("wf", 100)
+        self.watcher._record_duration("wf", 200)
+        self.assertAlmostEqual(self.watcher.expected_duration("wf"), 130)
+
+
+class TestClientWithWatcher(unittest.TestCase):
+    """测试客户端通过监视器等待任务"""
+
+    def test_run_workflow(self):
+        """测试 run_workflow 使用监视器"""
+        with FakeRunningHubServer(polls_until_done=3) as server:
+            client = RunningHubClient("test-key")
+            client.BASE_URL = server.base_url
+            client.watcher = TaskWatcher(client.query_task_status, FAST)
+            try:
+                statuses = []
+                result = client.run_workflow("1", max_retries=100, interval=0.05)
+                self.assertEqual(result["code"], 0)
+                self.assertIsNotNone(client.watcher.expected_duration("1"))
+
+                task_id = client.create_task("1")["data"]["taskId"]
+                client.wait_for_task(task_id, max_retries=100, interval=0.05,
+                                     callback=lambda s, n: statuses.append(s))
+                self.assertEqual(statuses, ["QUEUED", "RUNNING", "SUCCESS"])
+            finally:
+                client.watcher.stop()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,157 @@
+"""
+测试上传去重缓存
+
+运行方式:
+    python tests/test_upload_cache.py
+
+功能:
+1. 测试内容哈希索引（命中、过期、按账户区分、持久化）
+2. 测试客户端重复上传相同内容时不再传输
+3. 测试 /api/upload 记录哈希、/api/upload/check 查询
+"""
+
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("RH_ADMISSION_DIR", tempfile.mkdtemp())
+os.environ.setdefault("RH_TASK_DB", os.path.join(tempfile.mkdtemp(), "tasks.db"))
+os.environ.setdefault("RH_UPLOAD_CACHE", os.path.join(tempfile.mkdtemp(), "uploads.db"))
+
+from upload_cache import UploadCache, media_kind
+from runninghub_client import RunningHubClient
+from fake_runninghub_server import FakeRunningHubServer
+
+
+class TestUploadCache(unittest.TestCase):
+    """测试哈希索引"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, "uploads.db")
+        self.cache = UploadCache(self.db)
+        self.file = os.path.join(self.tmp.name, "a.png")
+        with open(self.file, "wb") as f:
+            f.write(os.urandom(3 * 1024 * 1024 + 7))
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_hash_file(self):
+        """测试流式哈希与一次性哈希一致"""
+        with open(self.file, "rb") as f:
+            expected = hashlib.sha256(f.read()).hexdigest()
+        self.assertEqual(self.cache.hash_file(self.file), expected)
+        self.assertEqual(self.cache.hash_file(self.file), expected)
+
+        # 内容变化后重新计算
+        with open(self.file, "ab") as f:
+            f.write(b"x")
+        os.utime(self.file, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+        self.assertNotEqual(self.cache.hash_file(self.file), expected)
+
+    def test_get_put(self):
+        """测试命中、按账户区分、持久化与过期"""
+        digest = self.cache.hash_file(self.file)
+        self.assertIsNone(self.cache.get(digest, "key-a", "image"))
+        self.cache.put(digest, "key-a", "image", "api/a.png", size=100)
+        self.assertEqual(self.cache.get(digest, "key-a", "image"), "api/a.png")
+        self.assertIsNone(self.cache.get(digest, "key-b", "image"))
+        self.assertIsNone(self.cache.get(digest, "key-a", "video"))
+        self.assertEqual(self.cache.stats()["bytes_saved"], 100)
+
+        other = UploadCache(self.db, ttl=0)
+        try:
+            self.assertIsNone(other.get(digest, "key-a", "image"))
+            self.assertEqual(other.prune(), 1)
+        finally:
+            other.close()
+        self.assertIsNone(self.cache.get(digest, "key-a", "image"))
+
+    def test_media_kind(self):
+        """测试 MIME 类型与节点使用的类型一致"""
+        self.assertEqual(media_kind("image/jpeg"), "image")
+        self.assertEqual(media_kind("video/mp4"), "video")
+        self.assertEqual(media_kind("audio/mpeg"), "audio")
+        self.assertEqual(media_kind("application/octet-stream"), "image")
+
+
+class TestClientDedup(unittest.TestCase):
+    """测试客户端上传去重"""
+
+    def test_repeat_upload(self):
+        """测试相同内容只上传一次"""
+        with tempfile.TemporaryDirectory() as tmp, FakeRunningHubServer() as server:
+            path = os.path.join(tmp, "pose.png")
+            with open(path, "wb") as f:
+                f.write(os.urandom(5000))
+            copy = os.path.join(tmp, "copy.png")
+            with open(copy, "wb") as f, open(path, "rb") as src:
+                f.write(src.read())
+
+            client = RunningHubClient("test-key", upload_cache=UploadCache(os.path.join(tmp, "u.db")))
+            client.BASE_URL = server.base_url
+            first = client.upload_image(path)
+            second = client.upload_image(copy)
+
+            self.assertEqual(len(server.uploads), 1)
+            self.assertEqual(second["data"]["fileName"], first["data"]["fileName"])
+            self.assertTrue(second["data"]["cached"])
+            # 与 ComfyUI 图片上传节点使用同一类型，节点可直接命中
+            self.assertEqual(client.upload_cache.get(client.upload_cache.hash_file(path), "test-key", "image"),
+                             first["data"]["fileName"])
+
+
+class TestUploadEndpointDedup(unittest.TestCase):
+    """测试网页上传去重"""
+
+    def setUp(self):
+        import app
+        self.app = app
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = FakeRunningHubServer().start()
+        self._saved = (app.BASE_URL, app.upload_cache)
+        app.BASE_URL = self.server.base_url
+        app.upload_cache = UploadCache(os.path.join(self.tmp.name, "u.db"))
+        self.client = app.app.test_client()
+
+    def tearDown(self):
+        self.app.BASE_URL, self.app.upload_cache = self._saved
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def test_check_after_upload(self):
+        """测试上传后可按 SHA-256 查到 fileName"""
+        content = os.urandom(100 * 1024)
+        digest = hashlib.sha256(content).hexdigest()
+
+        resp = self.client.post("/api/upload/check", json={"sha256": digest, "type": "image"})
+        self.assertEqual(resp.json["code"], 1)
+
+        resp = self.client.post("/api/upload", data={"type": "image", "file": (io.BytesIO(content), "a.png")},
+                                content_type="multipart/form-data")
+        file_name = resp.json["data"]["fileName"]
+
+        resp = self.client.post("/api/upload/check", json={"sha256": digest, "type": "image"})
+        self.assertEqual(resp.json["code"], 0)
+        self.assertEqual(resp.json["data"]["fileName"], file_name)
+        self.assertEqual(len(self.server.uploads), 1)
+        # 按媒体类型存储，与图片上传节点共用条目；视频类型不会误命中
+        self.assertEqual(self.app.upload_cache.get(digest, self.app.API_KEY, "image"), file_name)
+        resp = self.client.post("/api/upload/check", json={"sha256": digest, "type": "video"})
+        self.assertEqual(resp.json["code"], 1)
+
+        resp = self.client.post("/api/upload/check", json={"sha256": "abc"})
+        self.assertEqual(resp.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
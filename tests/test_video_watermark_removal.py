@@ -11,10 +11,16 @@ import requests
 import json
 import time
 import subprocess
+import sys
+import os
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional, Dict, Any, Tuple
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from runninghub_client import RunningHubClient
+from workflow_cache import get_workflow_cache
+
 # 配置
 API_KEY = "acf7d42aedee45dfa8b78ee43eec82a9"
 BASE_URL = "https://www.runninghub.cn"
@@ -113,32 +119,20 @@ def upload_video(video_path: Path) -> Optional[str]:
         return None
 
 
-def create_watermark_removal_task(video_filename: str, workflow_id: str) -> Optional[Dict]:
+def find_video_node_id(workflow_id: str) -> Optional[str]:
     """
-    创建视频去水印任务
+    查找工作流中的视频输入节点
     
-    Args:
-        video_filename: 上传后的视频文件名
-        workflow_id: 工作流ID
-        
     Returns:
-        任务创建结果
+        节点ID，获取工作流JSON失败时返回None
     """
-    print(f"[任务] 创建去水印任务, 工作流: {workflow_id}")
-    
-    url = f"{BASE_URL}/task/openapi/create"
-    
-    # 先获取工作流JSON，找到视频输入节点
-    workflow_json = get_workflow_json(workflow_id)
-    if not workflow_json or workflow_json.get("code") != 0:
+    # 先获取工作流JSON（带缓存），找到视频输入节点
+    prompt = get_workflow_cache(get_workflow_json).get(workflow_id)
+    if prompt is None:
         print(f"[任务] ❌ 获取工作流JSON失败")
         return None
     
     # 查找LoadVideo节点
-    prompt = workflow_json.get("data", {}).get("prompt", "{}")
-    if isinstance(prompt, str):
-        prompt = json.loads(prompt)
-    
     video_node_id = None
     for node_id, node_data in prompt.items():
         if node_data.get("class_type") == "LoadVideo":
@@ -160,6 +154,28 @@ def create_watermark_removal_task(video_filename: str, workflow_id: str) -> Opti
     else:
         print(f"[任务] ✅ 找到视频节点: {video_node_id}")
     
+    return video_node_id
+
+
+def create_watermark_removal_task(video_filename: str, workflow_id: str) -> Optional[Dict]:
+    """
+    创建视频去水印任务
+    
+    Args:
+        video_filename: 上传后的视频文件名
+        workflow_id: 工作流ID
+        
+    Returns:
+        任务创建结果
+    """
+    print(f"[任务] 创建去水印任务, 工作流: {workflow_id}")
+    
+    url = f"{BASE_URL}/task/openapi/create"
+    
+    video_node_id = find_video_node_id(workflow_id)
+    if not video_node_id:
+        return None
+    
     payload = {
         "apiKey": API_KEY,
         "workflowId": workflow_id,
@@ -371,11 +387,13 @@ def main():
         return
     
     print(f"\n找到 {len(video_files)} 个视频文件:")
+    # 按横竖屏分组，每组作为一个批次提交，由客户端负责并发、排队和下载
+    groups = {}
     for v in video_files:
         orientation = get_video_orientation(v)
+        groups.setdefault(orientation, []).append(v)
         print(f"  - {v.name} ({orientation})")
     
-    # 并行处理所有视频
     print(f"\n{'='*60}")
     print("开始并行处理...")
     print(f"{'='*60}\n")
@@ -385,27 +403,32 @@ def main():
         "failed": []
     }
     
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        # 提交所有任务
-        future_to_video = {
-            executor.submit(process_single_video, video_path): video_path 
-            for video_path in video_files
-        }
+    client = RunningHubClient(API_KEY)
+    for orientation, videos in groups.items():
+        workflow_id = WORKFLOW_IDS.get(orientation, WORKFLOW_IDS["landscape"])
+        video_node_id = find_video_node_id(workflow_id)
+        if not video_node_id:
+            results["failed"].extend(v.name for v in videos)
+            continue
         
-        # 收集结果
-        for future in as_completed(future_to_video):
-            video_path = future_to_video[future]
-            try:
-                success, files = future.result()
-                if success:
-                    results["success"].append({
-                        "video": video_path.name,
-                        "files": files
-                    })
-                else:
-                    results["failed"].append(video_path.name)
-            except Exception as e:
-                print(f"[异常] 处理 {video_path.name} 时出错: {e}")
+        inputs = [
+            [{"nodeId": video_node_id, "fieldName": "video", "localFile": str(v)}]
+            for v in videos
+        ]
+        names = [f"{v.stem}_no_watermark" for v in videos]
+        
+        for item in client.run_workflow_batch(
+            workflow_id, inputs, max_in_flight=3, output_dir=str(OUTPUT_DIR), output_names=names
+        ):
+            video_path = videos[item["index"]]
+            if item["status"] == "SUCCESS":
+                print(f"[处理] ✅ {video_path.name} 完成! 下载 {len(item['files'])} 个文件")
+                results["success"].append({
+                    "video": video_path.name,
+                    "files": [Path(f) for f in item["files"]]
+                })
+            else:
+                print(f"[处理] ❌ {video_path.name} 失败: {item['msg']}")
                 results["failed"].append(video_path.name)
     
     # 输出总结
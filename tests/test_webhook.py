@@ -0,0 +1,147 @@
+"""
+测试 RunningHub 任务结束回调接收
+
+运行方式:
+    python tests/test_webhook.py
+
+功能:
+1. 测试提交任务时带上回调地址，回调到达后唤醒等待者，状态与输出从 API 重新获取并下载
+2. 测试回调校验（未配置令牌、令牌错误、未知任务），回调中的 eventData 不被信任
+3. 测试失败回调，以及成功但没有输出的任务
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("RH_ADMISSION_DIR", tempfile.mkdtemp())
+os.environ.setdefault("RH_TASK_DB", os.path.join(tempfile.mkdtemp(), "tasks.db"))
+os.environ.setdefault("RH_UPLOAD_CACHE", os.path.join(tempfile.mkdtemp(), "uploads.db"))
+
+import app
+from admission import AdmissionScheduler
+from download_manager import DownloadManager
+from runninghub_client import RunningHubClient
+from task_watcher import TaskWatcher, WatcherConfig
+from fake_runninghub_server import FakeRunningHubServer
+
+
+class TestWebhook(unittest.TestCase):
+    """测试回调接收端"""
+
+    def start(self, final_status="SUCCESS"):
+        self.flask = app.app.test_client()
+        self.responses = []
+        self.server = FakeRunningHubServer(
+            polls_until_done=1000, final_status=final_status, webhook_sender=self.deliver
+        ).start()
+        self.tmp = tempfile.TemporaryDirectory()
+        client = RunningHubClient("test-key")
+        client.BASE_URL = self.server.base_url
+        watcher = TaskWatcher(client.query_task_status, WatcherConfig(min_interval=0.05, push_interval=60))
+
+        self._saved = {name: getattr(app, name) for name in (
+            "BASE_URL", "task_watcher", "downloader", "admission", "fetch_remote_task_count",
+            "WEBHOOK_BASE_URL", "WEBHOOK_SECRET"
+        )}
+        app.BASE_URL = self.server.base_url
+        app.task_watcher = watcher
+        app.downloader = DownloadManager(self.tmp.name)
+        app.admission = AdmissionScheduler("webhook-test", state_dir=self.tmp.name)
+        app.fetch_remote_task_count = lambda: 0
+        app.WEBHOOK_BASE_URL = "http://app.example"
+        app.WEBHOOK_SECRET = "s3cret"
+        app.task_outputs.clear()
+
+        result = app.submit_task({"apiKey": "test-key", "workflowId": "wf", "nodeInfoList": []}, "wf")
+        return result["data"]["taskId"]
+
+    def deliver(self, url, payload):
+        """把回调发到 Flask 测试客户端"""
+        parts = urlsplit(url)
+        self.responses.append(self.flask.post(f"{parts.path}?{parts.query}", json=payload))
+
+    def tearDown(self):
+        app.task_watcher.stop()
+        app.downloader.close()
+        for name, value in self._saved.items():
+            setattr(app, name, value)
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def test_callback_wakes_waiters(self):
+        """测试回调到达后等待者立即被唤醒，状态与输出从 API 获取"""
+        task_id = self.start()
+        self.assertEqual(self.server.tasks[task_id]["webhookUrl"],
+                         "http://app.example/api/webhook/runninghub?token=s3cret")
+        self.assertTrue(app.task_watcher.snapshot(task_id)["push"])
+
+        future = app.task_watcher.future(task_id)
+        events = app.task_watcher.subscribe_queue(task_id)
+        self.server.finish(task_id)
+
+        self.assertEqual(self.responses[0].status_code, 200)
+        self.assertEqual(future.result(2)["status"], "SUCCESS")
+        statuses = []
+        while not events.empty():
+            statuses.append(events.get()["status"])
+        self.assertEqual(statuses[-1], "SUCCESS")
+
+        # 兜底轮询只有首次查询，另有回调触发的一次查询；输出列表从 outputs 接口获取
+        self.assertLessEqual(self.server.count("/task/openapi/status"), 2)
+        self.assertEqual(self.server.count("/task/openapi/outputs"), 1)
+        # 同一文件的重复提交会复用回调触发的下载
+        app.downloader.submit("", f"{task_id}.png").result(10)
+        self.assertEqual(app.downloader.status(f"{task_id}.png"), "done")
+
+    def test_failed_callback(self):
+        """测试失败回调"""
+        task_id = self.start(final_status="FAILED")
+        self.server.finish(task_id)
+        self.assertEqual(app.task_watcher.wait(task_id, 2)["status"], "FAILED")
+
+    def test_empty_outputs(self):
+        """测试成功但输出列表为空的任务仍是 SUCCESS"""
+        task_id = self.start()
+        self.server.outputs_override = {task_id: []}
+        self.server.finish(task_id)
+        self.assertEqual(app.task_watcher.wait(task_id, 2)["status"], "SUCCESS")
+
+    def test_validation(self):
+        """测试令牌、未知任务，以及伪造的 eventData 不会被使用"""
+        task_id = self.start()
+        payload = self.server.webhook_payload(task_id)
+
+        resp = self.flask.post("/api/webhook/runninghub?token=wrong", json=payload)
+        self.assertEqual(resp.status_code, 403)
+        resp = self.flask.post("/api/webhook/runninghub?token=s3cret", json=dict(payload, taskId="999"))
+        self.assertEqual(resp.status_code, 404)
+
+        # 任务尚未结束时，伪造的回调只会触发一次查询，不会写入其中的 fileUrl
+        forged = dict(payload, eventData=json.dumps({"code": 0, "data": [{"fileUrl": "http://169.254.169.254/x"}]}))
+        resp = self.flask.post("/api/webhook/runninghub?token=s3cret", json=forged)
+        self.assertEqual(json.loads(resp.data)["code"], 0)
+        self.assertFalse(app.task_watcher.snapshot(task_id)["done"])
+        self.assertNotIn(task_id, app.task_outputs)
+
+        self.server.finish(task_id)
+        self.assertEqual(app.task_watcher.wait(task_id, 2)["status"], "SUCCESS")
+        self.assertNotIn("169.254.169.254", json.dumps(app.fetch_outputs(task_id)))
+
+    def test_requires_secret(self):
+        """测试未配置令牌时不发送回调地址，回调端点一律拒绝"""
+        task_id = self.start()
+        app.WEBHOOK_SECRET = ""
+        self.assertIsNone(app.webhook_url())
+        resp = self.flask.post("/api/webhook/runninghub", json=self.server.webhook_payload(task_id))
+        self.assertEqual(resp.status_code, 403)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
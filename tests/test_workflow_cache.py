@@ -0,0 +1,176 @@
+"""
+测试工作流 JSON 缓存
+
+运行方式:
+    python tests/test_workflow_cache.py
+
+功能:
+1. 测试新鲜期内命中缓存
+2. 测试过期后先返回旧数据并后台刷新
+3. 测试磁盘缓存、LRU淘汰、并发请求合并、分段锁数量固定
+4. 测试返回副本、按账户区分条目
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workflow_cache
+from workflow_cache import WorkflowCache
+
+
+class FakeFetcher:
+    """模拟 getJsonApiFormat"""
+
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.version = 1
+        self.delay = delay
+        self.fail = False
+        self.lock = threading.Lock()
+
+    def __call__(self, workflow_id):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            return {"code": -1, "msg": "network error", "data": None}
+        prompt = {"1": {"class_type": "LoadImage", "inputs": {"image": f"v{self.version}.png"}}}
+        return {"code": 0, "msg": "success", "data": {"prompt": json.dumps(prompt)}}
+
+
+class TestWorkflowCache(unittest.TestCase):
+    """测试工作流缓存"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fetch = FakeFetcher()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _cache(self, **kwargs):
+        return WorkflowCache(self.fetch, cache_dir=self.tmp.name, **kwargs)
+
+    def test_fresh_hit(self):
+        """测试新鲜期内只请求一次"""
+        cache = self._cache()
+        for _ in range(5):
+            prompt = cache.get("wf")
+        self.assertEqual(prompt["1"]["inputs"]["image"], "v1.png")
+        self.assertEqual(self.fetch.calls, 1)
+        self.assertEqual(cache.stats()["hits"], 4)
+
+    def test_stale_while_revalidate(self):
+        """测试过期后立即返回旧数据，后台刷新"""
+        cache = self._cache(ttl=0.05)
+        cache.get("wf")
+        time.sleep(0.1)
+        self.fetch.version = 2
+        self.fetch.delay = 0.2
+
+        start = time.time()
+        prompt = cache.get("wf")
+        self.assertLess(time.time() - start, 0.1)
+        self.assertEqual(prompt["1"]["inputs"]["image"], "v1.png")
+
+        time.sleep(0.4)
+        cache.ttl = 60  # 避免再次触发后台刷新
+        self.assertEqual(cache.get("wf")["1"]["inputs"]["image"], "v2.png")
+
+    def test_revalidate_unchanged(self):
+        """测试内容未变化时只更新时间戳"""
+        cache = self._cache()
+        cache.get("wf")
+        etag = cache.etag("wf")
+        cache.get("wf", force_refresh=True)
+        self.assertEqual(cache.etag("wf"), etag)
+        self.assertEqual(cache.stats()["revalidated"], 1)
+
+    def test_disk_cache(self):
+        """测试新实例从磁盘读取缓存"""
+        self._cache().get("wf")
+        cache = self._cache()
+        self.assertEqual(cache.get("wf")["1"]["class_type"], "LoadImage")
+        self.assertEqual(self.fetch.calls, 1)
+
+    def test_lru_eviction(self):
+        """测试内存条目数有上限"""
+        cache = WorkflowCache(self.fetch, cache_dir="", max_entries=2)
+        for wid in ["a", "b", "c"]:
+            cache.get(wid)
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        cache.get("a")
+        self.assertEqual(self.fetch.calls, 4)
+
+    def test_single_flight(self):
+        """测试同一工作流的并发请求只发一次"""
+        self.fetch.delay = 0.1
+        cache = self._cache()
+        threads = [threading.Thread(target=cache.get, args=("wf",)) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.fetch.calls, 1)
+
+    def test_key_locks_bounded(self):
+        """测试同一工作流共用一把锁，锁的数量不随工作流数量增长"""
+        cache = self._cache()
+        for i in range(200):
+            cache.get(f"wf{i}")
+        self.assertIs(cache._key_lock(cache._key("wf1", None)), cache._key_lock(cache._key("wf1", None)))
+        self.assertEqual(len(cache._key_locks), workflow_cache.KEY_LOCK_STRIPES)
+
+    def test_failure_falls_back(self):
+        """测试获取失败时返回旧数据或None"""
+        cache = self._cache(ttl=0, stale_ttl=0)
+        self.fetch.fail = True
+        self.assertIsNone(cache.get("wf"))
+        self.fetch.fail = False
+        cache.get("wf")
+        self.fetch.fail = True
+        self.assertIsNotNone(cache.get("wf"))
+
+    def test_returns_copy(self):
+        """测试调用方修改返回值不影响缓存"""
+        cache = self._cache()
+        prompt = cache.get("wf")
+        prompt["1"]["inputs"]["image"] = "changed.png"
+        prompt["2"] = {}
+        self.assertEqual(cache.get("wf"), {"1": {"class_type": "LoadImage", "inputs": {"image": "v1.png"}}})
+
+    def test_get_with_etag(self):
+        """测试内容与 etag 取自同一条目，内容变化后 etag 随之变化"""
+        cache = self._cache(ttl=0)
+        prompt, etag = cache.get_with_etag("wf")
+        self.assertEqual(prompt["1"]["inputs"]["image"], "v1.png")
+        self.assertEqual(etag, cache.etag("wf"))
+        self.fetch.version = 2
+        prompt, new_etag = cache.get_with_etag("wf", force_refresh=True)
+        self.assertEqual(prompt["1"]["inputs"]["image"], "v2.png")
+        self.assertNotEqual(new_etag, etag)
+
+    def test_per_account(self):
+        """测试不同账户不共享缓存条目"""
+        cache = self._cache()
+        cache.get("wf", account="a")
+        self.fetch.version = 2
+        self.assertEqual(cache.get("wf", account="b")["1"]["inputs"]["image"], "v2.png")
+        self.assertEqual(cache.get("wf", account="a")["1"]["inputs"]["image"], "v1.png")
+        self.assertEqual(self.fetch.calls, 2)
+        self.assertNotEqual(cache.etag("wf", account="a"), cache.etag("wf", account="b"))
+        cache.invalidate("wf", account="a")
+        self.assertIsNone(cache.etag("wf", account="a"))
+        self.assertIsNotNone(cache.etag("wf", account="b"))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
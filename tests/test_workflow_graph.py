@@ -0,0 +1,173 @@
+"""
+测试工作流图索引
+
+运行方式:
+    python tests/test_workflow_graph.py
+
+功能:
+1. 测试正向/反向邻接表、class_type 索引和拓扑序
+2. 测试上下游查询（哪个 LoadImage 连到节点 38、节点 25 的下游）
+3. 测试按版本缓存、包装格式解析和环的处理
+4. 测试 ConfigManager.analyze_workflow_nodes 基于图索引的结果，未传版本时按内容缓存，
+   传入缓存 etag 时复用同一个图
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workflow_graph
+from config_manager import ConfigManager
+from task_store import account_id
+from workflow_cache import WorkflowCache
+from workflow_graph import WorkflowGraph, get_workflow_graph, parse_workflow
+
+POSE_WORKFLOW = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pose_workflow.json")
+
+
+def node(class_type, **inputs):
+    return {"class_type": class_type, "inputs": inputs, "_meta": {"title": class_type}}
+
+
+def small_workflow():
+    """LoadImage -> GetImageSize -> 两个整数运算 -> EmptyLatentImage"""
+    return {
+        "1": node("LoadImage", image="a.png"),
+        "2": node("GetImageSize", image=["1", 0]),
+        "10": node("IntMath", a=["2", 0], b=1),
+        "3": node("IntMath", a=["2", 1], b=1),
+        "4": node("EmptyLatentImage", width=["10", 0], height=["3", 0], batch_size=1),
+        "5": node("SaveImage", images=["1", 0]),
+    }
+
+
+class TestWorkflowGraph(unittest.TestCase):
+    """测试图结构与查询"""
+
+    def test_adjacency(self):
+        """测试正向与反向邻接表"""
+        graph = WorkflowGraph(small_workflow())
+        self.assertEqual(graph.inputs_of("4"), {"width": ("10", 0), "height": ("3", 0)})
+        self.assertEqual(graph.consumers_of("2"), [("3", "a", 1), ("10", "a", 0)])
+        self.assertEqual(graph.consumers_of("2", slot=1), [("3", "a", 1)])
+        self.assertEqual(graph.successors("1"), ["2", "5"])
+        self.assertEqual(graph.predecessors(4), ["10", "3"])
+        self.assertEqual(graph.literal_inputs("4"), {"batch_size": 1})
+        self.assertEqual(graph.nodes_of_class("IntMath"), ["3", "10"])
+        self.assertEqual(graph.nodes_matching(["Load", "Save"]), ["1", "5"])
+        self.assertEqual(graph.nodes_with_input("a"), ["3", "10"])
+        self.assertEqual(graph.nodes_with_input("missing"), [])
+        self.assertIn("images", graph.input_names())
+
+    def test_topological_order(self):
+        """测试拓扑序：同层按节点ID数值排序"""
+        graph = WorkflowGraph(small_workflow())
+        self.assertEqual(graph.topological_order, ["1", "2", "5", "3", "10", "4"])
+        self.assertEqual(graph.ancestors("4"), ["1", "2", "3", "10"])
+        self.assertEqual(graph.descendants("2"), ["3", "10", "4"])
+
+    def test_pose_workflow(self):
+        """测试真实工作流：节点 38 的尺寸来自 LoadImage 25"""
+        with open(POSE_WORKFLOW, "r", encoding="utf-8") as f:
+            graph = WorkflowGraph(json.load(f))
+        self.assertEqual(graph.class_type("38"), "EmptyLatentImage")
+        self.assertEqual(graph.inputs_of("38"), {"width": ("52", 0), "height": ("53", 0)})
+        self.assertEqual(graph.find_upstream("38", "LoadImage"), ["25"])
+        self.assertIn("38", graph.descendants("25"))
+        order = graph.topological_order
+        self.assertEqual(sorted(order), sorted(graph.nodes))
+        for node_id in order:
+            for src, _ in graph.inputs_of(node_id).values():
+                self.assertLess(order.index(src), order.index(node_id))
+
+    def test_cycle_and_dangling(self):
+        """测试环上的节点排在最后，指向不存在节点的连接不影响拓扑序"""
+        graph = WorkflowGraph({
+            "1": node("A", x=["2", 0]),
+            "2": node("B", x=["1", 0]),
+            "3": node("C", x=["99", 0]),
+        })
+        self.assertEqual(graph.topological_order, ["3", "1", "2"])
+        self.assertEqual(graph.ancestors("1"), ["2"])
+        self.assertEqual(graph.consumers_of("99"), [("3", "x", 0)])
+
+    def test_parse_wrappers(self):
+        """测试 {"prompt": "<json>"}、{"workflow": {...}} 和 JSON 字符串"""
+        nodes = small_workflow()
+        self.assertEqual(parse_workflow({"prompt": json.dumps(nodes)}), nodes)
+        self.assertEqual(parse_workflow({"workflow": nodes}), nodes)
+        self.assertEqual(parse_workflow(json.dumps(nodes)), nodes)
+        # 名为 prompt 的节点ID不是包装
+        wrapped_like = {"prompt": node("CLIPTextEncode", text="hi")}
+        self.assertEqual(parse_workflow(wrapped_like), wrapped_like)
+
+
+class TestGraphCache(unittest.TestCase):
+    """测试按版本缓存"""
+
+    def setUp(self):
+        workflow_graph._graphs.clear()
+
+    def test_built_once_per_version(self):
+        nodes = small_workflow()
+        graph = get_workflow_graph(nodes, version="v1")
+        self.assertIs(get_workflow_graph(nodes, version="v1"), graph)
+        self.assertIsNot(get_workflow_graph(nodes, version="v2"), graph)
+        # 未提供版本时按内容哈希，内容相同共享同一个图
+        self.assertIs(get_workflow_graph(small_workflow()), get_workflow_graph(small_workflow()))
+
+    def test_lru_limit(self):
+        for i in range(workflow_graph.MAX_GRAPHS + 5):
+            get_workflow_graph({}, version=str(i))
+        self.assertEqual(len(workflow_graph._graphs), workflow_graph.MAX_GRAPHS)
+        self.assertNotIn("0", workflow_graph._graphs)
+
+
+class TestAnalyzeWorkflowNodes(unittest.TestCase):
+    """测试 ConfigManager 使用图索引识别输入节点"""
+
+    def test_analyze(self):
+        workflow = small_workflow()
+        workflow["6"] = node("CLIPTextEncode", text="a cat", clip=["1", 0])
+        workflow["7"] = node("LoadImage", image="b.png")
+        result = ConfigManager("test-key").analyze_workflow_nodes(workflow, version="analyze")
+        # 与原逐节点扫描一致：按字段名匹配时，连接了图片的节点同样归入 image
+        self.assertEqual([(n.node_id, n.field_name) for n in result["image"]],
+                         [("1", "image"), ("2", "image"), ("5", "images"), ("7", "image")])
+        self.assertEqual([(n.node_id, n.field_name) for n in result["text"]], [("6", "text")])
+        self.assertEqual(result["video"], [])
+
+    def test_content_keyed(self):
+        """测试未传版本时按内容缓存：同一工作流ID刷新后内容变化，分析结果随之变化"""
+        manager = ConfigManager("test-key")
+        workflow = small_workflow()
+        self.assertEqual(len(manager.analyze_workflow_nodes(workflow)["image"]), 3)
+        workflow["7"] = node("LoadImage", image="b.png")
+        self.assertEqual(len(manager.analyze_workflow_nodes(workflow)["image"]), 4)
+
+    def test_version_from_cache(self):
+        """测试 get_workflow_json_with_version 返回的 etag 作为版本，同一内容只构建一次图"""
+        manager = ConfigManager("test-key")
+        manager._fetch_workflow_json = lambda _: {"code": 0, "data": {"prompt": json.dumps(small_workflow())}}
+        cache = WorkflowCache(cache_dir=self.tmp.name)
+        with mock.patch("config_manager.get_workflow_cache", return_value=cache):
+            workflow, version = manager.get_workflow_json_with_version("wf")
+        self.assertEqual(version, cache.etag("wf", account=account_id("test-key")))
+        workflow_graph._graphs.clear()
+        manager.analyze_workflow_nodes(workflow, version=version)
+        self.assertEqual(list(workflow_graph._graphs), [version])
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -2,6 +2,7 @@ import requests
 import json
 import os
 import time
+from .upload_cache import get_upload_cache # <<< Content-addressed upload dedup shared by all uploaders
 
 # Try importing folder_paths safely
 try:
@@ -67,6 +68,14 @@ class RH_AudioUploader:
         except Exception as e:
             raise FileNotFoundError(f"Error finding audio file '{audio}': {e}")
 
+        # <<< Files already uploaded with identical content are not sent again >>>
+        upload_cache = get_upload_cache()
+        digest = upload_cache.hash_file(audio_path)
+        cached_filename = upload_cache.get(digest, apiKey, 'audio')
+        if cached_filename:
+            print(f"RH_AudioUploader: Same content already uploaded (sha256 {digest[:12]}...), reusing: {cached_filename}")
+            return (cached_filename,)
+
         # 3. Prepare for RunningHub API upload
         upload_api_url = f"{baseUrl}/task/openapi/upload" # Using the same endpoint as image/video
         headers = {
@@ -132,4 +141,5 @@ class RH_AudioUploader:
             raise ValueError("Upload succeeded but 'fileName' not found in RunningHub API response.data.")
 
         print(f"RH_AudioUploader: Upload successful. RunningHub filename/ID: {uploaded_filename}")
+        upload_cache.put(digest, apiKey, 'audio', uploaded_filename, size=os.path.getsize(audio_path))
         return (uploaded_filename,) 
\ No newline at end of file
@@ -6,13 +6,20 @@ from io import BytesIO
 import numpy as np
 import torch
 import os
-import websocket  # Requires websocket-client package
 import threading
+from concurrent.futures import ThreadPoolExecutor # <<< Concurrent output downloads
 import comfy.utils # Import comfy utils for ProgressBar
 import cv2 # <<< Added import for OpenCV
-import safetensors.torch # <<< Added safetensors import
 import torchaudio 
-import torch.nn.functional as F # <<< Add F for padding
+from .admission import get_admission_scheduler # <<< Machine-wide concurrency slots
+from .workflow_cache import get_workflow_cache # <<< Shared workflow JSON cache
+from .task_store import get_task_store, account_id # <<< Durable task records for crash recovery
+from .upload_cache import get_upload_cache # <<< Resolves uploaded fileNames to content hashes
+from .result_cache import get_result_cache, result_key # <<< Opt-in memoization of identical runs
+from .image_batch import assemble_image_batch # <<< Preallocated batch assembly shared with RH_BatchImages
+from .ws_multiplexer import get_ws_multiplexer, logger as ws_logger # <<< One shared I/O loop for all progress sockets
+from .latent_cache import get_latent_cache, load_latent # <<< URL-keyed latent cache, memory-mapped loading
+from .audio_decode import decode_audio, av as pyav # <<< Streamed audio decode into a preallocated buffer
 
 # Try importing ComfyUI video classes safely
 try:
@@ -45,8 +52,26 @@ except ImportError:
     print("ComfyUI folder_paths not found. Some features like specific output paths might use fallbacks.")
 
 
+# <<< One pooled HTTP session for all output downloads; connections are reused across files and tasks
+_output_session = None
+_output_session_lock = threading.Lock()
+
+
+def get_output_session():
+    global _output_session
+    with _output_session_lock:
+        if _output_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=ExecuteNode.OUTPUT_DOWNLOAD_WORKERS * 2)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _output_session = session
+        return _output_session
+
+
 class ExecuteNode:
     ESTIMATED_TOTAL_NODES = 10 # Default estimate
+    OUTPUT_DOWNLOAD_WORKERS = 4 # <<< Concurrent output file downloads per task
 
     def __init__(self):
         self.ws = None
@@ -55,7 +80,9 @@ class ExecuteNode:
         self.executed_nodes = set()
         self.prompt_tips = "{}"
         self.pbar = None
-        self.node_lock = threading.Lock()
+        # <<< Condition rather than a plain lock: WS handlers, the status poller and the timeout notify it,
+        # and process() blocks on it instead of waking up every 100 ms to check flags
+        self.node_lock = threading.Condition()
         self.total_nodes = None
         self.current_steps = 0 # Track current steps for logging
 
@@ -96,6 +123,7 @@ class ExecuteNode:
             print(f"Finalizing progress: Setting task_completed = True")
             # --- Set completion flag FIRST ---
             self.task_completed = True
+            self.node_lock.notify_all() # Wake the monitoring wait in process()
 
             # --- Update progress bar to final state --- 
             if self.pbar:
@@ -122,6 +150,18 @@ class ExecuteNode:
                 "concurrency_limit": ("INT", {"default": 1, "min": 1, "max": 100}), # Restored min/max
                 "is_webapp_task": ("BOOLEAN", {"default": False}),
                 "use_rtx4090_48g": ("BOOLEAN", {"default": False}),
+                # <<< off: always run; use: reuse outputs of an identical earlier run; refresh: run again and overwrite the cached outputs
+                "result_cache": (["off", "use", "refresh"], {"default": "off"}),
+                # <<< video_frames extraction: keep every Nth frame, cap the count (0 = all), resize (0 = keep; one side 0 keeps aspect)
+                "frame_stride": ("INT", {"default": 1, "min": 1, "max": 1000}),
+                "max_frames": ("INT", {"default": 0, "min": 0, "max": 100000}),
+                "frame_width": ("INT", {"default": 0, "min": 0, "max": 8192}),
+                "frame_height": ("INT", {"default": 0, "min": 0, "max": 8192}),
+                # <<< audio output: resample to this rate (0 = keep) and keep at most this many seconds (0 = all)
+                "audio_sample_rate": ("INT", {"default": 0, "min": 0, "max": 192000}),
+                "audio_max_seconds": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 86400.0, "step": 0.1}),
+                # <<< Explicit recovery: reattach to an identical run left unfinished by a crash or timeout instead of creating a new task
+                "resume_unfinished": ("BOOLEAN", {"default": False}),
             },
         }
 
@@ -144,8 +184,7 @@ class ExecuteNode:
                  return
 
             # --- Safely handle message decoding and JSON parsing ---
-            print(f"--- Raw WS Message Received ---")
-            
+            # <<< Per-message output goes through ws_logger at DEBUG (lazy formatting, off by default)
             # Handle different message types (string, bytes, etc.)
             processed_message = None
             if isinstance(message, bytes):
@@ -153,7 +192,7 @@ class ExecuteNode:
                 for encoding in ['utf-8', 'utf-16', 'latin-1']:
                     try:
                         processed_message = message.decode(encoding)
-                        print(f"Successfully decoded bytes message using {encoding}")
+                        ws_logger.debug("Decoded bytes message using %s", encoding)
                         break
                     except UnicodeDecodeError:
                         continue
@@ -172,7 +211,6 @@ class ExecuteNode:
             data = None
             try:
                 data = json.loads(processed_message)
-                print(json.dumps(data, indent=2, ensure_ascii=False))
             except json.JSONDecodeError as e:
                 print(f"Warning: Could not parse message as JSON: {e}")
                 print(f"Raw message content (first 200 chars): {processed_message[:200]}")
@@ -186,16 +224,14 @@ class ExecuteNode:
                     if json_match:
                         potential_json = json_match.group(0)
                         data = json.loads(potential_json)
-                        print("Successfully extracted JSON from mixed content")
-                        print(json.dumps(data, indent=2, ensure_ascii=False))
+                        ws_logger.debug("Extracted JSON from mixed content: %s", potential_json)
                     else:
                         print("No JSON pattern found in message, skipping...")
                         return
                 except Exception as extract_e:
                     print(f"Failed to extract JSON from message: {extract_e}")
                     return
-                    
-            print(f"-----------------------------")
+
             # --- End safe message processing ---
 
             if data is None:
@@ -218,15 +254,15 @@ class ExecuteNode:
                     
                     if is_new_node:
                          self.update_progress() # This method is guarded internally
-                         print(f"WS ({message_type}): Node {node_id} reported.")
+                         ws_logger.info("WS (%s): Node %s reported.", message_type, node_id)
                     else:
-                         print(f"WS ({message_type}): Node {node_id} reported again (ignored for progress).")
+                         ws_logger.debug("WS (%s): Node %s reported again (ignored for progress).", message_type, node_id)
                 elif message_type == "executing" and node_id is None: # Null node signal
-                    print("WS (executing): Received null node signal, potentially end of execution phase.")
+                    ws_logger.info("WS (executing): Received null node signal, potentially end of execution phase.")
                 elif message_type == "execution_success" and node_id is None:
                     # If execution_success doesn't have a node_id, what does it mean?
                     # Log it for now, DO NOT call complete_progress.
-                    print(f"WS (execution_success): Received signal without node_id. Data: {node_data}")
+                    ws_logger.info("WS (execution_success): Received signal without node_id. Data: %s", node_data)
                     # self.complete_progress() # <<< REMOVED - This was incorrect based on user feedback
 
             # Handle other message types if necessary (e.g., specific overall error messages)
@@ -240,7 +276,7 @@ class ExecuteNode:
             #             self.task_completed = True
             
             else:
-                 print(f"WS: Received unhandled message type '{message_type}': {data}")
+                 ws_logger.debug("WS: Received unhandled message type '%s': %s", message_type, data)
 
         except UnicodeDecodeError as e:
             print(f"Error: WebSocket message encoding issue: {e}")
@@ -264,6 +300,7 @@ class ExecuteNode:
                     if not self.task_completed:
                         if self.ws_error is None:
                             self.ws_error = e
+                            self.node_lock.notify_all()
                         # Don't necessarily mark completed here, let polling confirm final state
                         # self.task_completed = True
             else:
@@ -301,20 +338,83 @@ class ExecuteNode:
         # Note: executed_nodes should be cleared at the start of 'process'
 
     def connect_websocket(self, wss_url):
-        """Establish WebSocket connection"""
+        """Establish WebSocket connection on the process-wide multiplexer (no thread per node)"""
         print(f"Connecting to WebSocket: {wss_url}")
-        websocket.enableTrace(False) # Keep this false unless debugging WS protocol
-        self.ws = websocket.WebSocketApp(
+        # <<< The multiplexer reconnects with backoff and reports a final drop via on_ws_error ("connection lost ...")
+        self.ws = get_ws_multiplexer().connect(
             wss_url,
             on_message=self.on_ws_message,
             on_error=self.on_ws_error,
             on_close=self.on_ws_close,
             on_open=self.on_ws_open
         )
-        ws_thread = threading.Thread(target=self.ws.run_forever, name="RH_ExecuteNode_WSThread")
-        ws_thread.daemon = True
-        ws_thread.start()
-        print("WebSocket thread started.")
+
+    def finish_monitoring(self, error=None):
+        """Marks the task finished (optionally with an error) and wakes the monitoring wait in process()."""
+        with self.node_lock:
+            if self.task_completed:
+                return False
+            # Keep an earlier, more specific error
+            if error is not None and self.ws_error is None:
+                self.ws_error = error
+            self.task_completed = True
+            self.node_lock.notify_all()
+            return True
+
+    def start_status_poller(self, task_id, api_key, base_url, interval=5):
+        """
+        Polls the task status over HTTP every `interval` seconds on its own thread, as a fallback for the WebSocket.
+        Terminal results are reported through finish_monitoring(). Returns an Event that stops the poller.
+        """
+        stop = threading.Event()
+        task_store = get_task_store()
+
+        def finish(error=None):
+            # A result that arrives after the poller was stopped belongs to a finished run; the node may already
+            # be monitoring a new task, so it must not be signalled (node_lock is reentrant)
+            with self.node_lock:
+                if not stop.is_set():
+                    self.finish_monitoring(error)
+
+        def poll():
+            # Event.wait sleeps without CPU use and returns early as soon as the poller is stopped
+            while not stop.wait(interval):
+                print(f"Polling HTTP status for task {task_id}...")
+                try:
+                    status_result = self.check_task_status(task_id, api_key, base_url)
+
+                    # Analyze polling result
+                    if isinstance(status_result, list): # Task completed successfully
+                        print(f"Polling detected task {task_id} completed successfully.")
+                        finish()
+                    elif isinstance(status_result, dict):
+                        polled_status = status_result.get("taskStatus")
+                        if polled_status == "error":
+                            error_msg = status_result.get('error', 'Unknown error reported by polling')
+                            print(f"Polling detected task {task_id} failed: {error_msg}")
+                            task_store.record_status(task_id, "FAILED")
+                            finish(Exception(f"Task failed (polled): {error_msg}"))
+                        elif polled_status == "completed_no_output":
+                            print(f"Polling detected task {task_id} completed with no output. Setting completion flag.")
+                            task_store.record_status(task_id, "SUCCESS")
+                            finish(Exception("Task completed successfully but the workflow produced no output results. Possible reasons: 1) Workflow is configured to execute but has no output nodes; 2) Output nodes are disabled; 3) Workflow logic resulted in no final output"))
+                        elif polled_status in ["RUNNING", "QUEUED"]:
+                            print(f"Polling: Task {task_id} is still {polled_status}.")
+                            task_store.record_status(task_id, polled_status)
+                        else:
+                            print(f"Polling: Received unexpected status '{polled_status}' for task {task_id}.")
+                    else:
+                        print(f"Polling: Received unexpected result type for task {task_id}: {type(status_result)}")
+                except Exception as poll_e:
+                    # Don't stop on a single polling error, it may be transient. WS might still be active.
+                    print(f"Warning: Error during periodic status polling for task {task_id}: {poll_e}")
+
+                with self.node_lock:
+                    if self.task_completed:
+                        return
+
+        threading.Thread(target=poll, name="RH_ExecuteNode_StatusPoller", daemon=True).start()
+        return stop
 
     def check_and_complete_task(self):
         """If task times out after null node, force completion."""
@@ -324,6 +424,21 @@ class ExecuteNode:
 
     def get_workflow_node_count(self, api_key, base_url, workflow_id):
         """Get the total number of nodes from workflow JSON."""
+        # <<< Served from the shared workflow cache; stale entries are refreshed in the background >>>
+        workflow_data = get_workflow_cache().get(
+            workflow_id,
+            fetch_fn=lambda wid: self.fetch_workflow_json(api_key, base_url, wid),
+            account=account_id(api_key) # <<< Entries are per account, never shared across API keys
+        )
+        if workflow_data is None:
+            raise Exception(f"Failed to get workflow JSON for {workflow_id}")
+
+        node_count = len(workflow_data)
+        print(f"Workflow contains {node_count} nodes")
+        return node_count
+
+    def fetch_workflow_json(self, api_key, base_url, workflow_id):
+        """Fetch the raw getJsonApiFormat response. Includes retry mechanism."""
         url = f"{base_url}/api/openapi/getJsonApiFormat"
         headers = {
             "Content-Type": "application/json",
@@ -337,12 +452,11 @@ class ExecuteNode:
         max_retries = 5
         retry_delay = 1
         last_exception = None
-        node_count = None
 
         for attempt in range(max_retries):
             response = None
             try:
-                print(f"Attempt {attempt + 1}/{max_retries} to get workflow node count...")
+                print(f"Attempt {attempt + 1}/{max_retries} to get workflow JSON...")
                 response = requests.post(url, json=data, headers=headers, timeout=30)
                 response.raise_for_status()
 
@@ -351,19 +465,12 @@ class ExecuteNode:
                 if result.get("code") != 0:
                     api_msg = result.get('msg', 'Unknown API error')
                     print(f"API error on attempt {attempt + 1}: {api_msg}")
-                    raise Exception(f"API error getting workflow node count: {api_msg}")
+                    raise Exception(f"API error getting workflow JSON: {api_msg}")
 
-                workflow_json = result.get("data", {}).get("prompt")
-                if not workflow_json:
+                if not result.get("data", {}).get("prompt"):
                     raise Exception("No workflow data found in response")
 
-                # Parse the workflow JSON
-                workflow_data = json.loads(workflow_json)
-                
-                # Count the number of nodes
-                node_count = len(workflow_data)
-                print(f"Workflow contains {node_count} nodes")
-                return node_count
+                return result
 
             except (requests.exceptions.RequestException, json.JSONDecodeError, ValueError, Exception) as e:
                 print(f"Error on attempt {attempt + 1}/{max_retries}: {e}")
@@ -376,14 +483,16 @@ class ExecuteNode:
                     time.sleep(retry_delay)
                     retry_delay *= 2
                 else:
-                    print("Max retries reached for getting workflow node count.")
-                    raise Exception(f"Failed to get workflow node count after {max_retries} attempts. Last error: {last_exception}") from last_exception
+                    print("Max retries reached for getting workflow JSON.")
+                    raise Exception(f"Failed to get workflow JSON after {max_retries} attempts. Last error: {last_exception}") from last_exception
 
         # This should ideally not be reached if the loop logic is correct
-        raise Exception(f"Failed to get workflow node count after {max_retries} attempts (unexpected loop end). Last error: {last_exception}")
+        raise Exception(f"Failed to get workflow JSON after {max_retries} attempts (unexpected loop end). Last error: {last_exception}")
 
     # --- Main Process Method ---
-    def process(self, apiConfig, nodeInfoList=None, run_timeout=600, concurrency_limit=1, is_webapp_task=False, use_rtx4090_48g=False):
+    def process(self, apiConfig, nodeInfoList=None, run_timeout=600, concurrency_limit=1, is_webapp_task=False, use_rtx4090_48g=False, result_cache="off",
+                frame_stride=1, max_frames=0, frame_width=0, frame_height=0, audio_sample_rate=0, audio_max_seconds=0.0,
+                resume_unfinished=False):
         # Reset state
         with self.node_lock: # Use lock for resetting shared state
             self.executed_nodes.clear()
@@ -392,6 +501,10 @@ class ExecuteNode:
             self.prompt_tips = "{}"
             self.current_steps = 0 # Reset step counter
 
+        frame_options = {"frame_stride": frame_stride, "max_frames": max_frames,
+                         "target_width": frame_width, "target_height": frame_height}
+        audio_options = {"sample_rate": audio_sample_rate, "max_seconds": audio_max_seconds}
+
         # Get config values
         api_key = apiConfig.get("apiKey")
         base_url = apiConfig.get("base_url")
@@ -444,27 +557,37 @@ class ExecuteNode:
         self.pbar = comfy.utils.ProgressBar(self.total_nodes)
         print("Progress bar initialized at 0")
 
+        # --- Result Cache ---
+        # <<< Key covers the workflow/webapp ID, the normalized nodeInfoList and the content hashes of uploaded inputs,
+        # so a hit returns the earlier outputs without creating (and paying for) a new task >>>
+        cache_key = None
+        if result_cache != "off":
+            cache_key = result_key(
+                f"webapp:{retrieved_workflow_id}" if is_webapp_task else retrieved_workflow_id,
+                nodeInfoList or [],
+                resolve=lambda name: get_upload_cache().digest_for(name, api_key)
+            )
+            hit = get_result_cache().get(cache_key) if result_cache == "use" else None
+            if hit is not None:
+                print(f"Result cache hit: reusing outputs of task {hit['taskId']} without creating a new task.")
+                self.complete_progress()
+                return self.process_task_output(hit["taskId"], api_key, base_url, cached_outputs=hit["outputs"],
+                                                frame_options=frame_options, audio_options=audio_options)
+
         # --- Concurrency Check ---
-        # api_key and base_url are already validated
+        # <<< Slots are handed out by a machine-wide admission scheduler shared with other ComfyUI
+        # workers and the Flask app; accountStatus is only polled for periodic reconciliation. >>>
         try:
-            account_status = self.check_account_status(api_key, base_url)
-            current_tasks = int(account_status["currentTaskCounts"])
-            print(f"There are {current_tasks} tasks running")
-            
-            if current_tasks >= concurrency_limit:  
-                print(f"Concurrency limit ({concurrency_limit}) reached, waiting...")
-                start_wait_time = time.time()
-                # Use a shorter sleep interval while waiting for concurrency
-                wait_interval = 2 # seconds
-                while current_tasks >= concurrency_limit:
-                    if time.time() - start_wait_time > run_timeout:
-                        if self.pbar: self.pbar.update_absolute(1.0) # Use absolute directly for setup failure
-                        raise Exception(f"Timeout waiting for concurrent tasks ({current_tasks}/{concurrency_limit}) to finish.")
-                    print(f"Waiting for concurrent tasks... ({current_tasks}/{concurrency_limit})")
-                    time.sleep(wait_interval) 
-                    account_status = self.check_account_status(api_key, base_url)
-                    current_tasks = int(account_status["currentTaskCounts"])
-                print("Concurrency slot available.")
+            scheduler = get_admission_scheduler(api_key) # <<< One scheduler per account; the fetch below is per call
+            print(f"Requesting concurrency slot (limit {concurrency_limit})...")
+            admission_slot = scheduler.acquire(
+                limit=concurrency_limit, timeout=run_timeout,
+                fetch_remote_count=lambda: self.check_account_status(api_key, base_url)["currentTaskCounts"]
+            )
+            print("Concurrency slot available.")
+        except TimeoutError as e:
+            if self.pbar: self.pbar.update_absolute(1.0) # Use absolute directly for setup failure
+            raise Exception(f"Timeout waiting for concurrent tasks to finish: {e}")
         except Exception as e:
              print(f"Error checking account status or waiting: {e}")
              if self.pbar: self.pbar.update_absolute(1.0) # Use absolute directly for setup failure
@@ -473,11 +596,21 @@ class ExecuteNode:
         # --- Task Creation & WebSocket ---
         task_id = None
         wss_url = None # <<< Initialize wss_url
+        task_store = get_task_store()
+        account = account_id(api_key)
         try:
             print(f"ExecuteNode NodeInfoList: {nodeInfoList}")
 
+            # <<< Only when asked: identical inputs are otherwise separate runs (e.g. random seeds) >>>
+            resumed_task = None
+            if resume_unfinished:
+                resumed_task = task_store.find_unfinished(retrieved_workflow_id, nodeInfoList or [], account=account)
+
             # <<< Decide which creation function to call >>>
-            if is_webapp_task:
+            if resumed_task:
+                print(f"Resuming unfinished task {resumed_task['taskId']} (status {resumed_task['status']}) instead of creating a new one.")
+                task_creation_result = {"code": 0, "data": {"taskId": resumed_task["taskId"], "taskStatus": "QUEUED"}}
+            elif is_webapp_task:
                 # Call AI App Task creation, passing the retrieved ID as webappId
                 webappId_to_pass = retrieved_workflow_id # Use the ID from config
                 # Update print log message
@@ -505,6 +638,9 @@ class ExecuteNode:
                  raise ValueError("Missing taskId in task creation response.")
 
             print(f"Task created, taskId: {task_id}, Initial Status: {initial_status}")
+            if not resumed_task:
+                task_store.record_created(task_id, retrieved_workflow_id, nodeInfoList or [], account=account,
+                                          source="comfyui", status=initial_status or "QUEUED")
 
             # --- Handle QUEUED state ---
             if initial_status == "QUEUED" and not wss_url:
@@ -524,6 +660,7 @@ class ExecuteNode:
                     if current_status == "RUNNING":
                         # Task is running, try to get WSS URL from status check
                         wss_url = status_result.get("netWssUrl")
+                        task_store.record_status(task_id, "RUNNING")
                         if wss_url:
                             print(f"Task {task_id} is RUNNING. WebSocket URL obtained: {wss_url}")
                             break # Exit queue polling loop
@@ -533,6 +670,7 @@ class ExecuteNode:
                             # Keep polling, maybe the URL will appear shortly
                     elif current_status == "error":
                          error_msg = status_result.get('error', 'Unknown error during queue polling')
+                         task_store.record_status(task_id, "FAILED")
                          raise Exception(f"Task {task_id} failed while in queue: {error_msg}")
                     elif isinstance(status_result, list): # Task completed while polling queue status
                          print(f"Task {task_id} completed while polling queue status. Skipping WebSocket connection.")
@@ -560,116 +698,29 @@ class ExecuteNode:
 
         except Exception as e:
              print(f"Error during task creation, queue polling, or WS connection: {e}")
+             admission_slot.release()
              if self.pbar: self.pbar.update_absolute(1.0) # Use absolute directly for setup failure
              raise
 
-        # --- Task Monitoring Loop ---
-        task_start_time = time.time()
-        loop_sleep_interval = 0.1 # Short sleep for responsiveness
+        # --- Task Monitoring ---
+        # <<< Event driven: WS handlers and the HTTP status poller signal node_lock, and the wait's timeout is the
+        # global run_timeout, so this thread sleeps until something actually happens >>>
         poll_status_interval = 5 # Poll HTTP status every 5 seconds
-        last_poll_time = time.time() # Track last poll time
-        print("Starting task monitoring loop...")
+        print("Starting task monitoring...")
 
-        timeout_timer = None
+        stop_poller = None
         final_error = None # <<< Define final_error outside try/finally
 
         try:
-            # Setup global timeout timer
-            def force_timeout():
-                # Use lock to safely check task_completed
-                with self.node_lock:
-                     is_completed = self.task_completed
-                if not is_completed:
-                    print("Global timeout reached - forcing task completion.")
-                    # Use lock to set error safely
-                    with self.node_lock:
-                        # Check if ws_error is already set to avoid overwriting a more specific WS error
-                        if self.ws_error is None:
-                             self.ws_error = Exception("Global timeout reached")
-                        # Just set the flags here to break loop
-                        self.task_completed = True # Set flag directly here to break loop
-
-            timeout_timer = threading.Timer(run_timeout, force_timeout)
-            timeout_timer.daemon = True
-            timeout_timer.start()
+            stop_poller = self.start_status_poller(task_id, api_key, base_url, interval=poll_status_interval)
 
-            # Main wait loop
-            while True: # <<< Modified loop structure
-                # 1. Check completion flags (set by WS handlers or polling)
-                with self.node_lock:
-                     is_completed = self.task_completed
-                     current_error = self.ws_error
-                if is_completed or current_error:
-                     print(f"Loop Exit: Task Completed={is_completed}, Error Present={current_error is not None}")
-                     break # Exit loop if completed or error occurred via WS or polling
-
-                # 2. Check for global timeout explicitly
-                if time.time() - task_start_time > run_timeout:
-                     print("Task monitoring loop timeout check triggered.")
-                     with self.node_lock:
-                         if not self.task_completed: # Avoid overwriting specific error
-                            if self.ws_error is None:
-                                self.ws_error = Exception(f"Timeout: Task {task_id} did not complete within {run_timeout} seconds.")
-                            self.task_completed = True # Ensure loop exit
-                     break # Exit loop
-
-                # 3. Periodic HTTP Status Polling (Robustness check)
-                current_time = time.time()
-                if current_time - last_poll_time >= poll_status_interval:
-                    print(f"Polling HTTP status for task {task_id}...")
-                    last_poll_time = current_time # Update last poll time
-                    try:
-                        # Call check_task_status (requires api_key, base_url)
-                        status_result = self.check_task_status(task_id, api_key, base_url)
-
-                        # Analyze polling result
-                        if isinstance(status_result, list): # Task completed successfully
-                             print(f"Polling detected task {task_id} completed successfully.")
-                             # Use lock to set flags safely
-                             with self.node_lock:
-                                 if not self.task_completed: # Avoid redundant completion if WS already handled it
-                                     self.task_completed = True
-                                     # No need to set ws_error if successful
-                             # Loop will break on next iteration due to task_completed flag
-                        elif isinstance(status_result, dict):
-                            polled_status = status_result.get("taskStatus")
-                            if polled_status == "error":
-                                error_msg = status_result.get('error', 'Unknown error reported by polling')
-                                print(f"Polling detected task {task_id} failed: {error_msg}")
-                                # Use lock to set flags safely
-                                with self.node_lock:
-                                     if not self.task_completed: # Check completion first
-                                         # Set error only if no other error is already present
-                                         if self.ws_error is None:
-                                             self.ws_error = Exception(f"Task failed (polled): {error_msg}")
-                                         self.task_completed = True # Mark as complete to exit loop
-                                # Loop will break on next iteration
-                            elif polled_status == "completed_no_output":
-                                print(f"Polling detected task {task_id} completed with no output. Setting completion flag.")
-                                # Use lock to set flags safely
-                                with self.node_lock:
-                                     if not self.task_completed: # Check completion first
-                                         # Set specific error for no output case
-                                         if self.ws_error is None:
-                                             self.ws_error = Exception("Task completed successfully but the workflow produced no output results. Possible reasons: 1) Workflow is configured to execute but has no output nodes; 2) Output nodes are disabled; 3) Workflow logic resulted in no final output")
-                                         self.task_completed = True # Mark as complete to exit loop
-                                # Loop will break on next iteration
-                            elif polled_status in ["RUNNING", "QUEUED"]:
-                                print(f"Polling: Task {task_id} is still {polled_status}.")
-                                # Optionally check for netWssUrl again if needed, but primary goal is status check
-                            else:
-                                print(f"Polling: Received unexpected status '{polled_status}' for task {task_id}.")
-                        else:
-                             print(f"Polling: Received unexpected result type for task {task_id}: {type(status_result)}")
-
-                    except Exception as poll_e:
-                        # Don't necessarily stop the whole process on a single polling error,
-                        # maybe it's transient. Log it. WS might still be active.
-                        print(f"Warning: Error during periodic status polling for task {task_id}: {poll_e}")
-                        # Consider adding a counter to stop polling after too many errors?
-
-                # 4. Yield CPU
-                time.sleep(loop_sleep_interval)
+            with self.node_lock:
+                finished = self.node_lock.wait_for(lambda: self.task_completed or self.ws_error is not None,
+                                                   timeout=run_timeout)
+                print(f"Monitoring Exit: Task Completed={self.task_completed}, Error Present={self.ws_error is not None}")
+            if not finished:
+                print("Global timeout reached - forcing task completion.")
+                self.finish_monitoring(Exception(f"Timeout: Task {task_id} did not complete within {run_timeout} seconds."))
 
             # Handle exit conditions after loop
             with self.node_lock: # Read error flag safely
@@ -686,8 +737,9 @@ class ExecuteNode:
 
         finally: # <<< Existing finally clause remains
             # Cleanup
-            if timeout_timer:
-                timeout_timer.cancel()
+            admission_slot.release() # <<< Task has left the account's running set
+            if stop_poller:
+                stop_poller.set()
             if self.ws:
                 try:
                     self.ws.close()
@@ -705,10 +757,18 @@ class ExecuteNode:
         # --- Process Output ---
         print("Processing task output...")
         # Pass the validated api_key and base_url again
-        return self.process_task_output(task_id, api_key, base_url)
-
-    def process_task_output(self, task_id, api_key, base_url):
-        """Handles task output, separating images, video frames, audio, etc."""
+        output = self.process_task_output(task_id, api_key, base_url, frame_options=frame_options, audio_options=audio_options)
+        if cache_key:
+            record = task_store.get(task_id) # <<< process_task_output has recorded the output list
+            if record and record["outputs"]:
+                get_result_cache().put(cache_key, retrieved_workflow_id, task_id, record["outputs"])
+        return output
+
+    def process_task_output(self, task_id, api_key, base_url, cached_outputs=None, frame_options=None, audio_options=None):
+        """Handles task output, separating images, video frames, audio, etc.
+        cached_outputs: output list from the result cache; used instead of querying the task.
+        frame_options: keyword arguments for download_video (stride, max frames, target size).
+        audio_options: keyword arguments for download_and_process_audio (sample rate, max seconds)."""
         max_retries = 30
         retry_interval = 1
         max_retry_interval = 5
@@ -725,11 +785,15 @@ class ExecuteNode:
         for attempt in range(max_retries):
             task_status_result = None
             try:
-                task_status_result = self.check_task_status(task_id, api_key, base_url)
+                if cached_outputs:
+                    task_status_result = cached_outputs # <<< Cached results skip the outputs API entirely
+                else:
+                    task_status_result = self.check_task_status(task_id, api_key, base_url)
                 print(f"Check output attempt {attempt + 1}/{max_retries}")
 
                 # Handle completed task with no output - immediate exception
                 if isinstance(task_status_result, dict) and task_status_result.get("taskStatus") == "completed_no_output":
+                    get_task_store().record_status(task_id, "SUCCESS")
                     raise Exception("Task completed successfully but the workflow produced no output results. Possible reasons: 1) Workflow is configured to execute but has no output nodes; 2) Output nodes are disabled; 3) Workflow logic resulted in no final output")
 
                 if isinstance(task_status_result, dict) and task_status_result.get("taskStatus") in ["RUNNING", "QUEUED"]:
@@ -752,6 +816,9 @@ class ExecuteNode:
 
                 if isinstance(task_status_result, list) and len(task_status_result) > 0:
                     print("Got valid output result, processing files...")
+                    task_store = get_task_store() # <<< Outputs are kept so a crashed run's results can be found again
+                    task_store.record_outputs(task_id, task_status_result)
+                    task_store.record_status(task_id, "SUCCESS")
                     consecutive_empty_results = 0  # Reset counter on successful result
                     image_urls = []
                     frame_video_urls = []  # For extracting frames from videos
@@ -781,166 +848,79 @@ class ExecuteNode:
                                 elif file_type_lower in ["wav", "mp3", "flac", "ogg"]: 
                                     audio_urls.append(file_url)
 
+                    # <<< Fetch every output concurrently on a bounded pool sharing one HTTP session.
+                    # Futures are kept in output order, so results are assembled deterministically and
+                    # a failed download only leaves its own slot empty. >>>
+                    skipped_frame_extraction = len(frame_video_urls) > 1 # Only extract frames if there's a single video
+                    max_videos = 5
+                    video_support = video_urls and video_support_available
+                    job_count = (len(image_urls) + (len(frame_video_urls) == 1) + bool(latent_urls) + bool(text_urls)
+                                 + bool(audio_urls) + (min(len(video_urls), max_videos) if video_support else 0))
+                    with ThreadPoolExecutor(max_workers=max(1, min(self.OUTPUT_DOWNLOAD_WORKERS, job_count)),
+                                            thread_name_prefix="RH_OutputFetch") as fetch_pool:
+                        image_futures = [(url, fetch_pool.submit(self.fetch_image, url)) for url in image_urls]
+                        frame_future = (fetch_pool.submit(self.download_video, frame_video_urls[0], **(frame_options or {}))
+                                        if len(frame_video_urls) == 1 else None)
+                        # Latent, text and audio keep the first file that loads; later URLs are only fallbacks
+                        latent_future = (fetch_pool.submit(self._first_loaded, self.download_and_load_latent, latent_urls, "latent")
+                                         if latent_urls and latent_data is None else None)
+                        text_future = (fetch_pool.submit(self._first_loaded, self.download_and_read_text, text_urls, "text file")
+                                       if text_urls and text_data is None else None)
+                        audio_loader = lambda url: self.download_and_process_audio(url, **(audio_options or {}))
+                        audio_future = (fetch_pool.submit(self._first_loaded, audio_loader, audio_urls, "audio file")
+                                        if audio_urls and audio_data is None else None)
+                        video_futures = ([(url, fetch_pool.submit(self.download_video_for_output, url)) for url in video_urls[:max_videos]]
+                                         if video_support else [])
+
                     # Process Images -> Add to image_data_list
                     if image_urls:
                         print(f"Processing {len(image_urls)} images...")
-                        # Download all images first
                         downloaded_images = []
-                        for url in image_urls:
+                        for url, future in image_futures:
                             try:
-                                img_tensor = self.download_image(url)
-                                if img_tensor is not None:
-                                    downloaded_images.append(img_tensor)
-                                    print(f"Successfully downloaded image from {url} (Shape: {img_tensor.shape})")
-                                # Remove the break to process all images
-                                # print(f"Successfully processed first image from {url}. Skipping remaining images.")
-                                # break # Process only the first image
+                                img = future.result()
+                                if img is not None:
+                                    downloaded_images.append(img)
+                                    print(f"Successfully downloaded image from {url} (Size: {img.width}x{img.height}, Mode: {img.mode})")
                             except Exception as img_e:
                                 print(f"Error downloading image {url}: {img_e}")
-                        
-                        # If images were downloaded, normalize channels and find max dimensions
+
+                        # <<< Decode every image straight into one [B, maxH, maxW, maxC] batch: smaller images are
+                        # centered with zero padding, RGB images in an RGBA batch get an opaque alpha channel >>>
                         if downloaded_images:
-                            if len(downloaded_images) > 1:
-                                print("Multiple images found. Normalizing channels and checking dimensions...")
-                                
-                                # Check channel counts and find max
-                                max_channels = 0
-                                max_h = 0
-                                max_w = 0
-                                for img in downloaded_images:
-                                    # Shape is [1, H, W, C]
-                                    max_h = max(max_h, img.shape[1])
-                                    max_w = max(max_w, img.shape[2])
-                                    max_channels = max(max_channels, img.shape[3])
-                                
-                                print(f"Max dimensions: Height={max_h}, Width={max_w}, Channels={max_channels}")
-
-                                # Normalize all images to same channel count and dimensions
-                                normalized_images = []
-                                for i, img_tensor in enumerate(downloaded_images):
-                                    _, h, w, c = img_tensor.shape
-                                    current_img = img_tensor
-                                    
-                                    # Normalize channels first
-                                    if c < max_channels:
-                                        if c == 3 and max_channels == 4:
-                                            # Add alpha channel (full opacity)
-                                            alpha_channel = torch.ones(1, h, w, 1, dtype=current_img.dtype, device=current_img.device)
-                                            current_img = torch.cat([current_img, alpha_channel], dim=3)
-                                            print(f"  Added alpha channel to image {i+1} (RGB->RGBA)")
-                                        else:
-                                            # General case: pad with zeros
-                                            padding_channels = max_channels - c
-                                            padding = torch.zeros(1, h, w, padding_channels, dtype=current_img.dtype, device=current_img.device)
-                                            current_img = torch.cat([current_img, padding], dim=3)
-                                            print(f"  Padded channels for image {i+1} from {c} to {max_channels}")
-                                    
-                                    # Then normalize spatial dimensions
-                                    if h < max_h or w < max_w:
-                                        pad_h_total = max_h - h
-                                        pad_w_total = max_w - w
-                                        pad_top = pad_h_total // 2
-                                        pad_bottom = pad_h_total - pad_top
-                                        pad_left = pad_w_total // 2
-                                        pad_right = pad_w_total - pad_left
-                                        
-                                        # Permute [1, H, W, C] -> [1, C, H, W] for F.pad
-                                        img_permuted = current_img.permute(0, 3, 1, 2)
-                                        # Pad spatial dimensions (pad is specified for last dimensions first: W, then H)
-                                        # For RGBA images, pad with 0 for RGB channels and 1 for alpha channel
-                                        if max_channels == 4:
-                                            # Pad RGB channels with 0, alpha channel with 0 (transparent)
-                                            padded_permuted = F.pad(img_permuted, (pad_left, pad_right, pad_top, pad_bottom), "constant", 0)
-                                        else:
-                                            padded_permuted = F.pad(img_permuted, (pad_left, pad_right, pad_top, pad_bottom), "constant", 0)
-                                        
-                                        # Permute back [1, C, H, W] -> [1, H, W, C]
-                                        padded_img = padded_permuted.permute(0, 2, 3, 1)
-                                        print(f"  Padded image {i+1} from {h}x{w} to {max_h}x{max_w}")
-                                        normalized_images.append(padded_img)
-                                    else:
-                                        print(f"  Image {i+1} already has max spatial dimensions.")
-                                        normalized_images.append(current_img)
-                                
-                                image_data_list = normalized_images
-                            else:
-                                # Only one image, no normalization needed, just use it
-                                print("Only one image found, no normalization needed.")
-                                image_data_list = downloaded_images
-                        # else: image_data_list remains empty
+                            image_data_list = [assemble_image_batch(downloaded_images, align="center", alpha_fill=1.0)]
+                            print(f"Image batch shape: {tuple(image_data_list[0].shape)}")
 
                     # Process Videos (extract frames) -> Add to frame_data_list
-                    # Only extract frames if there's a single video; skip for multiple videos to save time
-                    skipped_frame_extraction = False  # Flag to track if we skipped frame extraction
-                    if frame_video_urls:
-                        if len(frame_video_urls) > 1:
-                            print(f"Multiple videos detected ({len(frame_video_urls)}). Skipping frame extraction to save processing time.")
-                            print("video_frames output will show a placeholder image.")
-                            # Don't extract frames, will use placeholder later
-                            skipped_frame_extraction = True
-                        else:
-                            # Single video - extract frames as before
-                            print(f"Processing single video for frames...")
-                            for url in frame_video_urls:
-                                try:
-                                    frame_tensors = self.download_video(url)
-                                    if frame_tensors:
-                                        frame_data_list.extend(frame_tensors) # <<< Add to frame_data_list
-                                        print(f"Extracted {len(frame_tensors)} frames from video {url}")
-                                except Exception as vid_e:
-                                    print(f"Error processing video {url}: {vid_e}")
-
-                    # Process Latents (load the first one found)
-                    if latent_urls and latent_data is None:
-                        print(f"Processing {len(latent_urls)} latent file(s)...")
-                        for url in latent_urls:
-                             try:
-                                 loaded_latent = self.download_and_load_latent(url)
-                                 if loaded_latent is not None:
-                                     latent_data = loaded_latent
-                                     print(f"Successfully loaded latent from {url}")
-                                     break # Process only the first successful latent
-                             except Exception as lat_e:
-                                 print(f"Error processing latent {url}: {lat_e}")
-
-                    # Process Text Files (read the first one found)
-                    if text_urls and text_data is None:
-                        print(f"Processing {len(text_urls)} text file(s)...")
-                        for url in text_urls:
-                             try:
-                                 loaded_text = self.download_and_read_text(url)
-                                 if loaded_text is not None:
-                                     text_data = loaded_text
-                                     print(f"Successfully read text from {url}")
-                                     break # Process only the first successful text file
-                             except Exception as txt_e:
-                                 print(f"Error processing text file {url}: {txt_e}")
-
-                    # <<< Process Audio Files (load the first one found)
-                    if audio_urls and audio_data is None:
-                        print(f"Processing {len(audio_urls)} audio file(s)...")
-                        for url in audio_urls:
-                             try:
-                                 loaded_audio = self.download_and_process_audio(url)
-                                 if loaded_audio is not None:
-                                     audio_data = loaded_audio
-                                     print(f"Successfully processed audio from {url}")
-                                     break # Process only the first successful audio file
-                             except Exception as aud_e:
-                                 print(f"Error processing audio file {url}: {aud_e}")
-
-                    # <<< Process Video Files (download up to 5 mp4 files for VIDEO outputs)
+                    if skipped_frame_extraction:
+                        print(f"Multiple videos detected ({len(frame_video_urls)}). Skipping frame extraction to save processing time.")
+                        print("video_frames output will show a placeholder image.")
+                    elif frame_future is not None:
+                        try:
+                            frame_batch = frame_future.result()
+                            if frame_batch is not None:
+                                frame_data_list.append(frame_batch) # <<< Already one [N, H, W, C] batch
+                                print(f"Extracted {frame_batch.shape[0]} frames from video {frame_video_urls[0]}")
+                        except Exception as vid_e:
+                            print(f"Error processing video {frame_video_urls[0]}: {vid_e}")
+
+                    # Latent, text and audio: first successful file of each kind
+                    if latent_future is not None:
+                        latent_data = latent_future.result()
+                    if text_future is not None:
+                        text_data = text_future.result()
+                    if audio_future is not None:
+                        audio_data = audio_future.result()
+
+                    # <<< Process Video Files (up to 5 mp4 files for VIDEO outputs)
                     video_data_list = []  # Store up to 5 video objects
-                    if video_urls and video_support_available:
+                    if video_support:
                         num_videos = len(video_urls)
-                        max_videos = 5
-                        videos_to_process = min(num_videos, max_videos)
+                        print(f"Processing {len(video_futures)} mp4 video file(s) for VIDEO output (total found: {num_videos})...")
                         
-                        print(f"Processing {videos_to_process} mp4 video file(s) for VIDEO output (total found: {num_videos})...")
-                        
-                        for i, url in enumerate(video_urls[:max_videos]):  # Take only first 5
+                        for i, (url, future) in enumerate(video_futures):
                              try:
-                                 video_path = self.download_video_for_output(url)
+                                 video_path = future.result()
                                  if video_path is not None:
                                      video_obj = VideoFromFile(video_path)
                                      video_data_list.append(video_obj)
@@ -1045,8 +1025,9 @@ class ExecuteNode:
             print("No real videos generated, all 5 video outputs will use placeholders.")
 
         # Batch images and frames separately
-        final_image_batch = torch.cat(image_data_list, dim=0) if image_data_list else None
-        final_frame_batch = torch.cat(frame_data_list, dim=0) if frame_data_list else None # <<< Batch frames
+        final_image_batch = (image_data_list[0] if len(image_data_list) == 1 else torch.cat(image_data_list, dim=0)) if image_data_list else None
+        # <<< A single entry is already a batch; torch.cat would copy every frame once more
+        final_frame_batch = (frame_data_list[0] if len(frame_data_list) == 1 else torch.cat(frame_data_list, dim=0)) if frame_data_list else None
 
         # Ensure we return a tuple matching RETURN_TYPES
         # <<< Add audio_data to the return tuple
@@ -1201,6 +1182,19 @@ class ExecuteNode:
             print(f"Error creating placeholder video: {e}")
             return None
 
+    def _first_loaded(self, loader, urls, label):
+        """Try urls in order and return the first non-None result of loader (or None)."""
+        print(f"Processing {len(urls)} {label}(s)...")
+        for url in urls:
+            try:
+                loaded = loader(url)
+                if loaded is not None:
+                    print(f"Successfully loaded {label} from {url}")
+                    return loaded # Process only the first successful file
+            except Exception as e:
+                print(f"Error processing {label} {url}: {e}")
+        return None
+
     def download_image(self, image_url):
         """
         Download image from URL and convert to torch.Tensor format suitable for preview or save.
@@ -1208,20 +1202,28 @@ class ExecuteNode:
         Preserves PNG alpha channel (mask information).
         Returns tensor [1, H, W, C] or None on failure, where C=3 for RGB or C=4 for RGBA.
         """
+        img = self.fetch_image(image_url)
+        if img is None:
+            return None
+        img_tensor = assemble_image_batch([img]) # Shape: [1, H, W, C] where C=3 or 4
+        print(f"Final tensor shape: {img_tensor.shape}")
+        return img_tensor
+
+    def fetch_image(self, image_url):
+        """
+        Download and decode an image, retrying up to 5 times.
+        Returns a PIL image in RGBA mode (if it has alpha/transparency) or RGB mode, or None on failure.
+        Conversion to float happens later, directly into the batch tensor.
+        """
         max_retries = 5
         retry_delay = 1
-        last_exception = None
-        img_tensor = None # Define img_tensor outside try
 
         for attempt in range(max_retries):
             try:
-                response = requests.get(image_url, timeout=30)
+                response = get_output_session().get(image_url, timeout=30)
                 print(f"Download image attempt {attempt + 1} ({image_url}): Status code: {response.status_code}")
                 response.raise_for_status()
 
-                content_type = response.headers.get('Content-Type', '').lower()
-                # Consider validating content_type if needed
-
                 # Open image and preserve alpha channel if present
                 img = Image.open(BytesIO(response.content))
                 original_mode = img.mode
@@ -1236,35 +1238,44 @@ class ExecuteNode:
                     # Convert to RGB for images without alpha channel
                     img = img.convert("RGB")
                     print("Converting to RGB (no alpha channel)")
-                
-                img_array = np.array(img).astype(np.float32) / 255.0
-                img_tensor = torch.from_numpy(img_array)[None,] # Shape: [1, H, W, C] where C=3 or 4
-                print(f"Final tensor shape: {img_tensor.shape}")
-                return img_tensor # Return on success
+                return img # Return on success (convert() has fully decoded it)
 
-            except (requests.exceptions.RequestException, IOError, Image.UnidentifiedImageError) as e: # <<< Correct except clause
+            except (requests.exceptions.RequestException, IOError, Image.UnidentifiedImageError) as e:
                 print(f"Download image attempt {attempt + 1} failed: {e}")
-                last_exception = e
                 if attempt < max_retries - 1:
                     print(f"Retrying in {retry_delay} seconds...")
                     time.sleep(retry_delay)
                     retry_delay *= 2
-                # else: # <<< Implicitly handled by loop ending
-                #     print(f"Failed to download image {image_url} after {max_retries} attempts.")
-                #     # Keep img_tensor as None
 
         # If loop finishes without returning, it means all retries failed
         print(f"Failed to download image {image_url} after {max_retries} attempts.")
         return None
 
 
-    def download_video(self, video_url):
+    def download_video(self, video_url, frame_stride=1, max_frames=0, target_width=0, target_height=0):
         """
-        Downloads a video, extracts all frames, converts them to tensors,
-        deletes the video file, and returns a list of image tensors.
+        Extracts frames of a video into one preallocated float32 tensor [N, H, W, C].
+        The URL is decoded directly first, so decoding runs while the file is still downloading;
+        if that fails or ends early, the video is downloaded to a temp file (with retries) and decoded from disk.
         Requires opencv-python (cv2).
-        Returns list[torch.Tensor] or None on failure. Each tensor shape [1, H, W, C]. <<< Updated shape comment
+
+        frame_stride: keep every Nth frame; max_frames: cap on kept frames (0 = all);
+        target_width/target_height: resize frames (0 = keep; only one given keeps the aspect ratio).
+        Returns torch.Tensor [N, H, W, C] or None on failure.
         """
+        options = dict(frame_stride=max(1, int(frame_stride or 1)), max_frames=max(0, int(max_frames or 0)),
+                       target_width=int(target_width or 0), target_height=int(target_height or 0))
+
+        # --- Decode straight from the URL (download and decode overlap) ---
+        try:
+            frames, complete = self._decode_frames(video_url, **options)
+            if frames is not None and complete:
+                print(f"Decoded {frames.shape[0]} frames while streaming {video_url}")
+                return frames
+            print("Streaming decode unavailable or incomplete, falling back to downloading the file first.")
+        except Exception as e:
+            print(f"Streaming decode failed ({e}), falling back to downloading the file first.")
+
         max_retries = 5
         retry_delay = 1
         last_exception = None
@@ -1295,7 +1306,7 @@ class ExecuteNode:
                     video_path = os.path.join(output_dir, f"temp_video_{str(int(time.time()*1000))}.tmp")
 
                 print(f"Attempt {attempt + 1}/{max_retries} to download video to temp path: {video_path}")
-                response = requests.get(video_url, stream=True, timeout=60)
+                response = get_output_session().get(video_url, stream=True, timeout=60)
                 response.raise_for_status()
 
                 downloaded_size = 0
@@ -1342,41 +1353,17 @@ class ExecuteNode:
              return None
 
         # --- Extract frames if download was successful ---
-        frame_tensors = []
-        cap = None
+        frames = None
         try:
             print(f"Extracting frames from {video_path}...")
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
-                raise IOError(f"Cannot open video file: {video_path}")
-
-            frame_count = 0
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break # End of video
-
-                # Convert frame (BGR) to RGB, then to Tensor [1, H, W, C] (float32, 0-1)
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                # Reuse PIL conversion for consistency? Or keep cv2->numpy path
-                img_array = frame_rgb.astype(np.float32) / 255.0 # Direct conversion
-                # img = Image.fromarray(frame_rgb)
-                # img_array = np.array(img).astype(np.float32) / 255.0
-                img_tensor = torch.from_numpy(img_array)[None,] # <<< Added batch dimension
-                frame_tensors.append(img_tensor)
-                frame_count += 1
-                # Optional: Add progress logging for long videos
-                # if frame_count % 100 == 0: print(f"  Extracted {frame_count} frames...")
-
-            print(f"Finished extracting {frame_count} frames.")
+            frames, _ = self._decode_frames(video_path, **options)
+            if frames is not None:
+                print(f"Finished extracting {frames.shape[0]} frames.")
         except Exception as e:
             print(f"Error extracting frames from video {video_path}: {e}")
-            # Return None or potentially partially extracted frames? Let's return None for consistency.
-            frame_tensors = None # Indicate failure
+            frames = None # Indicate failure
         finally:
             # --- Cleanup ---
-            if cap:
-                cap.release()
             # Delete the temporary video file regardless of extraction success/failure
             if video_path and os.path.exists(video_path):
                 try:
@@ -1385,7 +1372,68 @@ class ExecuteNode:
                 except OSError as e:
                     print(f"Error deleting temporary video file {video_path}: {e}")
 
-        return frame_tensors
+        return frames
+
+    def _decode_frames(self, source, frame_stride=1, max_frames=0, target_width=0, target_height=0):
+        """
+        Decodes frames from a file path or URL into one preallocated [N, H, W, C] float32 tensor.
+        N is estimated from the container frame count (after stride/max_frames); the buffer only grows
+        if the container under-reports, and the result is a view trimmed to the frames actually decoded.
+        Returns (tensor or None, complete) where complete is False if decoding stopped before the reported end.
+        """
+        cap = cv2.VideoCapture(source)
+        try:
+            if not cap.isOpened():
+                return None, False
+            reported = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+
+            ret, frame = cap.read()
+            if not ret:
+                return None, False
+
+            # Output size: explicit target, or derived from one side keeping the aspect ratio
+            src_h, src_w = frame.shape[:2]
+            out_w, out_h = target_width, target_height
+            if out_w and not out_h:
+                out_h = max(1, round(src_h * out_w / src_w))
+            elif out_h and not out_w:
+                out_w = max(1, round(src_w * out_h / src_h))
+            resize = bool(out_w and out_h) and (out_w, out_h) != (src_w, src_h)
+            if not resize:
+                out_w, out_h = src_w, src_h
+
+            # Preallocate from container metadata; unknown counts start small and double
+            capacity = -(-reported // frame_stride) if reported > 0 else 64
+            if max_frames:
+                capacity = min(capacity, max_frames)
+            frames = torch.empty((capacity, out_h, out_w, 3), dtype=torch.float32)
+            frames_np = frames.numpy()
+
+            kept = 0
+            index = 0
+            while ret:
+                if index % frame_stride == 0:
+                    if kept == frames.shape[0]:
+                        grown = torch.empty((kept * 2, out_h, out_w, 3), dtype=torch.float32)
+                        grown[:kept] = frames
+                        frames, frames_np = grown, grown.numpy()
+                    if resize:
+                        frame = cv2.resize(frame, (out_w, out_h), interpolation=cv2.INTER_AREA)
+                    # BGR -> RGB and 0-255 -> 0-1 in one pass, written straight into the batch
+                    np.divide(frame[..., ::-1], np.float32(255.0), out=frames_np[kept])
+                    kept += 1
+                    if max_frames and kept >= max_frames:
+                        return frames[:kept], True
+                index += 1
+                ret, frame = cap.read()
+
+            # Container counts are estimates; a stream cut well short of it is treated as incomplete
+            complete = reported <= 0 or index >= reported * 0.99
+            if kept <= frames.shape[0] // 2:
+                return frames[:kept].clone(), complete # Don't keep an over-reported buffer alive
+            return frames[:kept], complete
+        finally:
+            cap.release()
 
     def download_video_for_output(self, video_url):
         """
@@ -1422,7 +1470,7 @@ class ExecuteNode:
                     video_path = os.path.join(output_dir, f"video_output_{str(int(time.time()*1000))}.mp4")
 
                 print(f"Attempt {attempt + 1}/{max_retries} to download video for OUTPUT to: {video_path}")
-                response = requests.get(video_url, stream=True, timeout=60)
+                response = get_output_session().get(video_url, stream=True, timeout=60)
                 response.raise_for_status()
 
                 downloaded_size = 0
@@ -1460,116 +1508,72 @@ class ExecuteNode:
 
     def download_and_load_latent(self, latent_url):
         """
-        Downloads a .latent file, loads it using safetensors, applies multiplier,
-        cleans up the temp file, and returns the latent dictionary.
+        Downloads a .latent file into the shared latent cache (skipped when already cached),
+        memory-maps it and applies the multiplier in place.
         Returns dict { "samples": tensor } or None on failure.
         """
         max_retries = 5
         retry_delay = 1
         last_exception = None
-        latent_path = None
-        output_dir = "temp" # Use temp directory
+        cache = get_latent_cache() # <<< URL-keyed cache; repeated outputs cost no download
 
-        # Ensure temp directory exists
-        if not os.path.exists(output_dir):
-            try:
-                os.makedirs(output_dir)
-            except OSError as e:
-                print(f"Error creating temporary directory {output_dir}: {e}")
-                return None
+        latent_path = cache.get(latent_url)
+        if latent_path:
+            print(f"Latent found in cache: {latent_path}")
 
         # --- Download the latent file ---
         for attempt in range(max_retries):
-            latent_path = None # Reset path for each attempt
+            if latent_path:
+                break
+            partial_path = cache.partial_path(latent_url)
             try:
-                # Generate a unique temporary filename
-                try:
-                    safe_filename = f"temp_latent_{os.path.basename(latent_url)}_{str(int(time.time()*1000))}.latent"
-                    safe_filename = "".join(c if c.isalnum() or c in ['.', '_', '-'] else '_' for c in safe_filename)[:150]
-                    latent_path = os.path.join(output_dir, safe_filename)
-                except Exception as path_e:
-                    print(f"Error creating temporary latent path: {path_e}")
-                    latent_path = os.path.join(output_dir, f"temp_latent_{str(int(time.time()*1000))}.latent")
-
-                print(f"Attempt {attempt + 1}/{max_retries} to download latent to temp path: {latent_path}")
-                response = requests.get(latent_url, stream=True, timeout=30)
+                print(f"Attempt {attempt + 1}/{max_retries} to download latent: {latent_url}")
+                response = get_output_session().get(latent_url, stream=True, timeout=30)
                 response.raise_for_status()
 
                 downloaded_size = 0
-                with open(latent_path, "wb") as f:
+                with open(partial_path, "wb") as f:
                     for chunk in response.iter_content(chunk_size=65536):
-                        if chunk: # <<< Correct indent
+                        if chunk:
                             f.write(chunk)
-                            downloaded_size += len(chunk) # <<< Correct indent
+                            downloaded_size += len(chunk)
 
                 if downloaded_size > 0:
-                    print(f"Temporary latent downloaded successfully: {latent_path}")
+                    latent_path = cache.commit(latent_url, partial_path)
+                    print(f"Latent downloaded to cache: {latent_path}")
                     break # Exit retry loop on successful download
                 else:
-                    print(f"Warning: Downloaded latent file is empty: {latent_path}")
-                    if os.path.exists(latent_path):
-                        try: os.remove(latent_path)
-                        except OSError: pass
+                    print(f"Warning: Downloaded latent file is empty: {latent_url}")
                     last_exception = IOError("Downloaded latent file is empty.")
                     # Continue retry loop
 
             except (requests.exceptions.RequestException, IOError) as e:
                  print(f"Download latent attempt {attempt + 1} failed: {e}")
                  last_exception = e
-                 if latent_path and os.path.exists(latent_path):
-                     try: os.remove(latent_path)
-                     except OSError: pass
-                 # Continue retry loop
+            finally:
+                if os.path.exists(partial_path):
+                    try: os.remove(partial_path)
+                    except OSError: pass
 
             if attempt < max_retries - 1:
                 print(f"Retrying download in {retry_delay} seconds...")
                 time.sleep(retry_delay)
                 retry_delay *= 2
-            # else: # Implicitly handled by loop ending
-            #     print(f"Failed to download latent {latent_url} after {max_retries} attempts.")
 
-        # Check if download succeeded
-        if not latent_path or not os.path.exists(latent_path) or os.path.getsize(latent_path) == 0:
-             print(f"Failed to download latent {latent_url} successfully after {max_retries} attempts.")
-             if latent_path and os.path.exists(latent_path):
-                 try: os.remove(latent_path)
-                 except OSError: pass
+        if not latent_path:
+             print(f"Failed to download latent {latent_url} successfully after {max_retries} attempts: {last_exception}")
              return None
 
         # --- Load the latent file ---
-        loaded_latent_dict = None
         try:
             print(f"Loading latent from {latent_path}...")
-            # Use safetensors.torch.load_file
-            latent_content = safetensors.torch.load_file(latent_path, device="cpu")
-
-            if "latent_tensor" not in latent_content:
-                 raise ValueError("'latent_tensor' key not found in the loaded latent file.")
-
-            # Apply multiplier based on LoadLatent logic
-            multiplier = 1.0
-            if "latent_format_version_0" not in latent_content:
-                multiplier = 1.0 / 0.18215
-                print(f"Applying multiplier {multiplier:.5f} (old latent format detected)")
-
-            samples_tensor = latent_content["latent_tensor"].float() * multiplier
-            loaded_latent_dict = {"samples": samples_tensor}
+            # <<< Copy-on-write mapping: no read buffer plus scaled copy, the cached file is never modified
+            loaded_latent_dict = load_latent(latent_path)
             print("Latent loaded successfully.")
-
+            return loaded_latent_dict
         except Exception as e:
             print(f"Error loading latent file {latent_path}: {e}")
-            # Ensure loaded_latent_dict remains None on error
-            loaded_latent_dict = None
-        finally:
-            # --- Cleanup ---
-            if latent_path and os.path.exists(latent_path):
-                try:
-                    os.remove(latent_path)
-                    print(f"Deleted temporary latent file: {latent_path}")
-                except OSError as e:
-                    print(f"Error deleting temporary latent file {latent_path}: {e}")
-
-        return loaded_latent_dict
+            return None
 
     def download_and_read_text(self, text_url):
         """
@@ -1600,7 +1604,7 @@ class ExecuteNode:
                     text_path = os.path.join(output_dir, f"temp_text_{str(int(time.time()*1000))}.txt")
 
                 print(f"Attempt {attempt + 1}/{max_retries} to download text to temp path: {text_path}")
-                response = requests.get(text_url, stream=True, timeout=20) # Shorter timeout for text
+                response = get_output_session().get(text_url, stream=True, timeout=20) # Shorter timeout for text
                 response.raise_for_status()
 
                 downloaded_size = 0
@@ -1663,12 +1667,22 @@ class ExecuteNode:
         return read_content
 
     # <<< Add audio download and processing function
-    def download_and_process_audio(self, audio_url):
+    def download_and_process_audio(self, audio_url, sample_rate=0, max_seconds=0):
         """
-        Downloads an audio file, processes it using torchaudio,
-        cleans up the temp file, and returns the audio dictionary.
-        Returns dict { "waveform": tensor [Channels, Samples], "sample_rate": int } or None on failure.
+        Decodes an audio output into a preallocated float32 buffer, streaming from the URL when possible
+        and falling back to a temp file download.
+        sample_rate: resample to this rate (0 keeps the source rate); max_seconds: duration cap (0 = all).
+        Returns dict { "waveform": tensor [1, Channels, Samples], "sample_rate": int } or None on failure.
         """
+        # <<< Decode while downloading: no temp file, mono written into both channels, no repeat()
+        if pyav is not None:
+            try:
+                processed_audio = decode_audio(audio_url, sample_rate, max_seconds)
+                print(f"Audio decoded from stream: Shape={tuple(processed_audio['waveform'].shape)}, Sample Rate={processed_audio['sample_rate']} Hz")
+                return processed_audio
+            except Exception as e:
+                print(f"Streamed audio decode failed ({e}), downloading to a temp file instead...")
+
         max_retries = 5
         retry_delay = 1
         last_exception = None
@@ -1696,7 +1710,7 @@ class ExecuteNode:
                     audio_path = os.path.join(output_dir, f"temp_audio_{str(int(time.time()*1000))}.tmp")
 
                 print(f"Attempt {attempt + 1}/{max_retries} to download audio to temp path: {audio_path}")
-                response = requests.get(audio_url, stream=True, timeout=60) # Longer timeout for audio/video
+                response = get_output_session().get(audio_url, stream=True, timeout=60) # Longer timeout for audio/video
                 response.raise_for_status()
 
                 downloaded_size = 0
@@ -1739,44 +1753,27 @@ class ExecuteNode:
         # --- Process the audio file ---
         processed_audio = None
         try:
-            print(f"Processing audio from {audio_path} using torchaudio...")
-            # Use torchaudio.load to get waveform and sample rate
-            waveform, sample_rate = torchaudio.load(audio_path)
-            
-            # Ensure waveform is float32, which is common for ComfyUI audio nodes
-            if waveform.dtype != torch.float32:
-                print(f"Converting waveform from {waveform.dtype} to float32.")
-                waveform = waveform.to(torch.float32)
-                
-            # <<< Ensure the tensor is contiguous <<<
-            if not waveform.is_contiguous():
-                print("Audio waveform is not contiguous. Making it contiguous.")
-                waveform = waveform.contiguous()
-
-            # torchaudio.load returns [channels, samples]
-            # Follow ComfyUI standard format by adding batch dimension
-            
-            # Ensure mono audio becomes stereo for better compatibility
-            if waveform.shape[0] == 1:
-                # Convert mono to stereo by duplicating the channel
-                waveform = waveform.repeat(2, 1)
-                print(f"Converted mono audio to stereo: {waveform.shape}")
-            
-            # Add batch dimension as per ComfyUI standard: [batch, channels, samples]
-            # This matches ComfyUI's LoadAudio implementation: waveform.unsqueeze(0)
-            waveform = waveform.unsqueeze(0)
-            
-            print(f"Audio loaded successfully: Shape={waveform.shape} [batch, channels, samples], Sample Rate={sample_rate} Hz, dtype={waveform.dtype}")
-            
-            # Create audio dictionary following ComfyUI standard
-            processed_audio = {
-                "waveform": waveform,
-                "sample_rate": sample_rate
-            }
-            print(f"Created ComfyUI-standard processed audio dictionary with keys: {list(processed_audio.keys())}")
+            if pyav is not None:
+                processed_audio = decode_audio(audio_path, sample_rate, max_seconds)
+            else:
+                print(f"Processing audio from {audio_path} using torchaudio (PyAV not available)...")
+                waveform, source_rate = torchaudio.load(audio_path)
+                if max_seconds and max_seconds > 0:
+                    waveform = waveform[:, :int(max_seconds * source_rate)]
+                if sample_rate and sample_rate != source_rate:
+                    waveform = torchaudio.functional.resample(waveform, source_rate, sample_rate)
+                    source_rate = sample_rate
+                # Copy into the [1, C, S] float32 output once; mono fills both channels
+                channels = max(2, waveform.shape[0])
+                buffer = torch.empty((1, channels, waveform.shape[1]), dtype=torch.float32)
+                buffer[0, :waveform.shape[0]] = waveform
+                if waveform.shape[0] == 1:
+                    buffer[0, 1] = waveform[0]
+                processed_audio = {"waveform": buffer, "sample_rate": source_rate}
+            print(f"Audio loaded successfully: Shape={tuple(processed_audio['waveform'].shape)} [batch, channels, samples], Sample Rate={processed_audio['sample_rate']} Hz")
 
         except Exception as e:
-            print(f"Error processing audio file {audio_path} with torchaudio: {e}")
+            print(f"Error processing audio file {audio_path}: {e}")
             processed_audio = None # Ensure it's None on error
         finally:
             # --- Cleanup ---
@@ -4,6 +4,7 @@ from io import BytesIO
 import torch
 import numpy as np
 import time  # Add this import
+from .upload_cache import get_upload_cache # <<< Content-addressed upload dedup shared by all uploaders
 
 class ImageUploaderNode:
     """
@@ -103,6 +104,14 @@ class ImageUploaderNode:
         if buffer_size > max_size_bytes:
             raise Exception(f"Image size {buffer_size_mb:.2f}MB exceeds the 10MB limit.")
 
+        # <<< Identical image bytes uploaded before are served from the dedup cache, no network transfer >>>
+        upload_cache = get_upload_cache()
+        digest = upload_cache.hash_bytes(buffer.getvalue())
+        cached_filename = upload_cache.get(digest, apiConfig.get('apiKey'), 'image')
+        if cached_filename:
+            print(f"Image already uploaded (sha256 {digest[:12]}...), reusing filename: {cached_filename}")
+            return (cached_filename,)
+
         # Prepare multipart/form-data
         files = {
             'file': ('image.png', buffer, 'image/png')  # Filename and content type
@@ -161,5 +170,6 @@ class ImageUploaderNode:
             raise Exception("Upload succeeded but 'fileName' not found in the response.")
 
         print(f"Uploaded filename: {filename}")
+        upload_cache.put(digest, apiConfig.get('apiKey'), 'image', filename, size=buffer_size)
 
         return (filename,)
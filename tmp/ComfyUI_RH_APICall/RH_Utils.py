@@ -7,6 +7,7 @@ import shutil
 import numpy as np
 import torch
 from PIL import Image, ImageOps
+from .image_batch import assemble_image_batch
 
 class AllTrue(str):
     def __init__(self, representation=None) -> None:
@@ -103,6 +104,9 @@ class RH_Batch_Images_From_List():
                 "images": ("IMAGE", {"tooltip": "The images list"}),
                 "image_indices": ("STRING", {"default":"0-3,4,5-7","tooltip": "Some like 0-2, 3, 4-5. Leaving it empty means selecting all."}),
             },
+            "optional": {
+                "align": (["top-left", "center"], {"default": "top-left", "tooltip": "Placement of smaller images in the batch canvas"}),
+            },
         }
 
     RETURN_TYPES = ("IMAGE",)
@@ -114,24 +118,17 @@ class RH_Batch_Images_From_List():
 
     CATEGORY = "RunningHub"
 
-    def rh_batch_images(self, images, image_indices):
+    def rh_batch_images(self, images, image_indices, align="top-left"):
         image_indices = image_indices.replace(" ", "")
         out = []
         if image_indices == "":
-            out = images
-        image_indices = image_indices.split(',')
-        for index in image_indices:
-            if '-' in index:
-                sindex = index.split('-')
-                out.extend(images[int(sindex[0]):int(sindex[1])+1])
-            else:
-                out.append(images[int(index)])
-        batchsize = len(out)
-        max_height = max(image.shape[0] for image in out)
-        max_width = max(image.shape[1] for image in out)
-        max_channels = max(image.shape[2] for image in out)
-        batch_images = torch.zeros([batchsize, max_height, max_width, max_channels])
-        for (batch_number, image) in enumerate(out):
-            h, w, c = image.shape
-            batch_images[batch_number, 0:h, 0:w, 0:c] = image
-        return (batch_images,)
\ No newline at end of file
+            out = list(images)
+        else:
+            for index in image_indices.split(','):
+                if '-' in index:
+                    sindex = index.split('-')
+                    out.extend(images[int(sindex[0]):int(sindex[1])+1])
+                else:
+                    out.append(images[int(index)])
+        # Each image is copied once into the preallocated [B, maxH, maxW, maxC] batch
+        return (assemble_image_batch(out, align=align),)
\ No newline at end of file
@@ -2,6 +2,7 @@ import requests
 import json
 import os
 import time
+from .upload_cache import get_upload_cache # <<< Content-addressed upload dedup shared by all uploaders
 
 # Try importing folder_paths safely for potential future use, though not strictly needed for this node's core logic
 try:
@@ -77,6 +78,14 @@ class RH_VideoUploader:
         except Exception as e:
             raise FileNotFoundError(f"Error finding video file '{video}': {e}")
 
+        # <<< Files already uploaded with identical content are not sent again >>>
+        upload_cache = get_upload_cache()
+        digest = upload_cache.hash_file(video_path)
+        cached_filename = upload_cache.get(digest, apiKey, 'video')
+        if cached_filename:
+            print(f"RH_VideoUploader: Same content already uploaded (sha256 {digest[:12]}...), reusing: {cached_filename}")
+            return (cached_filename,)
+
         # 3. Prepare for RunningHub API upload
         # *** Use the same endpoint and data structure as ImageUploader ***
         upload_api_url = f"{baseUrl}/task/openapi/upload" # Corrected endpoint
@@ -169,6 +178,7 @@ class RH_VideoUploader:
             raise ValueError("Upload succeeded but 'fileName' (or compatible field) not found in RunningHub API response.data.")
 
         print(f"RH_VideoUploader: Upload successful. RunningHub filename/ID: {uploaded_filename}")
+        upload_cache.put(digest, apiKey, 'video', uploaded_filename, size=os.path.getsize(video_path))
         return (uploaded_filename,)
 
         # Removed generic Exception catch block to let specific errors propagate
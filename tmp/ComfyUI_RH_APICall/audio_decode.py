@@ -0,0 +1,104 @@
+"""
+Bounded-memory audio decoding into ComfyUI's AUDIO layout.
+
+Frames are decoded one at a time with PyAV and written straight into a preallocated
+float32 [1, C, S] buffer (C >= 2). Mono sources are written into both channels while
+decoding instead of being duplicated afterwards with repeat(), and the whole file is never
+held in memory in a second format. Optionally resamples and caps the duration.
+
+    from .audio_decode import decode_audio
+    audio = decode_audio(url_or_path, sample_rate=0, max_seconds=0, timeout=60)
+    # {"waveform": tensor [1, C, S], "sample_rate": int}
+
+PyAV reads http(s) URLs directly, so callers can decode while downloading. The timeout bounds
+both opening the URL and each read, like the timeout=60 of the requests download it replaces.
+"""
+
+import math
+
+import numpy as np
+import torch
+
+try:
+    import av
+except ImportError: # PyAV ships with recent ComfyUI; decode_audio reports it missing
+    av = None
+
+
+def decode_audio(source, sample_rate=0, max_seconds=0, timeout=60):
+    """
+    Decode an audio file or URL.
+
+    sample_rate: output rate in Hz (0 keeps the source rate)
+    max_seconds: stop after this much audio (0 decodes everything)
+    timeout: seconds to wait for the connection and for each read before giving up (None waits forever)
+    """
+    if av is None:
+        raise ImportError("PyAV (av) is required for streamed audio decoding")
+
+    with av.open(source, timeout=timeout) as container:
+        if not container.streams.audio:
+            raise ValueError(f"No audio stream in {source}")
+        stream = container.streams.audio[0]
+        source_rate = stream.rate or stream.codec_context.sample_rate
+        out_rate = sample_rate or source_rate
+        channels = max(2, len(stream.codec_context.layout.channels))
+        limit = int(max_seconds * out_rate) if max_seconds and max_seconds > 0 else 0
+
+        # Preallocate from the container's duration estimate; grow geometrically if it was low
+        duration = None
+        if stream.duration is not None and stream.time_base is not None:
+            duration = float(stream.duration * stream.time_base)
+        elif container.duration:
+            duration = container.duration / av.time_base
+        capacity = int(math.ceil(duration * out_rate)) if duration else out_rate * 30
+        if limit:
+            capacity = min(capacity, limit)
+        buffer = np.zeros((channels, max(capacity, 1)), dtype=np.float32)
+        filled = 0
+
+        # Planar float output at the target rate; layout is left alone so mono stays one plane
+        resampler = av.AudioResampler(format="fltp", rate=out_rate)
+
+        def write(frames):
+            nonlocal buffer, filled
+            for frame in frames:
+                data = frame.to_ndarray() # [planes, samples] float32
+                count = data.shape[1]
+                if limit:
+                    count = min(count, limit - filled)
+                if count <= 0:
+                    return False
+                if filled + count > buffer.shape[1]:
+                    new_capacity = max(filled + count, buffer.shape[1] * 2)
+                    if limit:
+                        new_capacity = min(new_capacity, limit)
+                    grown = np.zeros((channels, new_capacity), dtype=np.float32)
+                    grown[:, :filled] = buffer[:, :filled]
+                    buffer = grown
+                dest = buffer[:, filled:filled + count]
+                if data.shape[0] == 1:
+                    dest[0] = data[0, :count] # Mono: one decoded plane fills both channels
+                    dest[1] = data[0, :count]
+                else:
+                    dest[:data.shape[0]] = data[:, :count]
+                filled += count
+                if limit and filled >= limit:
+                    return False
+            return True
+
+        done = False
+        for packet in container.demux(stream):
+            for frame in packet.decode():
+                if not write(resampler.resample(frame)):
+                    done = True
+                    break
+            if done:
+                break
+        else:
+            write(resampler.resample(None)) # Flush samples buffered by the resampler
+
+    if filled < buffer.shape[1]:
+        # The duration estimate was high; one copy keeps the result contiguous for downstream nodes
+        buffer = np.ascontiguousarray(buffer[:, :filled])
+    return {"waveform": torch.from_numpy(buffer).unsqueeze(0), "sample_rate": out_rate}
@@ -0,0 +1,78 @@
+"""
+Batch assembly for images of different sizes.
+
+Images are written straight into one preallocated [B, maxH, maxW, maxC] float32 buffer,
+placed centered or top-left, instead of padding each one into its own tensor and
+concatenating the list.
+
+    from .image_batch import assemble_image_batch
+    batch = assemble_image_batch(pil_images, align="center", alpha_fill=1.0)
+
+Accepted image types: PIL images (uint8 data is scaled to 0-1), numpy HWC/HW arrays
+(uint8 scaled, float copied) and torch HWC or [1, H, W, C] tensors (copied as is).
+"""
+
+import numpy as np
+import torch
+
+ALIGNMENTS = ("center", "top-left")
+
+
+def _shape(image):
+    """(H, W, C) of a supported image without decoding or copying it."""
+    if hasattr(image, "getbands"): # PIL.Image
+        return image.height, image.width, len(image.getbands())
+    shape = tuple(image.shape)
+    if len(shape) == 4 and shape[0] == 1:
+        shape = shape[1:]
+    if len(shape) == 2:
+        return shape[0], shape[1], 1
+    if len(shape) != 3:
+        raise ValueError(f"Unsupported image shape {shape}, expected HWC")
+    return shape
+
+
+def assemble_image_batch(images, align="center", alpha_fill=None):
+    """
+    Assemble images into one [B, maxH, maxW, maxC] tensor.
+
+    align: "center" or "top-left" placement inside the max canvas; padding is 0.
+    alpha_fill: when the batch has 4 channels, the alpha value for images that have none
+                (None leaves it 0, i.e. plain zero padding of missing channels).
+    """
+    if align not in ALIGNMENTS:
+        raise ValueError(f"align must be one of {ALIGNMENTS}, got {align!r}")
+    images = list(images)
+    if not images:
+        raise ValueError("No images to batch")
+
+    shapes = [_shape(image) for image in images]
+    max_h = max(s[0] for s in shapes)
+    max_w = max(s[1] for s in shapes)
+    max_c = max(s[2] for s in shapes)
+
+    batch = torch.zeros((len(images), max_h, max_w, max_c), dtype=torch.float32)
+    batch_np = batch.numpy()
+
+    for b, (image, (h, w, c)) in enumerate(zip(images, shapes)):
+        if align == "center":
+            top, left = (max_h - h) // 2, (max_w - w) // 2
+        else:
+            top, left = 0, 0
+        region = (b, slice(top, top + h), slice(left, left + w))
+
+        if isinstance(image, torch.Tensor):
+            batch[region + (slice(0, c),)] = image.reshape(h, w, c)
+        else:
+            data = np.asarray(image) # PIL decodes once into uint8 here
+            if data.ndim == 2:
+                data = data[..., None]
+            dest = batch_np[region + (slice(0, c),)]
+            if data.dtype == np.uint8:
+                np.divide(data, np.float32(255.0), out=dest)
+            else:
+                np.copyto(dest, data, casting="unsafe")
+
+        if alpha_fill is not None and max_c == 4 and c == 3:
+            batch_np[region + (3,)] = alpha_fill
+    return batch
@@ -0,0 +1,174 @@
+"""
+On-disk cache and memory-mapped loading for .latent (safetensors) task outputs.
+
+Downloaded latents are kept under a directory keyed by the SHA-256 of their URL, so the
+same task output (e.g. a re-run or a result-cache hit) is never downloaded twice. Loading
+maps the file copy-on-write instead of reading it into a buffer and then multiplying into
+a second tensor, so a large video latent costs its size in RAM once, not twice.
+
+    from .latent_cache import get_latent_cache, load_latent
+    cache = get_latent_cache()
+    path = cache.get(url)                  # None on a miss
+    if path is None:
+        ...                                # download to cache.partial_path(url)
+        path = cache.commit(url, partial)  # atomic rename into the cache
+    latent = load_latent(path)             # {"samples": tensor}
+
+Cache directory: RH_LATENT_CACHE_DIR (default ~/.runninghub/latents). Size cap:
+RH_LATENT_CACHE_MAX_MB (default 4096); least recently used files are evicted first.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+import torch
+
+# Scale applied by ComfyUI's LoadLatent to files written before latent_format_version_0
+LEGACY_LATENT_MULTIPLIER = 1.0 / 0.18215
+
+_DTYPES = {
+    "F64": torch.float64, "F32": torch.float32, "F16": torch.float16, "BF16": torch.bfloat16,
+    "I64": torch.int64, "I32": torch.int32, "I16": torch.int16, "I8": torch.int8,
+    "U8": torch.uint8, "BOOL": torch.bool,
+}
+
+
+def _read_header(path):
+    """Parse the safetensors header: returns (metadata dict, tensor entries, data start offset)."""
+    with open(path, "rb") as f:
+        prefix = f.read(8)
+        if len(prefix) != 8:
+            raise ValueError(f"{path} is not a safetensors file (truncated header)")
+        (header_len,) = struct.unpack("<Q", prefix)
+        header = json.loads(f.read(header_len))
+    metadata = header.pop("__metadata__", None) or {}
+    return metadata, header, 8 + header_len
+
+
+def map_tensor(path, name):
+    """
+    Memory-map one tensor of a safetensors file without reading it.
+
+    The mapping is copy-on-write: writing to the tensor (e.g. scaling it in place) touches
+    private pages only and never modifies the cached file.
+    """
+    metadata, entries, data_start = _read_header(path)
+    if name not in entries:
+        raise KeyError(f"'{name}' key not found in {path}")
+    entry = entries[name]
+    dtype = _DTYPES.get(entry["dtype"])
+    if dtype is None:
+        raise ValueError(f"Unsupported safetensors dtype {entry['dtype']}")
+    begin, end = entry["data_offsets"]
+    shape = tuple(entry["shape"])
+    if end == begin:
+        return torch.empty(shape, dtype=dtype), metadata, entries
+    raw = np.memmap(path, dtype=np.uint8, mode="c", offset=data_start + begin, shape=(end - begin,))
+    return torch.from_numpy(raw).view(dtype).reshape(shape), metadata, entries
+
+
+def load_latent(path):
+    """
+    Load a ComfyUI .latent file as {"samples": float32 tensor}, applying the legacy scale in place.
+
+    float32 latents stay backed by the file mapping; other dtypes are converted once.
+    """
+    samples, _, entries = map_tensor(path, "latent_tensor")
+    if samples.dtype != torch.float32:
+        samples = samples.float()
+    if "latent_format_version_0" not in entries:
+        samples.mul_(LEGACY_LATENT_MULTIPLIER)
+    return {"samples": samples}
+
+
+class LatentCache:
+    """URL-keyed directory of downloaded .latent files with a total size cap."""
+
+    def __init__(self, directory=None, max_bytes=None):
+        if directory is None:
+            directory = os.getenv("RH_LATENT_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".runninghub", "latents")
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("RH_LATENT_CACHE_MAX_MB", 4096)) * 1024 * 1024)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + ".latent")
+
+    def partial_path(self, url):
+        """Download target for url; unique per thread so concurrent downloads do not collide."""
+        return f"{self.path_for(url)}.{os.getpid()}.{threading.get_ident()}.part"
+
+    def get(self, url):
+        """Path of the cached file for url, or None. A hit refreshes the file's LRU position."""
+        path = self.path_for(url)
+        with self._lock:
+            if os.path.isfile(path) and os.path.getsize(path) > 0:
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                self.stats["hits"] += 1
+                return path
+            self.stats["misses"] += 1
+            return None
+
+    def commit(self, url, partial_path):
+        """Move a finished download into the cache and return its final path."""
+        path = self.path_for(url)
+        os.replace(partial_path, path)
+        self.evict()
+        return path
+
+    def evict(self):
+        """Delete least recently used files until the cache fits in max_bytes."""
+        with self._lock:
+            files = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".latent") and entry.is_file():
+                    st = entry.stat()
+                    files.append((st.st_mtime, st.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError: # Still mapped on Windows; try again next time
+                    continue
+                total -= size
+                self.stats["evictions"] += 1
+
+    def clear_partials(self, max_age=3600):
+        """Remove .part files left behind by interrupted downloads."""
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".part"):
+                try:
+                    if now - entry.stat().st_mtime > max_age:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+# Process-wide instance shared by all nodes
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_latent_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LatentCache()
+            _cache.clear_partials()
+        return _cache
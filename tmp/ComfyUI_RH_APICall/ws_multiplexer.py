@@ -0,0 +1,174 @@
+"""
+Process-wide WebSocket multiplexer for RunningHub progress streams.
+
+Every connection runs as a task on one asyncio loop hosted by a single daemon I/O thread,
+instead of one websocket.WebSocketApp thread per ExecuteNode. Messages are routed to the
+handlers given to connect(); dropped connections (anything but a normal 1000 close) are
+re-established with exponential backoff.
+
+    from .ws_multiplexer import get_ws_multiplexer
+    handle = get_ws_multiplexer().connect(wss_url, on_message=node.on_ws_message,
+                                          on_error=node.on_ws_error, on_close=node.on_ws_close)
+    ...
+    handle.close()
+
+Handlers keep the websocket-client signatures (handle passed as the first argument) and run on
+the I/O thread, so they must not block. Logging goes through the "RH_APICall.websocket" logger;
+its level comes from the RH_WS_LOG_LEVEL environment variable (default WARNING) or set_log_level().
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import websockets
+
+logger = logging.getLogger("RH_APICall.websocket")
+logger.setLevel(os.getenv("RH_WS_LOG_LEVEL", "WARNING").upper())
+
+
+def set_log_level(level):
+    """Set the WebSocket log level ("DEBUG" logs every message, lazily formatted)."""
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+
+
+class WebSocketHandle:
+    """One multiplexed connection; close() stops it without reconnecting."""
+
+    def __init__(self, url, on_message=None, on_open=None, on_error=None, on_close=None):
+        self.url = url
+        self.on_message = on_message
+        self.on_open = on_open
+        self.on_error = on_error
+        self.on_close = on_close
+        self.connected = False
+        self.reconnects = 0
+        self._future = None
+        self._closing = False
+
+    def close(self):
+        self._closing = True
+        if self._future is not None:
+            self._future.cancel()
+
+    @property
+    def closed(self):
+        return self._future is not None and self._future.done()
+
+
+class WebSocketMultiplexer:
+    """Hosts all progress WebSockets of the process on one asyncio loop."""
+
+    def __init__(self, max_retries=5, backoff=1.0, max_backoff=30.0, open_timeout=20, ping_interval=20,
+                 stable_after=30.0):
+        """
+        max_retries: reconnect attempts after a drop before on_error is called and the handle gives up
+        backoff / max_backoff: first reconnect delay (seconds, doubled per attempt) and its cap
+        stable_after: seconds a connection must stay up (or deliver a message) before the retry count resets
+        """
+        self.max_retries = max_retries
+        self.stable_after = stable_after
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.open_timeout = open_timeout
+        self.ping_interval = ping_interval
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._handles = set()
+
+    def connect(self, url, on_message=None, on_open=None, on_error=None, on_close=None):
+        """Open a connection on the shared loop and return its handle immediately."""
+        handle = WebSocketHandle(url, on_message, on_open, on_error, on_close)
+        loop = self._ensure_loop()
+        with self._lock:
+            self._handles.add(handle)
+        handle._future = asyncio.run_coroutine_threadsafe(self._run(handle), loop)
+        handle._future.add_done_callback(lambda _: self._forget(handle))
+        return handle
+
+    @property
+    def active_connections(self):
+        with self._lock:
+            return len(self._handles)
+
+    def _forget(self, handle):
+        with self._lock:
+            self._handles.discard(handle)
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="RH_WebSocketIO", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def _call(self, callback, *args):
+        """Run a handler; a failing handler must not take down the connection or the loop."""
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception:
+            logger.exception("WebSocket handler %s failed", getattr(callback, "__name__", callback))
+
+    async def _run(self, handle):
+        attempt = 0
+        close_code, reason = None, None
+        try:
+            while not handle._closing:
+                try:
+                    async with websockets.connect(handle.url, open_timeout=self.open_timeout, max_size=None,
+                                                  ping_interval=self.ping_interval) as ws:
+                        handle.connected = True
+                        connected_at = time.monotonic()
+                        logger.info("WebSocket connected: %s", handle.url)
+                        self._call(handle.on_open, handle)
+                        async for message in ws:
+                            # Only a working connection resets the retry count; a server that accepts
+                            # and drops right away must still run out of retries and reach on_error
+                            attempt = 0
+                            logger.debug("WebSocket message from %s: %s", handle.url, message)
+                            self._call(handle.on_message, handle, message)
+                        close_code, reason = ws.close_code, ws.close_reason or "closed by server"
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    close_code, reason = None, e
+                finally:
+                    if handle.connected and time.monotonic() - connected_at >= self.stable_after:
+                        attempt = 0
+                    handle.connected = False
+
+                # A normal closure (1000) means the server is done with the stream; anything else is a drop
+                if handle._closing or close_code == 1000:
+                    break
+                attempt += 1
+                if attempt > self.max_retries:
+                    self._call(handle.on_error, handle,
+                               ConnectionError(f"WebSocket connection lost after {self.max_retries} retries: {reason}"))
+                    break
+                delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+                handle.reconnects += 1
+                logger.warning("WebSocket connection lost (%s), reconnecting in %.1fs (%d/%d)",
+                               reason, delay, attempt, self.max_retries)
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            close_code, reason = None, "closed by client"
+        self._call(handle.on_close, handle, close_code, str(reason) if reason is not None else None)
+
+
+# Process-wide instance shared by all nodes
+_multiplexer = None
+_multiplexer_lock = threading.Lock()
+
+
+def get_ws_multiplexer():
+    global _multiplexer
+    with _multiplexer_lock:
+        if _multiplexer is None:
+            _multiplexer = WebSocketMultiplexer()
+        return _multiplexer
@@ -0,0 +1,176 @@
+"""
+RunningHub 上传去重缓存
+按文件内容的 SHA-256 记录已上传文件在 RunningHub 上的 fileName，相同内容再次上传时直接返回，不再传输
+
+使用方法:
+    from upload_cache import get_upload_cache
+
+    cache = get_upload_cache()
+    digest = cache.hash_file("Input/pose.png")            # 流式计算，不把文件读入内存
+    file_name = cache.get(digest, api_key, "image")
+    if file_name is None:
+        file_name = do_upload(...)                         # 实际上传
+        cache.put(digest, api_key, "image", file_name)
+
+说明:
+    - 索引保存在 ~/.runninghub/uploads.db（环境变量 RH_UPLOAD_CACHE），同一台机器上的
+      Flask 服务、RunningHubClient 和 ComfyUI 上传节点共用；不保存 API Key，只保存其哈希
+    - 条目在 ttl 秒（默认 24 小时，环境变量 RH_UPLOAD_CACHE_TTL）后失效，避免引用已被 RunningHub 清理的文件
+    - 使用 SHA-256 是为了与浏览器 crypto.subtle 计算的摘要一致，网页可以在上传前先查询
+    - 同一文件（路径、大小、修改时间不变）的摘要在进程内缓存，重复查询不会重新读取文件
+    - 类型统一使用 "image"/"video"/"audio"，网页、客户端和节点按同一类型存取才能互相命中；
+      只有 MIME 类型时用 media_kind() 换算
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict, Tuple
+
+# 根目录下直接导入；作为共享模块复制进 ComfyUI 插件包后按包内相对导入（见 copy_nodes.py）
+try:
+    from .task_store import account_id
+except ImportError:
+    from task_store import account_id
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def media_kind(content_type: str) -> str:
+    """由 MIME 类型得到缓存使用的文件类型（image/video/audio），无法识别时按 image 处理"""
+    kind = (content_type or "").split("/", 1)[0].lower()
+    return kind if kind in ("image", "video", "audio") else "image"
+
+
+class UploadCache:
+    """内容哈希 -> RunningHub fileName 的持久化索引"""
+
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None):
+        """
+        Args:
+            path: 数据库文件路径，默认 ~/.runninghub/uploads.db；传入 ":memory:" 表示只保存在内存中
+            ttl: 条目有效期（秒）
+        """
+        if path is None:
+            path = os.getenv("RH_UPLOAD_CACHE") or os.path.join(os.path.expanduser("~"), ".runninghub", "uploads.db")
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if ttl is None:
+            ttl = float(os.getenv("RH_UPLOAD_CACHE_TTL", 24 * 3600))
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "bytes_saved": 0}
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            " digest TEXT NOT NULL, account TEXT NOT NULL, file_type TEXT NOT NULL,"
+            " file_name TEXT NOT NULL, size INTEGER, uploaded_at REAL,"
+            " PRIMARY KEY (digest, account, file_type))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_uploads_file ON uploads(file_name)")
+
+    # --- 摘要 ---
+
+    def hash_file(self, path: str) -> str:
+        """流式计算文件的 SHA-256（十六进制）"""
+        st = os.stat(path)
+        key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is not None:
+            return digest
+
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self._digests[key] = digest
+        return digest
+
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        """内存数据的 SHA-256（十六进制）"""
+        return hashlib.sha256(data).hexdigest()
+
+    # --- 查询与写入 ---
+
+    def get(self, digest: str, api_key: str, file_type: str) -> Optional[str]:
+        """查找已上传的 fileName，未命中或已过期时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_name, size, uploaded_at FROM uploads WHERE digest = ? AND account = ? AND file_type = ?",
+                (digest, account_id(api_key), file_type)
+            ).fetchone()
+            if row is None or time.time() - row[2] > self.ttl:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._stats["bytes_saved"] += row[1] or 0
+            return row[0]
+
+    def put(self, digest: str, api_key: str, file_type: str, file_name: str, size: Optional[int] = None):
+        """记录一次成功上传"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads (digest, account, file_type, file_name, size, uploaded_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, account_id(api_key), file_type, file_name, size, time.time())
+            )
+            self._stats["stores"] += 1
+
+    def digest_for(self, file_name: str, api_key: str) -> Optional[str]:
+        """反查已上传文件的内容哈希，不是本机上传的文件时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM uploads WHERE file_name = ? AND account = ? LIMIT 1",
+                (file_name, account_id(api_key))
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def invalidate(self, digest: str, api_key: Optional[str] = None):
+        """删除某个摘要的记录（例如 RunningHub 报告文件不存在时）"""
+        with self._lock:
+            if api_key is None:
+                self._conn.execute("DELETE FROM uploads WHERE digest = ?", (digest,))
+            else:
+                self._conn.execute("DELETE FROM uploads WHERE digest = ? AND account = ?",
+                                   (digest, account_id(api_key)))
+
+    def prune(self) -> int:
+        """删除过期条目，返回删除数量"""
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM uploads WHERE uploaded_at < ?", (time.time() - self.ttl,))
+            return cur.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# 进程级共享实例（按数据库路径区分）
+_caches: Dict[str, UploadCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_upload_cache(path: Optional[str] = None) -> UploadCache:
+    """获取进程级共享的上传缓存"""
+    key = path or os.getenv("RH_UPLOAD_CACHE") or ""
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = UploadCache(path)
+            cache.prune()
+            _caches[key] = cache
+        return cache
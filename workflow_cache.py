@@ -0,0 +1,326 @@
+"""
+RunningHub 工作流 JSON 缓存
+内存 LRU + 磁盘两级缓存，过期后先返回旧数据并在后台刷新，热路径不再等待 getJsonApiFormat
+
+使用方法:
+    from runninghub_client import RunningHubClient
+    from workflow_cache import get_workflow_cache
+    from task_store import account_id
+
+    client = RunningHubClient(api_key="your-api-key")
+    cache = get_workflow_cache(client.get_workflow_json)
+    prompt = cache.get("2016195556967714818", account=account_id(api_key))   # 节点字典的副本，失败返回None
+
+说明:
+    - fetch_fn 返回 getJsonApiFormat 的原始结果 {"code": 0, "data": {"prompt": "..."}}
+    - 缓存条目按内容哈希生成 etag；后台刷新时内容未变化只更新时间戳（接口本身不支持 ETag）
+    - 新鲜期(ttl)内直接返回；过期但未超过 stale_ttl 时立即返回旧数据并后台刷新；
+      超过 stale_ttl 或无缓存时同步获取（同一工作流的并发请求只发一次）
+    - 缓存按 (账户, 工作流ID) 区分，不同 API Key 不共享条目；get 返回深拷贝，调用方可以直接修改
+"""
+
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Dict, Any, Tuple
+
+FetchFn = Callable[[str], Dict[str, Any]]
+
+# 同步获取用的分段锁数量：同一工作流总落在同一把锁上，锁的数量不随工作流数量增长
+KEY_LOCK_STRIPES = 32
+
+
+class WorkflowCache:
+    """工作流 JSON 两级缓存"""
+
+    def __init__(
+        self,
+        fetch_fn: Optional[FetchFn] = None,
+        cache_dir: Optional[str] = None,
+        ttl: float = 600,
+        stale_ttl: float = 7 * 24 * 3600,
+        max_entries: int = 128,
+        max_disk_entries: int = 512
+    ):
+        """
+        初始化缓存
+
+        Args:
+            fetch_fn: 默认的工作流获取函数，接收workflowId，返回 getJsonApiFormat 原始结果
+            cache_dir: 磁盘缓存目录，默认 <临时目录>/runninghub_workflow_cache，
+                       可用环境变量 RH_WORKFLOW_CACHE_DIR 覆盖；传入空字符串表示不使用磁盘缓存
+            ttl: 新鲜期（秒）
+            stale_ttl: 过期数据仍可先行返回的最长时间（秒）
+            max_entries: 内存中最多缓存的工作流数量
+            max_disk_entries: 磁盘上最多缓存的工作流数量
+        """
+        if cache_dir is None:
+            cache_dir = os.getenv("RH_WORKFLOW_CACHE_DIR") or os.path.join(
+                tempfile.gettempdir(), "runninghub_workflow_cache"
+            )
+        self.cache_dir = cache_dir
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        self.fetch_fn = fetch_fn
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(KEY_LOCK_STRIPES)]
+        self._refreshing = set()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="WorkflowCacheRefresh")
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "fetches": 0,
+                       "revalidated": 0, "fetch_errors": 0, "evictions": 0}
+
+    # --- 对外接口 ---
+
+    def get(
+        self,
+        workflow_id: str,
+        fetch_fn: Optional[FetchFn] = None,
+        force_refresh: bool = False,
+        account: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        获取工作流节点字典
+
+        Args:
+            workflow_id: 工作流ID
+            fetch_fn: 本次使用的获取函数，默认使用初始化时传入的函数
+            force_refresh: 忽略缓存，同步重新获取
+            account: 账户标识（如 task_store.account_id(api_key)），不同账户的缓存互不共享
+
+        Returns:
+            工作流节点字典（节点ID -> 节点定义）的深拷贝，修改它不会影响缓存；
+            获取失败且无缓存时返回None
+        """
+        entry = self._get_entry(str(workflow_id), fetch_fn, force_refresh, account)
+        return copy.deepcopy(entry["prompt"]) if entry is not None else None
+
+    def get_with_etag(
+        self,
+        workflow_id: str,
+        fetch_fn: Optional[FetchFn] = None,
+        force_refresh: bool = False,
+        account: Optional[str] = None
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        同 get，同时返回该内容的 etag；两者取自同一条目，不会因后台刷新而错配
+
+        Returns:
+            (节点字典的深拷贝, etag)，获取失败且无缓存时返回 (None, None)
+        """
+        entry = self._get_entry(str(workflow_id), fetch_fn, force_refresh, account)
+        if entry is None:
+            return None, None
+        return copy.deepcopy(entry["prompt"]), entry["etag"]
+
+    def etag(self, workflow_id: str, account: Optional[str] = None) -> Optional[str]:
+        """工作流内容哈希，未缓存时返回None"""
+        entry = self._lookup(self._key(str(workflow_id), account))
+        return entry["etag"] if entry is not None else None
+
+    def invalidate(self, workflow_id: Optional[str] = None, account: Optional[str] = None):
+        """删除指定工作流（或全部）的缓存"""
+        with self._lock:
+            if workflow_id is None:
+                ids = list(self._entries.keys())
+                self._entries.clear()
+            else:
+                ids = [self._key(str(workflow_id), account)]
+                self._entries.pop(ids[0], None)
+        if self.cache_dir:
+            if workflow_id is None:
+                ids = [name[:-5] for name in os.listdir(self.cache_dir) if name.endswith(".json")]
+            for wid in ids:
+                try:
+                    os.remove(self._disk_path(wid))
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+    # --- 内部逻辑 ---
+
+    @staticmethod
+    def _key(workflow_id: str, account: Optional[str]) -> str:
+        """缓存键：按账户区分（账户标识只含字母数字，可直接用作文件名）"""
+        return f"{account}_{workflow_id}" if account else workflow_id
+
+    def _get_entry(
+        self,
+        workflow_id: str,
+        fetch_fn: Optional[FetchFn],
+        force_refresh: bool,
+        account: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        """返回缓存条目（共享对象，调用方不得修改）"""
+        fetch_fn = fetch_fn or self.fetch_fn
+        if fetch_fn is None:
+            raise ValueError("WorkflowCache 需要 fetch_fn")
+        key = self._key(workflow_id, account)
+
+        if not force_refresh:
+            entry = self._lookup(key)
+            if entry is not None:
+                age = time.time() - entry["fetched_at"]
+                if age < self.ttl:
+                    self._count("hits")
+                    return entry
+                if age < self.stale_ttl:
+                    self._count("stale_hits")
+                    self._schedule_refresh(key, workflow_id, fetch_fn)
+                    return entry
+
+        self._count("misses")
+        entry = self._fetch(key, workflow_id, fetch_fn, force_refresh)
+        if entry is not None:
+            return entry
+        # 获取失败时退回到任意旧数据
+        return self._lookup(key)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _disk_path(self, key: str) -> str:
+        safe_id = "".join(c for c in key if c.isalnum() or c in "-_")
+        return os.path.join(self.cache_dir, f"{safe_id}.json")
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """依次查找内存和磁盘缓存"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        return self._key_locks[hash(key) % len(self._key_locks)]
+
+    def _fetch(self, key: str, workflow_id: str, fetch_fn: FetchFn, force: bool = False) -> Optional[Dict[str, Any]]:
+        """同步获取并写入缓存，同一工作流的并发调用只请求一次"""
+        started = time.time()
+        with self._key_lock(key):
+            # 等锁期间其他线程可能已经刷新
+            entry = self._lookup(key)
+            if entry is not None and entry["fetched_at"] >= started and not force:
+                return entry
+
+            self._count("fetches")
+            try:
+                result = fetch_fn(workflow_id)
+                if not result or result.get("code") != 0:
+                    raise ValueError((result or {}).get("msg", "空响应"))
+                prompt_str = (result.get("data") or {}).get("prompt")
+                if not prompt_str:
+                    raise ValueError("响应中没有工作流数据")
+                if not isinstance(prompt_str, str):
+                    prompt_str = json.dumps(prompt_str, ensure_ascii=False)
+                prompt = json.loads(prompt_str)
+            except Exception as e:
+                self._count("fetch_errors")
+                print(f"❌ 获取工作流JSON失败 ({workflow_id}): {e}")
+                return None
+
+            etag = hashlib.sha1(prompt_str.encode("utf-8")).hexdigest()
+            if entry is not None and entry["etag"] == etag:
+                self._count("revalidated")
+                entry = dict(entry, fetched_at=time.time())
+            else:
+                entry = {"workflow_id": workflow_id, "etag": etag, "fetched_at": time.time(), "prompt": prompt}
+            self._remember(key, entry)
+            self._write_disk(key, entry)
+            return entry
+
+    def _write_disk(self, key: str, entry: Dict[str, Any]):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._prune_disk()
+        except OSError as e:
+            print(f"⚠️ 写入工作流缓存失败: {e}")
+
+    def _prune_disk(self):
+        """磁盘条目超出上限时删除最久未更新的"""
+        files = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                 if name.endswith(".json")]
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=lambda p: os.path.getmtime(p))
+        for path in files[:len(files) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _schedule_refresh(self, key: str, workflow_id: str, fetch_fn: FetchFn):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._fetch(key, workflow_id, fetch_fn, force=True)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(refresh)
+
+
+# 进程级共享缓存
+_shared_cache: Optional[WorkflowCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_workflow_cache(fetch_fn: Optional[FetchFn] = None) -> WorkflowCache:
+    """
+    获取进程级共享缓存
+
+    Args:
+        fetch_fn: 首次创建时使用的默认获取函数
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = WorkflowCache(fetch_fn)
+        elif _shared_cache.fetch_fn is None and fetch_fn is not None:
+            _shared_cache.fetch_fn = fetch_fn
+        return _shared_cache
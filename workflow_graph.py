@@ -0,0 +1,236 @@
+"""
+RunningHub 工作流图索引
+把 API 格式的工作流（{节点ID: {"class_type", "inputs", "_meta"}}）解析为带邻接表的图，
+一次构建后按工作流版本缓存，连接查询不再逐个扫描节点
+
+使用方法:
+    from workflow_graph import get_workflow_graph
+
+    graph = get_workflow_graph(prompt)               # 按内容哈希缓存
+    graph.inputs_of("38")                            # {"width": ("52", 0), ...}，O(入度)
+    graph.consumers_of("25")                         # [("39", "image", 0), ...]，O(出度)
+    graph.nodes_of_class("LoadImage")                # ["25"]
+    graph.nodes_with_input("image")                  # 含 image 输入的节点
+    graph.find_upstream("38", "LoadImage")           # 哪个 LoadImage 为节点 38 提供输入
+    graph.descendants("25")                          # 节点 25 下游的所有节点（拓扑序）
+
+说明:
+    - 输入值为 [节点ID, 输出槽] 的视为连接，其余为字面值；节点ID统一为字符串
+    - topological_order 为 Kahn 算法的结果，同层按节点ID数值排序；存在环时环上的节点排在最后
+    - version 为空时以内容哈希作为版本，内容不变的工作流共享同一个图；
+      传入 version 时它必须与 prompt 来自同一次读取，否则可能把新版本号配上旧内容的图
+    - 本模块只依赖标准库
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+Link = Tuple[str, int]
+
+
+def _sort_key(node_id: str):
+    return (0, int(node_id), "") if node_id.isdigit() else (1, 0, node_id)
+
+
+def sort_node_ids(node_ids: Iterable[str]) -> List[str]:
+    """按节点ID数值排序（非数字ID排在最后）"""
+    return sorted(node_ids, key=_sort_key)
+
+
+def _as_link(value: Any) -> Optional[Link]:
+    """[节点ID, 输出槽] 形式的输入返回 (节点ID, 槽)，否则返回None"""
+    if isinstance(value, list) and len(value) == 2 and isinstance(value[1], int) \
+            and isinstance(value[0], (str, int)) and not isinstance(value[0], bool):
+        return str(value[0]), value[1]
+    return None
+
+
+def parse_workflow(data: Any) -> Dict[str, Dict]:
+    """
+    取出节点字典，兼容几种常见包装：
+    getJsonApiFormat 的 {"prompt": "<json>"}、{"workflow": {...}}、JSON 字符串或节点字典本身
+    """
+    if isinstance(data, str):
+        data = json.loads(data)
+    if isinstance(data, dict):
+        for wrapper in ("prompt", "workflow"):
+            inner = data.get(wrapper)
+            # 注意区分包装键与恰好名为 prompt 的节点输入：节点本身带 class_type
+            if isinstance(inner, str) or isinstance(inner, dict) and "class_type" not in inner:
+                return parse_workflow(inner)
+    return data
+
+
+class WorkflowGraph:
+    """工作流节点图：正向/反向邻接表、class_type 索引和拓扑序"""
+
+    def __init__(self, workflow: Any):
+        """
+        Args:
+            workflow: 节点字典，或 parse_workflow 支持的包装形式
+        """
+        nodes = parse_workflow(workflow) or {}
+        self.nodes: Dict[str, Dict] = {str(k): v for k, v in nodes.items() if isinstance(v, dict)}
+        self._links: Dict[str, Dict[str, Link]] = {}
+        self._consumers: Dict[str, List[Tuple[str, str, int]]] = {node_id: [] for node_id in self.nodes}
+        self._by_class: Dict[str, List[str]] = {}
+        self._by_input: Dict[str, List[str]] = {}
+
+        for node_id in sorted(self.nodes, key=_sort_key):
+            node = self.nodes[node_id]
+            self._by_class.setdefault(node.get("class_type", ""), []).append(node_id)
+            links = {}
+            for name, value in (node.get("inputs") or {}).items():
+                self._by_input.setdefault(name, []).append(node_id)
+                link = _as_link(value)
+                if link is not None:
+                    links[name] = link
+                    self._consumers.setdefault(link[0], []).append((node_id, name, link[1]))
+            self._links[node_id] = links
+        self.topological_order: List[str] = self._toposort()
+        self._position = {node_id: i for i, node_id in enumerate(self.topological_order)}
+
+    def _toposort(self) -> List[str]:
+        in_degree = {node_id: sum(1 for src, _ in links.values() if src in self.nodes)
+                     for node_id, links in self._links.items()}
+        ready = deque(sorted((n for n, d in in_degree.items() if d == 0), key=_sort_key))
+        order = []
+        while ready:
+            node_id = ready.popleft()
+            order.append(node_id)
+            for consumer, _, _ in self._consumers.get(node_id, []):
+                in_degree[consumer] -= 1
+                if in_degree[consumer] == 0:
+                    ready.append(consumer)
+        if len(order) < len(self.nodes):
+            seen = set(order)
+            order.extend(sorted((n for n in self.nodes if n not in seen), key=_sort_key))
+        return order
+
+    # --- 节点属性 ---
+
+    def __contains__(self, node_id) -> bool:
+        return str(node_id) in self.nodes
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def class_type(self, node_id) -> str:
+        return self.nodes.get(str(node_id), {}).get("class_type", "")
+
+    def title(self, node_id) -> str:
+        return self.nodes.get(str(node_id), {}).get("_meta", {}).get("title", "")
+
+    def inputs(self, node_id) -> Dict[str, Any]:
+        """节点的全部输入（连接与字面值）"""
+        return self.nodes.get(str(node_id), {}).get("inputs") or {}
+
+    def literal_inputs(self, node_id) -> Dict[str, Any]:
+        """节点的字面值输入（可通过 nodeInfoList 修改的字段）"""
+        links = self._links.get(str(node_id), {})
+        return {name: value for name, value in self.inputs(node_id).items() if name not in links}
+
+    def class_types(self) -> List[str]:
+        """工作流中出现的所有 class_type"""
+        return list(self._by_class)
+
+    def nodes_of_class(self, class_type: str) -> List[str]:
+        """某个 class_type 的所有节点，O(1)"""
+        return list(self._by_class.get(class_type, []))
+
+    def input_names(self) -> List[str]:
+        """工作流中出现的所有输入名"""
+        return list(self._by_input)
+
+    def nodes_with_input(self, name: str) -> List[str]:
+        """含有某个输入（连接或字面值）的节点，O(1)"""
+        return list(self._by_input.get(name, []))
+
+    def nodes_matching(self, patterns: Iterable[str]) -> List[str]:
+        """class_type 包含任一子串的节点；只遍历不同的 class_type，不遍历节点"""
+        patterns = list(patterns)
+        matched = [n for class_type, ids in self._by_class.items()
+                   if any(p in class_type for p in patterns) for n in ids]
+        return sorted(matched, key=_sort_key)
+
+    # --- 连接查询 ---
+
+    def inputs_of(self, node_id) -> Dict[str, Link]:
+        """节点的上游连接 {输入名: (来源节点ID, 输出槽)}，O(入度)"""
+        return dict(self._links.get(str(node_id), {}))
+
+    def consumers_of(self, node_id, slot: Optional[int] = None) -> List[Tuple[str, str, int]]:
+        """使用该节点输出的连接 [(目标节点ID, 输入名, 输出槽)]，O(出度)；slot 限定输出槽"""
+        consumers = self._consumers.get(str(node_id), [])
+        return [c for c in consumers if slot is None or c[2] == slot]
+
+    def predecessors(self, node_id) -> List[str]:
+        """直接上游节点（去重）"""
+        return list(dict.fromkeys(src for src, _ in self._links.get(str(node_id), {}).values()))
+
+    def successors(self, node_id) -> List[str]:
+        """直接下游节点（去重）"""
+        return list(dict.fromkeys(dst for dst, _, _ in self._consumers.get(str(node_id), [])))
+
+    def ancestors(self, node_id) -> List[str]:
+        """所有上游节点，按拓扑序"""
+        return self._walk(str(node_id), self.predecessors)
+
+    def descendants(self, node_id) -> List[str]:
+        """所有下游节点，按拓扑序"""
+        return self._walk(str(node_id), self.successors)
+
+    def find_upstream(self, node_id, class_type: str) -> List[str]:
+        """为该节点（直接或间接）提供输入的某类节点，例如哪个 LoadImage 连到节点 38"""
+        return [n for n in self.ancestors(node_id) if self.class_type(n) == class_type]
+
+    def find_downstream(self, node_id, class_type: str) -> List[str]:
+        """使用该节点输出（直接或间接）的某类节点"""
+        return [n for n in self.descendants(node_id) if self.class_type(n) == class_type]
+
+    def _walk(self, start: str, neighbours) -> List[str]:
+        seen = set()
+        queue = deque([start])
+        while queue:
+            for neighbour in neighbours(queue.popleft()):
+                if neighbour not in seen and neighbour != start:
+                    seen.add(neighbour)
+                    queue.append(neighbour)
+        return sorted(seen, key=lambda n: self._position.get(n, len(self._position)))
+
+
+def workflow_version(workflow: Any) -> str:
+    """工作流内容的哈希，用作未提供版本时的缓存键"""
+    text = workflow if isinstance(workflow, str) else json.dumps(workflow, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# 进程级图缓存（按版本）
+_graphs: "OrderedDict[str, WorkflowGraph]" = OrderedDict()
+_graphs_lock = threading.Lock()
+MAX_GRAPHS = 64
+
+
+def get_workflow_graph(workflow: Any, version: Optional[str] = None) -> WorkflowGraph:
+    """
+    获取工作流的图索引，同一版本只构建一次
+
+    Args:
+        workflow: 节点字典或 parse_workflow 支持的包装形式
+        version: 工作流版本（如 WorkflowCache.etag），为空时使用内容哈希
+    """
+    key = version or workflow_version(workflow)
+    with _graphs_lock:
+        graph = _graphs.get(key)
+        if graph is not None:
+            _graphs.move_to_end(key)
+            return graph
+    graph = WorkflowGraph(workflow)
+    with _graphs_lock:
+        _graphs[key] = graph
+        while len(_graphs) > MAX_GRAPHS:
+            _graphs.popitem(last=False)
+    return graph